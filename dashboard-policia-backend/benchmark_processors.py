@@ -0,0 +1,207 @@
+"""Benchmark y equivalencia de las variantes de DataProcessor y del motor de agregados.
+
+Ejecuta los métodos públicos de cada variante (src/data_processor*.py y AggregateStore) sobre los
+mismos libros sintéticos y registra el tiempo (mediana de --repeat corridas) y el pico de memoria
+de cada método. También compara cada resultado con el de src/data_processor.py, que es la
+referencia. No usa la base de datos: AggregateStore se construye en memoria con build().
+
+    python benchmark_processors.py --rows 1000,20000 --repeat 5 --json benchmark.json
+"""
+import argparse
+import glob
+import importlib
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+
+from load_test import FILTER_OPTIONS, synthetic_workbook  # noqa: E402
+
+REFERENCE = 'data_processor'
+ENGINE = 'aggregates'
+METHODS = [
+    'get_demographics_data',
+    'get_habits_data',
+    'get_health_data',
+    'get_knowledge_data',
+    'get_quality_of_life_data',
+    'get_comprehensive_kpis',
+    'get_kpis',
+    'get_filtered_data',
+    'get_filter_options',
+]
+# Diferencias que se listan por método; el resto solo se cuenta
+MAX_LISTED_DIFFS = 3
+
+
+def variant_names():
+    """Módulos src/data_processor*.py más el motor de agregados, con la referencia primero"""
+    names = sorted(os.path.basename(path)[:-3] for path in glob.glob(os.path.join(BASE_DIR, 'src', 'data_processor*.py')))
+    names.remove(REFERENCE)
+    return [REFERENCE] + names + [ENGINE]
+
+
+def load_variant(name, workbook):
+    """Instancia de la variante sobre el libro (incluye la carga del Excel)"""
+    if name == ENGINE:
+        from src.aggregates import AggregateStore
+        from src.data_processor import DataProcessor
+        store = AggregateStore(DataProcessor(workbook))
+        store.build()
+        return store
+    module = importlib.import_module(f'src.{name}')
+    return module.DataProcessor(workbook)
+
+
+def canonical(value):
+    """Resultado comparable: tipos de Python, NaN como texto y claves numéricas como float"""
+    if isinstance(value, dict):
+        return {canonical_key(k): canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [canonical(v) for v in value]
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return 'NaN' if math.isnan(value) else round(float(value), 6)
+    return value
+
+
+def canonical_key(key):
+    if isinstance(key, (int, float, np.integer, np.floating)) and not isinstance(key, bool):
+        return 'NaN' if math.isnan(key) else float(key)
+    return key
+
+
+def differences(expected, actual, path=''):
+    """Rutas de las hojas que difieren entre dos resultados canónicos"""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        found = []
+        for key in list(expected) + [k for k in actual if k not in expected]:
+            if key not in actual or key not in expected:
+                found.append(f'{path}/{key}')
+            else:
+                found.extend(differences(expected[key], actual[key], f'{path}/{key}'))
+        return found
+    if isinstance(expected, list) and isinstance(actual, list) and len(expected) == len(actual):
+        found = []
+        for i, (a, b) in enumerate(zip(expected, actual)):
+            found.extend(differences(a, b, f'{path}[{i}]'))
+        return found
+    return [] if expected == actual else [path or '/']
+
+
+def measure(call, repeat):
+    """(mediana en ms, pico de memoria en KiB, resultado) de una llamada"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = call()
+        times.append((time.perf_counter() - start) * 1000)
+    # El pico se mide en una corrida aparte: tracemalloc agrega costo a cada asignación
+    tracemalloc.start()
+    try:
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return float(np.median(times)), peak / 1024, result
+
+
+def filter_cases(options):
+    """Sin filtros y con dos filtros tomados de las opciones disponibles"""
+    params = [param for param in FILTER_OPTIONS if options.get(FILTER_OPTIONS[param])][:2]
+    return [{}, {param: options[FILTER_OPTIONS[param]][0] for param in params}]
+
+
+def benchmark(workbook, names, repeat):
+    """Filas de resultados de todas las variantes sobre un libro"""
+    rows, reference = [], {}
+    cases = None
+    for name in names:
+        try:
+            load_ms, load_peak, instance = measure(lambda: load_variant(name, workbook), 1)
+        except Exception as e:
+            # Algunas variantes antiguas ni siquiera compilan
+            rows.append({'variant': name, 'method': 'load', 'error': f'{type(e).__name__}: {e}'})
+            continue
+        rows.append({'variant': name, 'method': 'load', 'ms': round(load_ms, 2), 'peak_kib': round(load_peak, 1)})
+        if cases is None:
+            cases = filter_cases(instance.get_filter_options())
+
+        for method in METHODS:
+            if not hasattr(instance, method):
+                continue
+            calls = [(f'{method}({json.dumps(case, ensure_ascii=False)})', case) for case in cases] \
+                if method == 'get_filtered_data' else [(method, None)]
+            for label, case in calls:
+                call = getattr(instance, method)
+                row = {'variant': name, 'method': label}
+                try:
+                    ms, peak, result = measure((lambda: call(case)) if case is not None else call, repeat)
+                except Exception as e:
+                    row['error'] = f'{type(e).__name__}: {e}'
+                    rows.append(row)
+                    continue
+                row.update({'ms': round(ms, 3), 'peak_kib': round(peak, 1)})
+                result = canonical(result)
+                if name == REFERENCE:
+                    reference[label] = result
+                elif label in reference:
+                    diffs = differences(reference[label], result)
+                    row['diffs'] = len(diffs)
+                    row['diff_paths'] = diffs[:MAX_LISTED_DIFFS]
+                rows.append(row)
+    return rows
+
+
+def print_table(rows_count, rows):
+    print(f'\n== {rows_count} respuestas')
+    print(f"{'variante':<26} {'método':<48} {'ms':>10} {'KiB pico':>10} {'vs ref':>8}")
+    for row in rows:
+        if 'error' in row:
+            print(f"{row['variant']:<26} {row['method'][:48]:<48} {'error: ' + row['error'][:60]}")
+            continue
+        diffs = row.get('diffs')
+        status = '' if diffs is None else ('igual' if diffs == 0 else f'{diffs} dif')
+        print(f"{row['variant']:<26} {row['method'][:48]:<48} {row['ms']:>10} {row['peak_kib']:>10} {status:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark y equivalencia de las variantes del procesador')
+    parser.add_argument('--rows', default='1000,10000', help='tamaños de los libros sintéticos, separados por comas')
+    parser.add_argument('--repeat', type=int, default=5, help='corridas por método (se informa la mediana)')
+    parser.add_argument('--variants', help='variantes a incluir, separadas por comas (por defecto, todas)')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--workdir', help='carpeta para los libros sintéticos (por defecto, temporal)')
+    parser.add_argument('--json', help='guarda los resultados en este archivo')
+    args = parser.parse_args()
+
+    names = variant_names()
+    if args.variants:
+        wanted = args.variants.split(',')
+        names = [name for name in names if name in wanted or name == REFERENCE]
+
+    directory = args.workdir or tempfile.mkdtemp(prefix='dashboard-bench-')
+    os.makedirs(directory, exist_ok=True)
+    results = {}
+    for rows_count in [int(size) for size in args.rows.split(',')]:
+        workbook = synthetic_workbook(rows_count, args.seed, directory)
+        rows = benchmark(workbook, names, args.repeat)
+        results[rows_count] = rows
+        print_table(rows_count, rows)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'repeat': args.repeat, 'results': results}, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+"""Verifica que los caminos optimizados respeten el contrato JSON de la implementación de referencia.
+
+Genera DataFrames de encuesta aleatorios a partir del libro base. Los tamaños van de 0 a cientos de
+filas; se vacían celdas al azar, se mezclan grafías como "Si", "SÍ" o "No " y aparecen categorías
+nuevas. Para cada DataFrame compara src/data_processor.py (pandas) con AggregateStore en cuatro
+caminos: construcción completa, ingesta incremental, lote (/api/batch) y /api/breakdown. Compara
+todos los métodos get_* y combinaciones de filtros al azar. La comparación es canónica (tipos de
+Python, NaN como texto, sin depender del orden de las claves); sale con código 1 ante la primera
+diferencia.
+
+    python equivalence_check.py --frames 40 --filters 25 --seed 1
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+
+from benchmark_processors import canonical, differences  # noqa: E402
+from load_test import FILTER_OPTIONS  # noqa: E402
+from src.aggregates import AggregateStore, SECTION_SPECS, SECTIONS, SUPPRESSED_LABEL, _LayoutChanged  # noqa: E402
+from src.data_processor import DataProcessor  # noqa: E402
+from src.schema import FIELDS, SCHEMA, YES_NO_FIELDS  # noqa: E402
+from src.segments import Segmentation  # noqa: E402
+from src.snapshots import render_json  # noqa: E402
+
+BASE_WORKBOOK = os.path.join(BASE_DIR, 'data', 'Dashboard_Encuesta_Base.xlsx')
+SECTION_METHODS = {
+    'demographics': 'get_demographics_data',
+    'habits': 'get_habits_data',
+    'health': 'get_health_data',
+    'knowledge': 'get_knowledge_data',
+    'quality_of_life': 'get_quality_of_life_data',
+    'kpis': 'get_comprehensive_kpis',
+}
+FRAME_SIZES = [0, 1, 2, 5, 20, 60, 200, 600]
+# Tamaños mínimos de celda probados sobre el libro real (DASHBOARD_MIN_CELL_SIZE)
+MIN_CELL_SIZES = [2, 3, 5]
+# Grafías alternativas que la limpieza debe unificar
+VARIANT_SPELLINGS = {'Sí': ['Si', 'SÍ', 'Si '], 'No': ['NO', 'No '], 'A veces': ['A VECES', 'A veces ']}
+
+
+class Mismatch(Exception):
+    """El camino optimizado no coincide con la referencia"""
+
+
+def random_frame(base, rng):
+    """DataFrame crudo (como sale del Excel) con tamaño, vacíos, grafías y categorías al azar"""
+    rows = int(rng.choice(FRAME_SIZES))
+    df = base.iloc[rng.integers(0, len(base), rows)].reset_index(drop=True).astype(object)
+    if rows == 0:
+        return df
+
+    blank_rate = rng.choice([0, 0.05, 0.3])
+    blanks = rng.random(df.shape) < blank_rate
+    df = df.mask(blanks)
+
+    for field in rng.choice(YES_NO_FIELDS, size=3, replace=False):
+        col = FIELDS[field]
+        for value, spellings in VARIANT_SPELLINGS.items():
+            hit = (df[col] == value).to_numpy() & (rng.random(rows) < 0.3)
+            df.loc[hit, col] = rng.choice(spellings, size=int(hit.sum()))
+
+    if rng.random() < 0.3:
+        # Una categoría que no está en el libro base, en una dimensión de filtro o en una medida
+        field = rng.choice(['district', 'hierarchy', 'physical_health', 'training_topic', 'factor_2'])
+        df.loc[int(rng.integers(0, rows)), FIELDS[field]] = f'Nueva {int(rng.integers(1000))}'
+    return df
+
+
+def random_filters(options, rng, count):
+    """Combinaciones de filtros, incluidas 'all', valores inexistentes y actividad física"""
+    combinations = [{}]
+    for _ in range(count):
+        filters = {}
+        for param, key in FILTER_OPTIONS.items():
+            if options[key] and rng.random() < 0.4:
+                filters[param] = str(rng.choice(options[key] + ['all', 'Inexistente']))
+        if rng.random() < 0.3:
+            filters['actividad_fisica'] = str(rng.choice(['true', 'false']))
+        combinations.append(filters)
+    return combinations
+
+
+def check(label, expected, actual):
+    diffs = differences(canonical(expected), canonical(actual))
+    if diffs:
+        raise Mismatch(f'{label}: {len(diffs)} diferencias, p. ej. {diffs[:3]}')
+
+
+def make_store(df, segmentation):
+    processor = DataProcessor('equivalencia.xlsx', df=df, source_digest='equivalencia', segmentation=segmentation)
+    store = AggregateStore(processor)
+    store.build()
+    return processor, store
+
+
+def check_frame(raw, rng, filter_count):
+    """Compara todos los caminos para un DataFrame; retorna la cantidad de comparaciones"""
+    df = DataProcessor._clean_frame(SCHEMA.conform(raw))
+    # Los segmentos se ajustan una vez al DataFrame completo, como load_data con el archivo
+    segmentation = Segmentation('equivalencia').fit(df)
+    df = segmentation.label(df)
+    reference = DataProcessor('equivalencia.xlsx', df=df, source_digest='equivalencia', segmentation=segmentation)
+    _, store = make_store(df, segmentation)
+    compared = 0
+
+    for method in list(SECTION_METHODS.values()) + ['get_kpis', 'get_filter_options']:
+        check(method, getattr(reference, method)(), getattr(store, method)())
+        compared += 1
+
+    combinations = random_filters(reference.get_filter_options(), rng, filter_count)
+    expected = {}
+    for filters in combinations:
+        expected[repr(filters)] = reference.get_filtered_data(filters)
+        check(f'get_filtered_data({filters})', expected[repr(filters)], store.get_filtered_data(filters))
+        compared += 1
+
+    # Lote: todas las combinaciones en una sola pasada
+    sections = SECTIONS + ['kpis']
+    for filters, payload in zip(combinations, store.get_batch([(filters, sections) for filters in combinations])):
+        check(f'get_batch({filters})', expected[repr(filters)], payload)
+        compared += 1
+
+    # Desglose: cada grupo equivale a filtrar por su valor
+    for param, key in FILTER_OPTIONS.items():
+        breakdown = store.get_breakdown(param, sections)
+        for group in breakdown['groups']:
+            check(f'get_breakdown({param}={group["value"]})',
+                  reference.get_filtered_data({param: group['value']}), group['data'])
+            compared += 1
+
+    # Ingesta incremental: la primera parte se construye y el resto se suma como en ingest()
+    if len(df) > 1:
+        split = int(rng.integers(1, len(df)))
+        processor, incremental = make_store(df.iloc[:split], segmentation)
+        base = incremental.snapshot
+        new_df = processor.append_responses(raw.iloc[split:].to_dict('records'))
+        try:
+            snapshot, _ = incremental._merge(base, *incremental._accumulate(base, new_df, split))
+            incremental._publish(snapshot)
+        except _LayoutChanged:
+            # Categorías nuevas: ingest() reconstruye, igual que aquí
+            incremental.build()
+        for filters in combinations:
+            check(f'ingesta incremental {filters}', expected[repr(filters)], incremental.get_filtered_data(filters))
+            compared += 1
+    return compared
+
+
+def suppressed_distribution(expected, k):
+    """Distribución esperada con k-anonimato: categorías chicas juntas bajo la clave reservada y, si no
+    llegan a k, con la categoría visible más chica (empate: primera en el orden de buckets, vacío primero)"""
+    buckets = [key for key in expected if key != key] + sorted(key for key in expected if key == key)
+    hidden = [key for key in buckets if 0 < expected[key] < k]
+    if hidden and sum(expected[key] for key in hidden) < k:
+        candidates = [key for key in buckets if expected[key] >= k]
+        if candidates:
+            hidden.append(min(candidates, key=lambda key: expected[key]))
+    visible = {key: count for key, count in expected.items() if count > 0 and key not in hidden}
+    if sum(expected[key] for key in hidden) >= k:
+        visible[SUPPRESSED_LABEL] = sum(expected[key] for key in hidden)
+    return visible
+
+
+def check_min_cell_size(base, rng, filter_count):
+    """Libro real con tamaño mínimo de celda: las respuestas se serializan y las distribuciones agrupan lo chico"""
+    df = DataProcessor._clean_frame(SCHEMA.conform(base))
+    segmentation = Segmentation('equivalencia').fit(df)
+    df = segmentation.label(df)
+    reference = DataProcessor('equivalencia.xlsx', df=df, source_digest='equivalencia', segmentation=segmentation)
+    combinations = random_filters(reference.get_filter_options(), rng, filter_count)
+    compared = 0
+    for k in MIN_CELL_SIZES:
+        processor = DataProcessor('equivalencia.xlsx', df=df, source_digest='equivalencia', segmentation=segmentation)
+        store = AggregateStore(processor, min_cell_size=k)
+        store.build()
+        for filters in combinations:
+            label = f'min_cell_size={k} {filters}'
+            expected, actual = reference.get_filtered_data(filters), store.get_filtered_data(filters)
+            try:
+                render_json(actual)
+            except (TypeError, ValueError) as e:
+                raise Mismatch(f'{label}: no se puede serializar ({e})')
+            if expected['kpis']['total_responses'] < k:
+                continue
+            for section in SECTIONS:
+                for key, kind, _ in SECTION_SPECS[section]:
+                    if kind == 'dist':
+                        check(f'{label} {section}.{key}', suppressed_distribution(expected[section][key], k), actual[section][key])
+                        compared += 1
+    return compared
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Equivalencia entre la referencia pandas y los caminos optimizados')
+    parser.add_argument('--frames', type=int, default=40, help='DataFrames aleatorios a generar')
+    parser.add_argument('--filters', type=int, default=25, help='combinaciones de filtros por DataFrame')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    base = pd.read_excel(BASE_WORKBOOK)
+    rng = np.random.default_rng(args.seed)
+    start, total = time.perf_counter(), 0
+    try:
+        total += check_min_cell_size(base, rng, args.filters)
+    except Mismatch as e:
+        print(f'Libro base con tamaño mínimo de celda (semilla {args.seed}): {e}')
+        sys.exit(1)
+    for i in range(args.frames):
+        raw = random_frame(base, rng)
+        try:
+            total += check_frame(raw, rng, args.filters)
+        except Mismatch as e:
+            print(f'DataFrame {i} ({len(raw)} filas, semilla {args.seed}): {e}')
+            sys.exit(1)
+    print(f'{args.frames} DataFrames, {total} comparaciones iguales en {time.perf_counter() - start:.1f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+"""Prueba de carga local de la API del dashboard.
+
+Genera un libro sintético del tamaño pedido (remuestreando las respuestas reales), levanta la app
+en un subproceso (src/serve.py) o en este mismo proceso y reproduce una mezcla de /api/data,
+/api/filtered-data y endpoints de sección a un ritmo fijo de solicitudes por segundo. Todo corre
+contra 127.0.0.1.
+
+    python load_test.py --rows 20000 --qps 50 --duration 30
+    python load_test.py --mode inprocess --mix data=0.05,filtered=0.8,sections=0.15 --json resultado.json
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_WORKBOOK = os.path.join(BASE_DIR, 'data', 'Dashboard_Encuesta_Base.xlsx')
+
+# Parámetro de la API -> clave de /api/filter-options
+FILTER_OPTIONS = {
+    'distrito': 'distritos',
+    'genero': 'generos',
+    'edad': 'edades',
+    'jerarquia': 'jerarquias',
+    'estado_civil': 'estados_civiles',
+    'segmento': 'segmentos',
+}
+SECTION_PATHS = ['/api/demographics', '/api/habits', '/api/health', '/api/knowledge', '/api/quality-of-life', '/api/kpis']
+DEFAULT_MIX = 'data=0.1,filtered=0.6,sections=0.3'
+
+
+def synthetic_workbook(rows, seed, directory):
+    """Libro con `rows` respuestas remuestreadas del libro base (conserva la relación entre preguntas)"""
+    path = os.path.join(directory, f'encuesta_sintetica_{rows}_{seed}.xlsx')
+    if not os.path.exists(path):
+        base = pd.read_excel(BASE_WORKBOOK)
+        rng = np.random.default_rng(seed)
+        df = base.iloc[rng.integers(0, len(base), rows)].reset_index(drop=True)
+        df.iloc[:, 0] = np.arange(1, rows + 1)
+        df.to_excel(path, index=False)
+    return path
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class Server:
+    """App del dashboard sobre el libro sintético y una base SQLite temporal"""
+
+    def __init__(self, workbook, directory, mode):
+        self.mode = mode
+        self.port = free_port()
+        self.env = {
+            'DASHBOARD_EXCEL_PATH': workbook,
+            'DASHBOARD_DATABASE_URI': f"sqlite:///{os.path.join(directory, 'load_test.db')}",
+            'DASHBOARD_SNAPSHOTS_DIR': os.path.join(directory, 'snapshots'),
+            'HOST': '127.0.0.1',
+            'PORT': str(self.port),
+            'LOG_LEVEL': 'warning',
+        }
+        self._process = None
+        self._server = None
+
+    def start(self):
+        if self.mode == 'subprocess':
+            self._process = subprocess.Popen([sys.executable, os.path.join(BASE_DIR, 'src', 'serve.py')],
+                                             env={**os.environ, **self.env})
+        else:
+            # La app lee la configuración al importarse
+            os.environ.update(self.env)
+            sys.path.insert(0, BASE_DIR)
+            from werkzeug.serving import WSGIRequestHandler, make_server
+            from src.main import app
+
+            class QuietHandler(WSGIRequestHandler):
+                def log_request(self, *args, **kwargs):
+                    pass
+
+            self._server = make_server('127.0.0.1', self.port, app, threaded=True, request_handler=QuietHandler)
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def wait_ready(self, timeout=300):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._process is not None and self._process.poll() is not None:
+                raise RuntimeError(f'El servidor terminó con código {self._process.returncode}')
+            try:
+                status, body = request('127.0.0.1', self.port, '/api/filter-options', encoding='identity')
+                if status == 200:
+                    return json.loads(body)
+            except OSError:
+                pass
+            time.sleep(0.5)
+        raise RuntimeError('El servidor no respondió a tiempo')
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.wait(timeout=30)
+        if self._server is not None:
+            self._server.shutdown()
+
+
+def request(host, port, path, connection=None, encoding='gzip'):
+    """GET que retorna (estado, cuerpo); reutiliza la conexión si se pasa una.
+
+    Por defecto acepta gzip como un navegador, así que el cuerpo puede venir comprimido.
+    """
+    conn = connection or http.client.HTTPConnection(host, port, timeout=60)
+    try:
+        conn.request('GET', path, headers={'Accept-Encoding': encoding})
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        if connection is None:
+            conn.close()
+
+
+def filter_combinations(options, count, seed):
+    """Combinaciones distintas de 1 a 3 filtros tomadas de /api/filter-options, en orden de popularidad"""
+    rng = np.random.default_rng(seed)
+    params = [param for param in FILTER_OPTIONS if options.get(FILTER_OPTIONS[param])]
+    combinations, seen = [], set()
+    for _ in range(count * 20):
+        if len(combinations) == count:
+            break
+        size = min(rng.choice([1, 2, 3], p=[0.5, 0.3, 0.2]), len(params))
+        chosen = rng.choice(params, size=size, replace=False)
+        combination = {param: str(rng.choice(options[FILTER_OPTIONS[param]])) for param in sorted(chosen)}
+        if rng.random() < 0.1:
+            combination['actividad_fisica'] = 'true'
+        key = tuple(sorted(combination.items()))
+        if key not in seen:
+            seen.add(key)
+            combinations.append(combination)
+    return combinations
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in ('data', 'filtered', 'sections'):
+            raise argparse.ArgumentTypeError(f'Tipo de solicitud desconocido: {name}')
+        mix[name] = float(weight)
+    total = sum(mix.values())
+    if total <= 0:
+        raise argparse.ArgumentTypeError('La mezcla debe tener algún peso positivo')
+    return {name: weight / total for name, weight in mix.items()}
+
+
+def request_plan(total, mix, combinations, zipf, seed):
+    """Lista de (tipo, ruta) de las solicitudes; los filtros siguen una distribución de Zipf"""
+    rng = np.random.default_rng(seed)
+    ranks = np.arange(1, len(combinations) + 1)
+    popularity = 1 / ranks ** zipf
+    popularity /= popularity.sum()
+
+    kinds = rng.choice(list(mix), size=total, p=list(mix.values()))
+    picks = rng.choice(len(combinations), size=total, p=popularity)
+    sections = rng.choice(SECTION_PATHS, size=total)
+    plan = []
+    for kind, pick, section in zip(kinds.tolist(), picks.tolist(), sections.tolist()):
+        if kind == 'data':
+            plan.append(('data', '/api/data'))
+        elif kind == 'filtered':
+            plan.append(('filtered', '/api/filtered-data?' + urlencode(combinations[pick])))
+        else:
+            plan.append(('sections', section))
+    return plan
+
+
+def run(port, plan, qps, concurrency, warmup):
+    """Lanza el plan a ritmo constante (lazo abierto) y retorna los resultados medidos.
+
+    La latencia se mide desde el instante programado de cada solicitud, no desde que un hilo
+    queda libre, para que una saturación del servidor se refleje en los percentiles.
+    """
+    local = threading.local()
+    results = []
+    lock = threading.Lock()
+
+    def execute(kind, path, scheduled):
+        if not hasattr(local, 'conn'):
+            local.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        try:
+            status, _ = request('127.0.0.1', port, path, local.conn)
+            error = None if status < 400 else f'HTTP {status}'
+        except (OSError, http.client.HTTPException) as e:
+            local.conn.close()
+            error = type(e).__name__
+        finished = time.monotonic()
+        if scheduled - start >= warmup:
+            with lock:
+                results.append((kind, finished - scheduled, error, finished))
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        start = time.monotonic()
+        for index, (kind, path) in enumerate(plan):
+            scheduled = start + index / qps
+            delay = scheduled - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(execute, kind, path, scheduled)
+    return start, results
+
+
+def report(results, start, warmup):
+    """Resumen por tipo de solicitud: cantidad, errores, solicitudes/s y percentiles en ms"""
+    summary = {}
+    if not results:
+        return summary
+    measured_start = start + warmup
+    elapsed = max(finished for *_, finished in results) - measured_start
+    groups = {'total': results}
+    for kind in sorted({kind for kind, *_ in results}):
+        groups[kind] = [result for result in results if result[0] == kind]
+    for name, group in groups.items():
+        latencies = np.array([latency for _, latency, _, _ in group]) * 1000
+        errors = {}
+        for _, _, error, _ in group:
+            if error:
+                errors[error] = errors.get(error, 0) + 1
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        summary[name] = {
+            'requests': len(group),
+            'errors': sum(errors.values()),
+            'error_types': errors,
+            'throughput': round(len(group) / elapsed, 2),
+            'p50_ms': round(float(p50), 2),
+            'p95_ms': round(float(p95), 2),
+            'p99_ms': round(float(p99), 2),
+            'max_ms': round(float(latencies.max()), 2),
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga local de la API del dashboard')
+    parser.add_argument('--rows', type=int, default=10000, help='respuestas del libro sintético')
+    parser.add_argument('--qps', type=float, default=20, help='solicitudes por segundo objetivo')
+    parser.add_argument('--duration', type=float, default=30, help='segundos de carga (incluye el calentamiento)')
+    parser.add_argument('--warmup', type=float, default=5, help='segundos iniciales que no se miden')
+    parser.add_argument('--concurrency', type=int, default=32, help='solicitudes simultáneas como máximo')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f'pesos por tipo ({DEFAULT_MIX})')
+    parser.add_argument('--combinations', type=int, default=500, help='combinaciones de filtros distintas')
+    parser.add_argument('--zipf', type=float, default=1.1, help='exponente de Zipf de la popularidad de los filtros')
+    parser.add_argument('--mode', choices=['subprocess', 'inprocess'], default='subprocess')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--workdir', help='carpeta para el libro sintético y la base (por defecto, temporal)')
+    parser.add_argument('--json', help='guarda el resumen en este archivo')
+    args = parser.parse_args()
+
+    directory = args.workdir or tempfile.mkdtemp(prefix='dashboard-load-')
+    os.makedirs(directory, exist_ok=True)
+    print(f'Libro sintético de {args.rows} respuestas en {directory}...')
+    workbook = synthetic_workbook(args.rows, args.seed, directory)
+
+    server = Server(workbook, directory, args.mode)
+    server.start()
+    try:
+        ready = time.monotonic()
+        options = server.wait_ready()
+        print(f'Servidor listo en {time.monotonic() - ready:.1f} s ({args.mode}, puerto {server.port})')
+        combinations = filter_combinations(options, args.combinations, args.seed)
+        plan = request_plan(int(args.qps * args.duration), args.mix, combinations, args.zipf, args.seed)
+        start, results = run(server.port, plan, args.qps, args.concurrency, args.warmup)
+    finally:
+        server.stop()
+
+    summary = report(results, start, args.warmup)
+    print(f"\n{'tipo':<10} {'solic.':>7} {'errores':>7} {'solic/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'máx ms':>8}")
+    for name, row in summary.items():
+        print(f"{name:<10} {row['requests']:>7} {row['errors']:>7} {row['throughput']:>8} "
+              f"{row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8} {row['max_ms']:>8}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'config': {k: v for k, v in vars(args).items() if k != 'json'}, 'results': summary}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
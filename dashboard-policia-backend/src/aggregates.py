@@ -0,0 +1,1486 @@
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from src.features import FEATURE_COLUMNS, NUMERIC_FEATURES, lookup_table, summarize
+from src.inference import (
+    Z_VALUES, bootstrap_means, chi_square, chi_square_sf, effective_size, mean_interval, weighted_means, wilson_interval
+)
+from src.memory import deep_sizeof
+from src.schema import FIELDS, FIELD_GROUPS, HEADER_POSITIONS
+from src.segments import SEGMENT, Segmentation
+from src.weighting import rake
+from src.models.user import db
+from src.models.aggregate import AggregateState, AggregateCount, SurveyResponse
+
+logger = logging.getLogger(__name__)
+
+# Columnas usadas en varias secciones
+ACTIVITY = FIELDS["physical_activity"]
+CHILDREN = FIELDS["has_children"]
+HEALTHY_HABITS = FIELDS["healthy_habits"]
+SERVICES = FIELDS["additional_services"]
+OVERLOAD = FIELDS["service_overload"]
+PHYSICAL_HEALTH = FIELDS["physical_health"]
+MENTAL_HEALTH = FIELDS["mental_health"]
+CHECKUP = FIELDS["medical_checkup"]
+ACCIDENTS = FIELDS["work_accident"]
+TRAINING = FIELDS["safety_training"]
+KNOWLEDGE = FIELDS["occupational_knowledge"]
+USAGE = FIELDS["service_usage"]
+DEVELOPMENT = FIELDS["professional_development"]
+RECOGNITION = FIELDS["recognition"]
+COMMUNICATION = FIELDS["communication"]
+NEEDS_IMPROVEMENT = FIELDS["needs_improvement"]
+ECONOMIC = FIELDS["economic_satisfaction"]
+BALANCE = FIELDS["work_life_balance"]
+
+# Dimensiones de filtro: (parámetro de la API, columna)
+FILTER_DIMENSIONS = [
+    ("distrito", FIELDS["district"]),
+    ("genero", FIELDS["gender"]),
+    ("edad", FIELDS["age"]),
+    ("jerarquia", FIELDS["hierarchy"]),
+    ("estado_civil", FIELDS["civil_status"]),
+    ("actividad_fisica", ACTIVITY),
+    ("segmento", SEGMENT),
+]
+
+# Preguntas de selección múltiple repartidas en varias columnas
+MULTI_SELECT_GROUPS = {group: [FIELDS[field] for field in fields] for group, fields in FIELD_GROUPS.items()}
+
+TRAINING_TOPICS_MAP = {
+    "Manejo del Estrés": "Manejo de Estrés",
+    "Primeros Auxilio": "Primeros Auxilios"
+}
+
+# Contenido de cada sección: (clave de salida, tipo, argumento), en el orden de DataProcessor
+SECTION_SPECS = {
+    "demographics": [
+        ("gender_distribution", "dist", FIELDS["gender"]),
+        ("age_distribution", "dist", FIELDS["age"]),
+        ("hierarchy_distribution", "dist", FIELDS["hierarchy"]),
+        ("district_distribution", "dist", FIELDS["district"]),
+        ("civil_status_distribution", "dist", FIELDS["civil_status"]),
+        ("seniority_distribution", "dist", FIELDS["seniority"]),
+        ("average_seniority", "mean", FIELDS["seniority"]),
+        ("age_hierarchy_distribution", "cross", (("age_range", FIELDS["age"]), ("hierarchy", FIELDS["hierarchy"]))),
+        ("gender_additional_services_cross", "cross", (("gender", FIELDS["gender"]), ("additional_services", SERVICES))),
+        ("hierarchy_workload_analysis", "workload", (("hierarchy", FIELDS["hierarchy"]), ("additional_services", SERVICES), ("service_overload", OVERLOAD))),
+        ("seniority_knowledge_cross", "cross", (("seniority", FIELDS["seniority"]), ("knows_services", KNOWLEDGE))),
+    ],
+    "habits": [
+        ("physical_activity_distribution", "dist", ACTIVITY),
+        ("frequency_distribution", "dist", FIELDS["activity_frequency"]),
+        ("has_children_distribution", "dist", CHILDREN),
+        ("children_count_distribution", "dist", FIELDS["children_count"]),
+        ("healthy_habits_distribution", "dist", HEALTHY_HABITS),
+        ("additional_services_distribution", "dist", SERVICES),
+        ("service_overload_distribution", "dist", OVERLOAD),
+        ("extra_paid_activity_distribution", "dist", FIELDS["extra_paid_activity"]),
+        ("hobbies_distribution", "dist", FIELDS["hobbies"]),
+        ("activity_quality_cross", "cross", (("physical_activity", ACTIVITY), ("needs_improvement", NEEDS_IMPROVEMENT))),
+        ("children_services_cross", "cross", (("has_children", CHILDREN), ("additional_services", SERVICES))),
+        ("activity_balance_cross", "cross", (("physical_activity", ACTIVITY), ("work_life_balance", BALANCE))),
+        ("services_balance_cross", "cross", (("additional_services", SERVICES), ("work_life_balance", BALANCE))),
+        ("healthy_activity_cross", "cross", (("healthy_habits", HEALTHY_HABITS), ("physical_activity", ACTIVITY))),
+        ("children_physical_activity_cross", "cross", (("has_children", CHILDREN), ("physical_activity", ACTIVITY))),
+    ],
+    "health": [
+        ("physical_health_distribution", "dist", PHYSICAL_HEALTH),
+        ("mental_health_distribution", "dist", MENTAL_HEALTH),
+        ("chronic_conditions_distribution", "dist", FIELDS["chronic_condition"]),
+        ("medical_checkups_distribution", "dist", CHECKUP),
+        ("checkup_reasons_distribution", "dist", FIELDS["checkup_reason"]),
+        ("treatment_types_distribution", "dist", FIELDS["treatment_type"]),
+        ("psychological_treatment_distribution", "dist", FIELDS["psychological_treatment"]),
+        ("work_incidents_distribution", "dist", ACCIDENTS),
+        ("work_life_balance_distribution", "dist", BALANCE),
+        ("health_correlation_matrix", "cross", (("physical_health", PHYSICAL_HEALTH), ("mental_health", MENTAL_HEALTH))),
+        ("health_workload_cross", "cross", (("physical_health", PHYSICAL_HEALTH), ("additional_services", SERVICES))),
+        ("health_activity_cross", "cross", (("physical_health", PHYSICAL_HEALTH), ("physical_activity", ACTIVITY))),
+        ("accidents_hierarchy_cross", "cross", (("hierarchy", FIELDS["hierarchy"]), ("work_accident", ACCIDENTS))),
+        ("mental_balance_cross", "cross", (("mental_health", MENTAL_HEALTH), ("work_life_balance", BALANCE))),
+    ],
+    "knowledge": [
+        ("safety_training_distribution", "dist", TRAINING),
+        ("training_topics_distribution", "topics", FIELDS["training_topic"]),
+        ("occupational_health_knowledge_distribution", "dist", KNOWLEDGE),
+        ("known_services_distribution", "top", ("known_services", 10)),
+        ("service_usage_distribution", "dist", USAGE),
+        ("service_satisfaction_distribution", "dist", FIELDS["service_satisfaction"]),
+        ("equipment_access_distribution", "dist", FIELDS["equipment_access"]),
+        ("professional_development_distribution", "dist", DEVELOPMENT),
+        ("recognition_distribution", "dist", RECOGNITION),
+        ("communication_distribution", "dist", COMMUNICATION),
+        ("training_hierarchy_cross", "cross", (("hierarchy", FIELDS["hierarchy"]), ("received_training", TRAINING))),
+        ("knowledge_usage_cross", "cross", (("knows_services", KNOWLEDGE), ("used_services", USAGE))),
+        ("training_accidents_cross", "cross", (("received_training", TRAINING), ("work_accident", ACCIDENTS))),
+        ("recognition_hierarchy_cross", "cross", (("hierarchy", FIELDS["hierarchy"]), ("feels_recognized", RECOGNITION))),
+        ("communication_knowledge_cross", "cross", (("comfortable_communication", COMMUNICATION), ("knows_services", KNOWLEDGE))),
+    ],
+    "quality_of_life": [
+        ("needs_improvement_distribution", "dist", NEEDS_IMPROVEMENT),
+        ("top_factors", "top", ("factors", 10)),
+        ("economic_satisfaction_distribution", "dist", ECONOMIC),
+        ("risk_effort_remuneration_distribution", "dist", FIELDS["risk_effort_remuneration"]),
+        ("hierarchy_quality_cross", "cross", (("hierarchy", FIELDS["hierarchy"]), ("needs_improvement", NEEDS_IMPROVEMENT))),
+        ("economic_hierarchy_cross", "cross", (("hierarchy", FIELDS["hierarchy"]), ("economic_satisfaction", ECONOMIC))),
+        ("economic_services_cross", "cross", (("additional_services", SERVICES), ("economic_satisfaction", ECONOMIC))),
+        ("factors_gender_analysis", "factor_by", ("factors", FIELDS["gender"], 10)),
+        ("factors_hierarchy_analysis", "factor_by", ("factors", FIELDS["hierarchy"], 5)),
+    ],
+}
+
+# Numeradores de KPIs: porcentaje de respuestas "Sí" sobre el total
+KPI_PERCENTAGES = [
+    ("physical_activity_percentage", ACTIVITY),
+    ("needs_improvement_percentage", NEEDS_IMPROVEMENT),
+    ("safety_training_percentage", TRAINING),
+    ("occupational_knowledge_percentage", KNOWLEDGE),
+    ("medical_checkup_percentage", CHECKUP),
+    ("additional_services_percentage", SERVICES),
+]
+KPI_CLIMATE = [
+    ("recognition_percentage", RECOGNITION),
+    ("communication_percentage", COMMUNICATION),
+    ("development_percentage", DEVELOPMENT),
+]
+KPI_INTEGRAL_HEALTH = (PHYSICAL_HEALTH, MENTAL_HEALTH)
+KPI_OVERLOAD = (SERVICES, OVERLOAD)
+# Indicador por respuesta del numerador de cada KPI (clave, columnas, valores), para los intervalos de confianza
+KPI_INDICATORS = (
+    [(key, (col,), ("Sí",)) for key, col in KPI_PERCENTAGES]
+    + [
+        ("integral_health_index", KPI_INTEGRAL_HEALTH, ("Buena", "Buena")),
+        ("overload_index", KPI_OVERLOAD, ("Sí", "Sí")),
+        ("work_life_balance_index", (BALANCE,), ("Sí",)),
+    ]
+    + [(key, (col,), ("Sí",)) for key, col in KPI_CLIMATE]
+    + [
+        ("economic_satisfaction_percentage", (ECONOMIC,), ("Sí",)),
+        ("work_accidents_rate", (ACCIDENTS,), ("Sí",)),
+        ("service_usage_percentage", (USAGE,), ("Sí",)),
+    ]
+)
+
+SECTIONS = ["demographics", "habits", "health", "knowledge", "quality_of_life"]
+
+# Clave reservada que agrupa las categorías suprimidas por tamaño mínimo de celda (ninguna respuesta puede usarla)
+SUPPRESSED_LABEL = "__suprimidas__"
+
+# Posición de primera aparición de un valor: columna * _POSITION_STRIDE + fila
+_POSITION_STRIDE = 1 << 40
+_NO_POSITION = np.iinfo(np.int64).max
+
+
+class _LayoutChanged(Exception):
+    """Las nuevas filas traen categorías que no existen en la materialización actual"""
+
+
+def _required_measures():
+    """Lista de medidas a materializar según SECTION_SPECS y los KPIs"""
+    measures = []
+
+    def add(measure):
+        if measure not in measures:
+            measures.append(measure)
+
+    for specs in SECTION_SPECS.values():
+        for _, kind, arg in specs:
+            if kind in ("dist", "topics", "mean"):
+                add(("dist", arg))
+            elif kind in ("cross", "workload"):
+                add(("cross", tuple(col for _, col in arg)))
+            elif kind == "top":
+                add(("multi", arg[0]))
+                add(("first", arg[0]))
+            elif kind == "factor_by":
+                add(("multi", arg[0]))
+                add(("first", arg[0]))
+                add(("mcross", arg[0], arg[1]))
+    for _, col in KPI_PERCENTAGES + KPI_CLIMATE:
+        add(("dist", col))
+    for col in (BALANCE, ECONOMIC, ACCIDENTS, USAGE):
+        add(("dist", col))
+    add(("cross", KPI_INTEGRAL_HEALTH))
+    add(("cross", KPI_OVERLOAD))
+    add(("dist", SEGMENT))
+    return measures
+
+
+MEASURES = _required_measures()
+
+
+def _measure_key(measure):
+    """Clave de texto de una medida para la base de datos"""
+    if measure[0] == "cross":
+        return "|".join(("cross",) + measure[1])
+    return "|".join(measure)
+
+
+def filter_label(param, value):
+    """Traduce el valor de un parámetro de filtro a la etiqueta de la columna"""
+    if param == "actividad_fisica":
+        return "Sí" if value == "true" else None
+    if not value or value == "all":
+        return None
+    return value
+
+
+def _flatten(values):
+    """Vista (primer eje, resto aplanado); admite ejes vacíos, donde reshape(n, -1) falla"""
+    return values.reshape(len(values), int(np.prod(values.shape[1:], dtype=np.int64)))
+
+
+def _column(df, col):
+    """Columna por su posición fija (DataFrames normalizados por SurveySchema.conform); las derivadas, por nombre"""
+    position = HEADER_POSITIONS.get(col)
+    if position is not None:
+        return df.iloc[:, position]
+    if col in df.columns:
+        return df[col]
+    # DataFrame sin segmentar (ej. armado a mano): la columna derivada queda vacía
+    return pd.Series(np.nan, index=df.index, dtype=object, name=col)
+
+
+def _group_axis(group):
+    return f"group:{group}"
+
+
+def _suppress(measure, counts, totals, min_cell_size):
+    """Anula las celdas con entre 1 y min_cell_size - 1 respuestas (k-anonimato) y sus complementarias.
+
+    counts son los conteos sin ponderar, que deciden la supresión, y totals los valores publicados
+    (iguales a counts si no hay pesos); ambos llevan las consultas en el primer eje. Retorna
+    (visibles, suprimidos, máscara) con los valores en la escala de totals.
+    """
+    if measure[0] == "first" or min_cell_size <= 1:
+        return totals, np.zeros_like(totals), np.zeros(totals.shape, dtype=bool)
+    mask = (counts > 0) & (counts < min_cell_size)
+    if measure[0] == "dist":
+        _complete_group(counts, mask, min_cell_size)
+    elif measure[0] in ("cross", "mcross"):
+        _complete_lines(counts, mask)
+    hidden = np.where(mask, totals, 0)
+    return totals - hidden, hidden, mask
+
+
+def _complement_candidates(counts, mask):
+    """Conteos de las celdas visibles no vacías (el resto queda en el máximo, fuera de la elección)"""
+    return np.where((counts > 0) & ~mask, counts, _NO_POSITION)
+
+
+def _complete_group(counts, mask, min_cell_size):
+    """Supresión secundaria de una distribución: si lo suprimido no llega al mínimo, se suma la categoría
+    visible más chica. Así el grupo publicado alcanza k y el total menos lo visible no despeja ninguna celda."""
+    hidden = np.where(mask, counts, 0).sum(axis=1)
+    candidates = _complement_candidates(counts, mask)
+    pick = candidates.argmin(axis=1)
+    rows = np.nonzero((hidden > 0) & (hidden < min_cell_size) & (candidates.min(axis=1) < _NO_POSITION))[0]
+    mask[rows, pick[rows]] = True
+
+
+def _complete_lines(counts, mask):
+    """Supresión secundaria de un cruce: ninguna fila ni columna queda con una sola celda suprimida,
+    que se despejaría restando lo visible al marginal publicado en la distribución"""
+    changed = True
+    while changed:
+        changed = False
+        for axis in range(1, counts.ndim):
+            candidates = _complement_candidates(counts, mask)
+            best = candidates.min(axis=axis, keepdims=True, initial=_NO_POSITION)
+            lone = (mask.sum(axis=axis, keepdims=True) == 1) & (best < _NO_POSITION)
+            pick = lone & (candidates == best)
+            # Ante empates, solo la primera celda de la línea
+            pick &= np.cumsum(pick, axis=axis) == 1
+            if pick.any():
+                mask |= pick
+                changed = True
+
+
+class DatasetSnapshot:
+    """Estado inmutable de los agregados de una versión de los datos; se reemplaza completo, nunca se modifica"""
+
+    __slots__ = ("version", "labels", "codes", "counts", "cell_dims", "cell_rows", "cell_ids", "row_cells", "row_patterns",
+                 "frame", "segmentation")
+
+    def __init__(self, version, labels, counts, cell_dims, cell_rows, cell_ids, row_cells, row_patterns, frame=None, segmentation=None):
+        for values in list(counts.values()) + [cell_dims, cell_rows, row_cells, row_patterns]:
+            values.setflags(write=False)
+        labels = {col: tuple(values) for col, values in labels.items()}
+        fields = {
+            "version": version,
+            "labels": MappingProxyType(labels),
+            # Índice etiqueta -> código (0 = vacío) de cada columna
+            "codes": MappingProxyType({col: {label: i + 1 for i, label in enumerate(values)} for col, values in labels.items()}),
+            "counts": MappingProxyType(counts),
+            "cell_dims": cell_dims,
+            "cell_rows": cell_rows,
+            "cell_ids": MappingProxyType(cell_ids),
+            # Celda y bits de KPI_INDICATORS de cada respuesta
+            "row_cells": row_cells,
+            "row_patterns": row_patterns,
+            # Respuestas y segmentación de esta versión: el procesador reemplaza su DataFrame (nunca lo
+            # modifica), así que las lecturas no ven filas ni segmentos de una versión posterior
+            "frame": frame,
+            "segmentation": segmentation,
+        }
+        for name, value in fields.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("DatasetSnapshot es inmutable")
+
+    def __repr__(self):
+        return f"<DatasetSnapshot {self.version} cells={len(self.cell_rows)}>"
+
+
+class _Selection:
+    """Totales de las celdas que cumplen un conjunto de filtros"""
+
+    def __init__(self, snapshot, mask, batch=None, index=None, min_cell_size=0, weights=None):
+        self.snapshot = snapshot
+        self.labels = snapshot.labels
+        self.mask = mask
+        self.min_cell_size = batch.min_cell_size if batch is not None else min_cell_size
+        # Pesos por celda (raking) o None para conteos sin ponderar
+        self.weights = batch.weights if batch is not None else weights
+        self._batch = batch
+        self._index = index
+        self._raw = {}
+        self._totals = {}
+        self._hidden = {}
+        self._suppressed = {}
+        self._statistics = {}
+        # Ranking ya calculado por grupo de selección múltiple: (n, índices ordenados)
+        self.rankings = {}
+
+    @property
+    def rows(self):
+        """Cantidad de respuestas seleccionadas"""
+        return int(self.snapshot.cell_rows[self.mask].sum())
+
+    @property
+    def total(self):
+        """Total publicado: respuestas, o población estimada si hay pesos"""
+        if self.weights is None:
+            return self.rows
+        return float(np.dot(self.weights[self.mask], self.snapshot.cell_rows[self.mask]))
+
+    def value(self, count):
+        """Conteo publicado: entero sin pesos, población estimada con dos decimales con pesos"""
+        return count.item() if self.weights is None else round(count.item(), 2)
+
+    def measure(self, measure):
+        if measure not in self._totals:
+            if self._batch is not None:
+                self._raw[measure] = self._batch.raw(measure)[self._index]
+                self._totals[measure] = self._batch.measure(measure)[self._index]
+                self._hidden[measure] = self._batch.hidden(measure)[self._index]
+                self._suppressed[measure] = self._batch.suppressed(measure)[self._index]
+            else:
+                values = self.snapshot.counts[measure][self.mask]
+                if measure[0] == "first":
+                    raw = totals = values.min(axis=0, initial=_NO_POSITION)
+                else:
+                    raw = values.sum(axis=0)
+                    totals = raw if self.weights is None else np.tensordot(self.weights[self.mask], values, axes=1)
+                self._raw[measure] = raw
+                visible, hidden, mask = _suppress(measure, raw[None], totals[None], self.min_cell_size)
+                self._totals[measure], self._hidden[measure], self._suppressed[measure] = visible[0], hidden[0], mask[0]
+        return self._totals[measure]
+
+    def raw(self, measure):
+        """Conteos completos sin ponderar ni suprimir"""
+        self.measure(measure)
+        return self._raw[measure]
+
+    def hidden(self, measure):
+        """Valores suprimidos por tamaño mínimo de celda (cero en las celdas visibles)"""
+        self.measure(measure)
+        return self._hidden[measure]
+
+    def suppressed(self, measure):
+        """Celdas no publicadas: menos respuestas que el tamaño mínimo o supresión complementaria"""
+        self.measure(measure)
+        return self._suppressed[measure]
+
+    def statistics(self, measure):
+        """Chi-cuadrado de un cruce sobre los conteos sin ponderar (solo se publica si no hay celdas suprimidas)"""
+        if measure not in self._statistics:
+            if self._batch is not None:
+                self._statistics[measure] = tuple(values[self._index] for values in self._batch.statistics(measure))
+            else:
+                self._statistics[measure] = chi_square(self.raw(measure))
+        return self._statistics[measure]
+
+
+class _Batch:
+    """Totales de varias selecciones, calculados para todas a la vez por cada medida"""
+
+    def __init__(self, snapshot, masks, min_cell_size=0, weights=None):
+        self.snapshot = snapshot
+        self.masks = masks
+        self.min_cell_size = min_cell_size
+        self.weights = weights
+        self._counts_weights = masks.astype(np.int64)
+        self._value_weights = None if weights is None else masks * weights
+        self._raw = {}
+        self._totals = {}
+        self._hidden = {}
+        self._suppressed = {}
+        self._statistics = {}
+
+    def measure(self, measure):
+        if measure not in self._totals:
+            values = self.snapshot.counts[measure]
+            flat = _flatten(values)
+            shape = (len(self.masks),) + values.shape[1:]
+            if measure[0] == "first":
+                raw = totals = np.stack([flat[mask].min(axis=0, initial=_NO_POSITION) for mask in self.masks]).reshape(shape)
+            else:
+                # Una multiplicación (consultas x celdas) @ (celdas x buckets) resuelve todas las consultas
+                raw = (self._counts_weights @ flat).reshape(shape)
+                totals = raw if self._value_weights is None else (self._value_weights @ flat).reshape(shape)
+            # La supresión se aplica a la matriz completa de consultas en una sola operación
+            self._raw[measure] = raw
+            self._totals[measure], self._hidden[measure], self._suppressed[measure] = _suppress(
+                measure, raw, totals, self.min_cell_size)
+        return self._totals[measure]
+
+    def raw(self, measure):
+        self.measure(measure)
+        return self._raw[measure]
+
+    def hidden(self, measure):
+        self.measure(measure)
+        return self._hidden[measure]
+
+    def suppressed(self, measure):
+        self.measure(measure)
+        return self._suppressed[measure]
+
+    def statistics(self, measure):
+        # Las tablas de todas las consultas se evalúan juntas
+        if measure not in self._statistics:
+            self._statistics[measure] = chi_square(self.raw(measure))
+        return self._statistics[measure]
+
+
+class AggregateStore:
+    """Conteos precalculados por celda de filtros, materializados en la base de datos"""
+
+    def __init__(self, processor, min_cell_size=0, segmentation=None):
+        self.processor = processor
+        self.source = os.path.basename(processor.excel_path)
+        # Segmentación compartida (olas): se asigna tal cual en lugar de restaurar o ajustar una propia
+        self.segmentation = segmentation
+        # Tamaño mínimo de celda publicado (k-anonimato); 0 o 1 lo desactiva
+        self.min_cell_size = min_cell_size
+        # Márgenes de población por dimensión de filtro ({columna: {valor: total}}) para ponderar
+        self.margins = {}
+        self._raking = None
+        # Tablas código -> valor de las variables numéricas del snapshot vigente
+        self._numeric = None
+        # Las lecturas toman la referencia actual una sola vez y nunca bloquean;
+        # las escrituras se serializan y publican un snapshot nuevo con una sola asignación
+        self.snapshot = None
+        self._write_lock = threading.RLock()
+        self._listeners = []
+        self._selection_listeners = []
+
+    @property
+    def version(self):
+        snapshot = self.snapshot
+        return snapshot.version if snapshot is not None else None
+
+    def on_change(self, callback):
+        """Registra una función que recibe la nueva versión cada vez que cambian los datos"""
+        self._listeners.append(callback)
+
+    def on_select(self, callback):
+        """Registra una función que recibe (filtros, selección) de cada selección resuelta"""
+        self._selection_listeners.append(callback)
+
+    def _selected(self, filters, selection):
+        for callback in self._selection_listeners:
+            callback(filters, selection)
+        return selection
+
+    def _publish(self, snapshot):
+        """Reemplaza el snapshot actual y avisa a los suscriptores.
+
+        Un suscriptor que falla no deshace la publicación ni impide avisar a los demás: los datos
+        ya están guardados y el snapshot es válido.
+        """
+        self.snapshot = snapshot
+        for callback in self._listeners:
+            try:
+                callback(snapshot.version)
+            except Exception:
+                logger.exception("Error notifying data change %s", snapshot.version)
+
+    # ------------------------------------------------------------------
+    # Construcción de los conteos
+    # ------------------------------------------------------------------
+
+    def _columns(self):
+        """Columnas codificadas individualmente (dimensiones y medidas)"""
+        columns = [col for _, col in FILTER_DIMENSIONS]
+        for measure in MEASURES:
+            if measure[0] == "dist":
+                cols = [measure[1]]
+            elif measure[0] == "cross":
+                cols = list(measure[1])
+            elif measure[0] == "mcross":
+                cols = [measure[2]]
+            else:
+                cols = []
+            for col in cols:
+                if col not in columns:
+                    columns.append(col)
+        return columns
+
+    def _init_layout(self, df):
+        """Snapshot vacío con las categorías de cada columna a partir de un DataFrame completo"""
+        labels = {}
+        for col in self._columns():
+            labels[col] = sorted(_column(df, col).dropna().unique().tolist())
+            if SUPPRESSED_LABEL in labels[col]:
+                raise ValueError(f'La columna "{col}" usa la clave reservada "{SUPPRESSED_LABEL}"')
+        for group, cols in MULTI_SELECT_GROUPS.items():
+            values = set()
+            for col in cols:
+                values.update(_column(df, col).dropna().tolist())
+            labels[_group_axis(group)] = sorted(values)
+
+        return DatasetSnapshot(
+            None,
+            labels,
+            {measure: self._empty(labels, measure, 0) for measure in MEASURES},
+            np.zeros((0, len(FILTER_DIMENSIONS)), dtype=np.int64),
+            np.zeros(0, dtype=np.int64),
+            {},
+            np.zeros(0, dtype=np.int64),
+            np.zeros(0, dtype=np.int64)
+        )
+
+    def _shape(self, labels, measure):
+        kind = measure[0]
+        if kind == "dist":
+            return (len(labels[measure[1]]) + 1,)
+        if kind == "cross":
+            return tuple(len(labels[col]) for col in measure[1])
+        if kind in ("multi", "first"):
+            return (len(labels[_group_axis(measure[1])]),)
+        return (len(labels[_group_axis(measure[1])]), len(labels[measure[2]]))
+
+    def _empty(self, labels, measure, cells):
+        fill = _NO_POSITION if measure[0] == "first" else 0
+        return np.full((cells,) + self._shape(labels, measure), fill, dtype=np.int64)
+
+    def _encode(self, series, labels):
+        """Códigos enteros de una columna (0 = vacío); falla si aparece una categoría nueva"""
+        codes = pd.Categorical(series, categories=labels).codes.astype(np.int64) + 1
+        if ((codes == 0) & series.notna().to_numpy()).any():
+            raise _LayoutChanged(series.name)
+        return codes
+
+    def _accumulate(self, base, df, row_offset):
+        """Calcula los conteos de las filas de df (incremento sobre las celdas de base)"""
+        labels = base.labels
+        codes = {col: self._encode(_column(df, col), labels[col]) for col in self._columns()}
+        group_codes = {}
+        for group, cols in MULTI_SELECT_GROUPS.items():
+            axis = labels[_group_axis(group)]
+            group_codes[group] = [self._encode(_column(df, col), axis) for col in cols]
+
+        # Celdas: combinación de los códigos de las dimensiones de filtro
+        dims = np.stack([codes[col] for _, col in FILTER_DIMENSIONS], axis=1)
+        radix = [len(labels[col]) + 1 for _, col in FILTER_DIMENSIONS]
+        keys = np.ravel_multi_index(dims.T, radix) if len(df) else np.zeros(0, dtype=np.int64)
+        unique_keys, first_rows, inverse = np.unique(keys, return_index=True, return_inverse=True)
+
+        cell_ids = dict(base.cell_ids)
+        new_dims = []
+        ids = np.empty(len(unique_keys), dtype=np.int64)
+        for i, key in enumerate(unique_keys.tolist()):
+            if key not in cell_ids:
+                cell_ids[key] = len(cell_ids)
+                new_dims.append(dims[first_rows[i]])
+            ids[i] = cell_ids[key]
+        row_cell = ids[inverse.reshape(-1)]
+        cells = len(cell_ids)
+
+        delta = {}
+        for measure in MEASURES:
+            shape = self._shape(labels, measure)
+            size = cells * int(np.prod(shape))
+            kind = measure[0]
+            if kind == "dist":
+                flat = row_cell * shape[0] + codes[measure[1]]
+                delta[measure] = np.bincount(flat, minlength=size)
+            elif kind == "cross":
+                axes = [codes[col] for col in measure[1]]
+                valid = np.logical_and.reduce([axis > 0 for axis in axes])
+                flat = np.ravel_multi_index([row_cell[valid]] + [axis[valid] - 1 for axis in axes], (cells,) + shape)
+                delta[measure] = np.bincount(flat, minlength=size)
+            elif kind == "multi":
+                flat = [row_cell[c > 0] * shape[0] + c[c > 0] - 1 for c in group_codes[measure[1]]]
+                delta[measure] = np.bincount(np.concatenate(flat) if flat else np.zeros(0, dtype=np.int64), minlength=size)
+            elif kind == "first":
+                flat, positions = [], []
+                rows = np.arange(len(df), dtype=np.int64) + row_offset
+                for i, c in enumerate(group_codes[measure[1]]):
+                    flat.append(row_cell[c > 0] * shape[0] + c[c > 0] - 1)
+                    positions.append(i * _POSITION_STRIDE + rows[c > 0])
+                first = np.full(size, _NO_POSITION, dtype=np.int64)
+                if flat:
+                    flat, positions = np.concatenate(flat), np.concatenate(positions)
+                    unique_flat, index = np.unique(flat, return_index=True)
+                    first[unique_flat] = positions[index]
+                delta[measure] = first
+            else:
+                by = codes[measure[2]]
+                flat = []
+                for c in group_codes[measure[1]]:
+                    valid = (c > 0) & (by > 0)
+                    flat.append(np.ravel_multi_index((row_cell[valid], c[valid] - 1, by[valid] - 1), (cells,) + shape))
+                delta[measure] = np.bincount(np.concatenate(flat) if flat else np.zeros(0, dtype=np.int64), minlength=size)
+            delta[measure] = delta[measure].reshape((cells,) + shape)
+
+        cell_dims = base.cell_dims
+        if new_dims:
+            cell_dims = np.vstack([cell_dims, np.array(new_dims, dtype=np.int64)])
+        return cell_ids, cell_dims, np.bincount(row_cell, minlength=cells), delta, row_cell, self._patterns(df)
+
+    def _patterns(self, df):
+        """Indicadores de KPI de cada fila empaquetados en bits (bit k = KPI_INDICATORS[k])"""
+        patterns = np.zeros(len(df), dtype=np.int64)
+        for bit, (_, cols, values) in enumerate(KPI_INDICATORS):
+            hit = np.logical_and.reduce([(_column(df, col) == value).to_numpy() for col, value in zip(cols, values)])
+            patterns |= hit.astype(np.int64) << bit
+        return patterns
+
+    def _row_cells(self, labels, cell_ids, df):
+        """Celda de cada fila de df según celdas ya existentes"""
+        dims = np.stack([self._encode(_column(df, col), labels[col]) for _, col in FILTER_DIMENSIONS], axis=1)
+        radix = [len(labels[col]) + 1 for _, col in FILTER_DIMENSIONS]
+        keys = np.ravel_multi_index(dims.T, radix) if len(df) else np.zeros(0, dtype=np.int64)
+        known = np.array(sorted(cell_ids), dtype=np.int64)
+        ids = np.array([cell_ids[key] for key in known.tolist()], dtype=np.int64)
+        position = np.searchsorted(known, keys)
+        if (position >= len(known)).any() or not np.array_equal(known[position], keys):
+            raise _LayoutChanged("cells")
+        return ids[position]
+
+    def _pad(self, labels, values, measure, cells):
+        if len(values) == cells:
+            return values
+        return np.concatenate([values, self._empty(labels, measure, cells - len(values))])
+
+    def _merge(self, base, cell_ids, cell_dims, rows, delta, row_cells, row_patterns):
+        """Suma un incremento a los conteos de base; retorna (snapshot nuevo sin publicar, entradas modificadas)"""
+        cells = len(cell_ids)
+        counts, changes = {}, {}
+        for measure in MEASURES:
+            current = self._pad(base.labels, base.counts[measure], measure, cells)
+            if measure[0] == "first":
+                merged = np.minimum(current, delta[measure])
+                changes[measure] = np.where(merged < current, merged, _NO_POSITION)
+            else:
+                merged = current + delta[measure]
+                changes[measure] = delta[measure]
+            counts[measure] = merged
+
+        cell_rows = np.concatenate([base.cell_rows, np.zeros(cells - len(base.cell_rows), dtype=np.int64)]) + rows
+        row_cells = np.concatenate([base.row_cells, row_cells])
+        row_patterns = np.concatenate([base.row_patterns, row_patterns])
+        snapshot = DatasetSnapshot(self.processor.version, dict(base.labels), counts, cell_dims, cell_rows, cell_ids,
+                                   row_cells, row_patterns, self.processor.df, self.processor.segmentation)
+        return snapshot, changes
+
+    def _build_all(self):
+        """(snapshot, entradas) con todos los conteos recalculados desde el DataFrame del procesador"""
+        df = self.processor.df
+        base = self._init_layout(df)
+        return self._merge(base, *self._accumulate(base, df, 0))
+
+    def build(self):
+        """Recalcula todos los conteos en memoria, publica el snapshot y retorna las entradas"""
+        with self._write_lock:
+            snapshot, changes = self._build_all()
+            self._publish(snapshot)
+            return changes
+
+    # ------------------------------------------------------------------
+    # Materialización en la base de datos
+    # ------------------------------------------------------------------
+
+    def _layout_json(self, snapshot):
+        segmentation = snapshot.segmentation
+        return json.dumps({
+            "labels": dict(snapshot.labels),
+            "dimensions": [param for param, _ in FILTER_DIMENSIONS],
+            "cells": snapshot.cell_dims.tolist(),
+            "measures": [_measure_key(measure) for measure in MEASURES],
+            # Los segmentos se restauran de aquí al arrancar, sin volver a agrupar
+            "segmentation": segmentation.to_dict() if segmentation is not None else None
+        })
+
+    def _rows(self, changes):
+        """Filas (medida, celda, bucket, valor) de las entradas no vacías"""
+        rows = []
+        for measure, values in changes.items():
+            flat = _flatten(values)
+            empty = _NO_POSITION if measure[0] == "first" else 0
+            cells, buckets = np.nonzero(flat != empty)
+            key = _measure_key(measure)
+            for cell, bucket, value in zip(cells.tolist(), buckets.tolist(), flat[cells, buckets].tolist()):
+                rows.append({"source": self.source, "measure": key, "cell": cell, "bucket": bucket, "value": value})
+        return rows
+
+    def _save_state(self, snapshot):
+        state = db.session.get(AggregateState, self.source)
+        if state is None:
+            state = AggregateState(source=self.source)
+            db.session.add(state)
+        state.version = snapshot.version
+        state.row_count = int(snapshot.cell_rows.sum())
+        state.layout = self._layout_json(snapshot)
+        state.updated_at = datetime.utcnow()
+
+    def _replace_counts(self, snapshot, changes):
+        """Reemplaza en la sesión la materialización completa (sin confirmar)"""
+        AggregateCount.query.filter_by(source=self.source).delete()
+        rows = self._rows(changes)
+        if rows:
+            db.session.execute(AggregateCount.__table__.insert(), rows)
+        self._save_state(snapshot)
+
+    def _upsert_counts(self, snapshot, changes):
+        """Suma en la sesión un incremento a la materialización (sin confirmar)"""
+        counts_rows, first_rows = [], []
+        for row in self._rows(changes):
+            (first_rows if row["measure"].startswith("first|") else counts_rows).append(row)
+        if counts_rows:
+            stmt = sqlite_insert(AggregateCount)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["source", "measure", "cell", "bucket"],
+                set_={"value": AggregateCount.value + stmt.excluded.value}
+            )
+            db.session.execute(stmt, counts_rows)
+        if first_rows:
+            stmt = sqlite_insert(AggregateCount)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["source", "measure", "cell", "bucket"],
+                set_={"value": stmt.excluded.value}
+            )
+            db.session.execute(stmt, first_rows)
+        self._save_state(snapshot)
+
+    def rebuild(self):
+        """Recalcula los conteos y reemplaza la materialización completa.
+
+        El snapshot se publica recién después de confirmar en la base: la memoria nunca queda
+        adelantada respecto de lo guardado.
+        """
+        with self._write_lock:
+            snapshot, changes = self._build_all()
+            try:
+                self._replace_counts(snapshot, changes)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            self._publish(snapshot)
+
+    def _load(self, state):
+        """Carga los conteos materializados sin recorrer las respuestas"""
+        layout = json.loads(state.layout)
+        if layout["measures"] != [_measure_key(measure) for measure in MEASURES]:
+            return False
+        if layout.get("dimensions") != [param for param, _ in FILTER_DIMENSIONS]:
+            return False
+        # Conteos de segmento calculados con otra segmentación (p. ej. la ola base se reagrupó)
+        segmentation = self.processor.segmentation
+        if (layout.get("segmentation") or {}).get("version") != (segmentation.version if segmentation is not None else None):
+            return False
+
+        labels = layout["labels"]
+        cell_dims = np.array(layout["cells"], dtype=np.int64).reshape(-1, len(FILTER_DIMENSIONS))
+        radix = [len(labels[col]) + 1 for _, col in FILTER_DIMENSIONS]
+        keys = np.ravel_multi_index(cell_dims.T, radix) if len(cell_dims) else []
+        cell_ids = {int(key): i for i, key in enumerate(keys)}
+
+        cells = len(cell_dims)
+        counts = {measure: self._empty(labels, measure, cells) for measure in MEASURES}
+        by_key = {_measure_key(measure): measure for measure in MEASURES}
+        entries = db.session.query(AggregateCount.measure, AggregateCount.cell, AggregateCount.bucket, AggregateCount.value).filter_by(source=self.source).all()
+        for key, cell, bucket, value in entries:
+            measure = by_key[key]
+            counts[measure].reshape(cells, -1)[cell, bucket] = value
+
+        # Cada fila aporta exactamente una entrada a la distribución de la primera dimensión
+        cell_rows = counts[("dist", FILTER_DIMENSIONS[0][1])].sum(axis=1)
+        # Las filas no se materializan: celda e indicadores salen del DataFrame de la misma versión
+        df = self.processor.df
+        try:
+            row_cells = self._row_cells(labels, cell_ids, df)
+        except _LayoutChanged:
+            return False
+        self._publish(DatasetSnapshot(state.version, labels, counts, cell_dims, cell_rows, cell_ids, row_cells,
+                                      self._patterns(df), df, self.processor.segmentation))
+        return True
+
+    def _stored_responses(self):
+        responses = SurveyResponse.query.filter_by(source=self.source).order_by(SurveyResponse.id).all()
+        return [json.loads(response.payload) for response in responses]
+
+    def _segment(self, state):
+        """Etiqueta las filas del archivo con la segmentación compartida, la guardada para este archivo o una nueva"""
+        processor = self.processor
+        if self.segmentation is not None:
+            if processor.segmentation is not self.segmentation:
+                processor.segment(self.segmentation)
+            return
+        current = processor.segmentation
+        if current is not None and current.version == processor.source_digest:
+            return
+        stored = json.loads(state.layout).get("segmentation") if state is not None else None
+        processor.segment(Segmentation.from_dict(stored) if stored and stored["version"] == processor.source_digest else None)
+
+    def sync(self):
+        """Incorpora las respuestas ingresadas y carga (o reconstruye) los agregados materializados"""
+        with self._write_lock:
+            state = db.session.get(AggregateState, self.source)
+            # Se agrupan solo las filas del archivo; las ingresadas se asignan al segmento más cercano
+            self._segment(state)
+            records = self._stored_responses()
+            if records:
+                self.processor.append_responses(records)
+
+            if state is not None and state.version == self.processor.version and self._load(state):
+                return
+            self.rebuild()
+
+    def ingest(self, records):
+        """Agrega respuestas nuevas y actualiza los agregados de forma incremental"""
+        with self._write_lock:
+            records = list(records)
+            base = self._current()
+            previous_df = self.processor.df
+            try:
+                for record in records:
+                    db.session.add(SurveyResponse(source=self.source, payload=json.dumps(record)))
+                new_df = self.processor.append_responses(records)
+                try:
+                    snapshot, changes = self._merge(base, *self._accumulate(base, new_df, len(previous_df)))
+                except _LayoutChanged:
+                    snapshot, changes = self._build_all()
+                    self._replace_counts(snapshot, changes)
+                else:
+                    self._upsert_counts(snapshot, changes)
+                db.session.commit()
+            except Exception:
+                # Sin confirmar en la base, las filas tampoco quedan en memoria
+                db.session.rollback()
+                self.processor.df = previous_df
+                raise
+            self._publish(snapshot)
+            return len(records)
+
+    def reload(self):
+        """Vuelve a leer el archivo Excel y reconstruye los agregados"""
+        with self._write_lock:
+            previous = self.processor.df, self.processor.source_digest, self.processor.segmentation
+            try:
+                self.processor.load_data()
+                self._segment(db.session.get(AggregateState, self.source))
+                records = self._stored_responses()
+                if records:
+                    self.processor.append_responses(records)
+                self.rebuild()
+            except Exception:
+                # El snapshot vigente sigue correspondiendo al DataFrame anterior
+                self.processor.df, self.processor.source_digest, self.processor.segmentation = previous
+                raise
+
+    # ------------------------------------------------------------------
+    # Ponderación
+    # ------------------------------------------------------------------
+
+    def set_margins(self, margins):
+        """Define los márgenes de población por dimensión de filtro (nombre de parámetro o de columna)"""
+        resolved = {}
+        for by, totals in (margins or {}).items():
+            _, _, col = self.dimension(by)
+            if not isinstance(totals, dict):
+                raise ValueError(f"Los márgenes de {col} deben ser un objeto valor -> total")
+            resolved[col] = {}
+            for label, total in totals.items():
+                if isinstance(total, bool) or not isinstance(total, (int, float)) or total < 0:
+                    raise ValueError(f"Total inválido para {col} = {label}: {total}")
+                resolved[col][str(label)] = float(total)
+        # Con datos ya publicados, márgenes incompletos se rechazan antes de reemplazar los vigentes
+        if self.snapshot is not None:
+            self._targets(self.snapshot, resolved)
+        self.margins = resolved
+
+    def _targets(self, snapshot, margins):
+        """(eje, total por código) de cada margen; una categoría con respuestas y sin total es un ValueError"""
+        targets = []
+        for col, totals in margins.items():
+            d, _, _ = self.dimension(col)
+            target = np.full(len(snapshot.labels[col]) + 1, np.nan)
+            for label, total in totals.items():
+                code = snapshot.codes[col].get(label)
+                if code is not None:
+                    target[code] = total
+            responses = np.bincount(snapshot.cell_dims[:, d], weights=snapshot.cell_rows, minlength=len(target))
+            missing = [label for code, label in enumerate(snapshot.labels[col], start=1)
+                       if responses[code] > 0 and np.isnan(target[code])]
+            if missing:
+                raise ValueError(f"Faltan márgenes de población de {col} para: {', '.join(missing)}")
+            targets.append((d, target))
+        return targets
+
+    def _rake(self, snapshot):
+        """Pesos por celda del snapshot; se calculan una vez por versión de los datos y márgenes"""
+        margins = self.margins
+        cached = self._raking
+        if cached is not None and cached[0] is snapshot and cached[1] is margins:
+            return cached[2]
+        if not margins:
+            raise ValueError("No hay márgenes de población configurados para ponderar")
+
+        weights, iterations, error = rake(snapshot.cell_dims, snapshot.cell_rows, self._targets(snapshot, margins))
+        weights.setflags(write=False)
+        raking = {"weights": weights, "iterations": iterations, "max_adjustment": error}
+        self._raking = (snapshot, margins, raking)
+        return raking
+
+    def validate_margins(self):
+        """ValueError si los márgenes no cubren las categorías con respuestas de la versión vigente"""
+        self._rake(self._current())
+
+    def cache_nbytes(self):
+        """Bytes de la caché de ponderación (pesos por celda de la versión actual)"""
+        raking = self._raking
+        return 0 if raking is None else deep_sizeof(raking[2])
+
+    def evict_cache(self, target_bytes=0):
+        """Descarta la caché de ponderación si ocupa más que target_bytes; se recalcula al pedirla"""
+        if self.cache_nbytes() > target_bytes:
+            self._raking = None
+
+    def get_weighting(self):
+        """Márgenes configurados y, por dimensión, respuestas, población y total ponderado de cada valor"""
+        snapshot = self._current()
+        margins = self.margins
+        if not margins:
+            return {"enabled": False, "margins": {}}
+        raking = self._rake(snapshot)
+        dimensions = {}
+        for col, totals in margins.items():
+            d, _, _ = self.dimension(col)
+            codes = snapshot.cell_dims[:, d]
+            size = len(snapshot.labels[col]) + 1
+            responses = np.bincount(codes, weights=snapshot.cell_rows, minlength=size)
+            weighted = np.bincount(codes, weights=snapshot.cell_rows * raking["weights"], minlength=size)
+            dimensions[col] = [
+                {
+                    "value": label,
+                    "population": totals.get(label),
+                    "responses": int(responses[code]),
+                    "weighted": round(float(weighted[code]), 2)
+                }
+                for code, label in enumerate(snapshot.labels[col], start=1)
+            ]
+        return {
+            "enabled": True,
+            "version": snapshot.version,
+            "iterations": raking["iterations"],
+            "max_adjustment": raking["max_adjustment"],
+            "dimensions": dimensions
+        }
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+
+    def current_snapshot(self):
+        """Snapshot vigente, para fijar varias lecturas de una misma respuesta a una sola versión"""
+        return self._current()
+
+    def _current(self):
+        """Snapshot vigente; solo se construye (con bloqueo) si todavía no existe"""
+        snapshot = self.snapshot
+        if snapshot is None:
+            with self._write_lock:
+                if self.snapshot is None:
+                    self.build()
+            snapshot = self.snapshot
+        return snapshot
+
+    def _mask(self, snapshot, filters):
+        filters = filters or {}
+        mask = np.ones(len(snapshot.cell_dims), dtype=bool)
+        for d, (param, col) in enumerate(FILTER_DIMENSIONS):
+            label = filter_label(param, filters.get(param))
+            if label is None:
+                continue
+            code = snapshot.codes[col].get(label)
+            if code is None:
+                mask[:] = False
+                break
+            mask &= snapshot.cell_dims[:, d] == code
+        return mask
+
+    def select(self, filters=None, weighted=False, snapshot=None):
+        """Selección de celdas que cumplen los filtros, fijada al snapshot dado o al vigente"""
+        snapshot = snapshot or self._current()
+        weights = self._rake(snapshot)["weights"] if weighted else None
+        return self._selected(filters, _Selection(snapshot, self._mask(snapshot, filters), min_cell_size=self.min_cell_size, weights=weights))
+
+    def select_many(self, filters_list):
+        """Selecciones para varias combinaciones de filtros que comparten el cálculo de totales"""
+        snapshot = self._current()
+        masks = np.array([self._mask(snapshot, filters) for filters in filters_list], dtype=bool).reshape(len(filters_list), len(snapshot.cell_dims))
+        batch = _Batch(snapshot, masks, self.min_cell_size)
+        return [self._selected(filters, _Selection(snapshot, mask, batch, i)) for i, (filters, mask) in enumerate(zip(filters_list, masks))]
+
+    def _distribution(self, selection, col):
+        counts = selection.measure(("dist", col))
+        labels = (np.nan,) + selection.labels[col]
+        order = np.argsort(-counts, kind="stable")
+        result = {labels[i]: selection.value(counts[i]) for i in order.tolist() if counts[i] > 0}
+        # Las categorías suprimidas (con su complementaria) se informan juntas bajo la clave reservada;
+        # solo queda sin publicar un grupo por debajo del mínimo cuando toda la selección lo está
+        measure = ("dist", col)
+        suppressed = selection.suppressed(measure)
+        if suppressed.any() and selection.raw(measure)[suppressed].sum() >= selection.min_cell_size:
+            result[SUPPRESSED_LABEL] = selection.value(selection.hidden(measure).sum())
+        return result
+
+    def _crosstab(self, selection, spec):
+        names = [name for name, _ in spec]
+        cols = tuple(col for _, col in spec)
+        counts = selection.measure(("cross", cols))
+        result = []
+        for index in np.argwhere(counts > 0).tolist():
+            row = {name: selection.labels[col][i] for name, col, i in zip(names, cols, index)}
+            row["count"] = selection.value(counts[tuple(index)])
+            result.append(row)
+        return result
+
+    def _crosstab_stats(self, selection, spec):
+        """Chi-cuadrado, valor p, V de Cramér y residuos ajustados de un cruce; None si tiene celdas suprimidas.
+
+        La prueba necesita los conteos completos: con ellos, los residuos y el estadístico despejarían
+        las celdas ocultas.
+        """
+        names = [name for name, _ in spec]
+        cols = tuple(col for _, col in spec)
+        measure = ("cross", cols)
+        if selection.suppressed(measure).any():
+            return None
+        statistic, dof, cramers_v, low_expected, residuals = selection.statistics(measure)
+        counts = selection.measure(measure)
+        # Residuos en el mismo orden que las filas del cruce
+        cells = []
+        for index in np.argwhere(counts > 0).tolist():
+            cell = {name: selection.labels[col][i] for name, col, i in zip(names, cols, index)}
+            cell["residual"] = round(float(residuals[tuple(index)]), 3)
+            cells.append(cell)
+        return {
+            "chi_square": round(float(statistic), 4),
+            "dof": int(dof),
+            "p_value": chi_square_sf(float(statistic), int(dof)),
+            "cramers_v": None if np.isnan(cramers_v) else round(float(cramers_v), 4),
+            "low_expected_cells": int(low_expected),
+            "residuals": cells
+        }
+
+    def _workload(self, selection, spec):
+        (by_name, by_col), (first_name, first_col), (second_name, second_col) = spec
+        counts = selection.measure(("cross", (by_col, first_col, second_col)))
+
+        def yes_count(values, col, axis):
+            if "Sí" not in selection.labels[col]:
+                return np.zeros(len(values), dtype=np.int64)
+            index = selection.labels[col].index("Sí")
+            return values.take(index, axis=axis).sum(axis=1)
+
+        first = yes_count(counts, first_col, 1)
+        second = yes_count(counts, second_col, 2)
+        result = []
+        for i in np.nonzero(_flatten(counts).sum(axis=1))[0].tolist():
+            result.append({
+                by_name: selection.labels[by_col][i],
+                first_name: selection.value(first[i]),
+                second_name: selection.value(second[i])
+            })
+        return result
+
+    def numeric_values(self, snapshot, feature):
+        """Valor de cada código de una variable numérica; la tabla se arma una vez por snapshot"""
+        cached = self._numeric
+        if cached is None or cached[0] is not snapshot:
+            cached = self._numeric = (snapshot, {})
+        values = cached[1].get(feature)
+        if values is None:
+            col, _ = NUMERIC_FEATURES[feature]
+            values = cached[1][feature] = lookup_table(feature, snapshot.labels[col])
+        return values
+
+    def _numeric_counts(self, selection, feature):
+        """(valores, conteos visibles) de una variable; None si lo visible no alcanza el tamaño mínimo de celda.
+
+        Misma regla que _distribution: las celdas suprimidas (con sus complementarias) quedan fuera, porque
+        media y cuantiles sobre ellas despejarían sus valores.
+        """
+        measure = ("dist", NUMERIC_FEATURES[feature][0])
+        values = self.numeric_values(selection.snapshot, feature)
+        visible = ~np.isnan(values) & ~selection.suppressed(measure)
+        if selection.raw(measure)[visible].sum() < selection.min_cell_size:
+            return None
+        return values, selection.measure(measure)
+
+    def _mean(self, selection, col):
+        numeric = self._numeric_counts(selection, FEATURE_COLUMNS[col])
+        if numeric is None:
+            return 0
+        values, counts = numeric
+        known = ~np.isnan(values)
+        total = counts[known].sum().item()
+        if total == 0:
+            return 0
+        # np.round (como round() sobre el np.float64 de pandas en la referencia): 8.65 -> 8.6
+        return float(np.round(np.dot(counts[known], values[known]) / total, 1))
+
+    def _numeric_summary(self, selection, feature):
+        """Media, mediana, cuantiles e histograma (con los conteos publicados) de una variable"""
+        col, _ = NUMERIC_FEATURES[feature]
+        values = self.numeric_values(selection.snapshot, feature)
+        published = selection.measure(("dist", col))
+        numeric = self._numeric_counts(selection, feature)
+        summary = summarize(*numeric) if numeric is not None else summarize(values, np.zeros_like(published))
+        summary["histogram"] = [
+            {"label": selection.labels[col][code - 1], "value": float(values[code]), "count": selection.value(published[code])}
+            for code in np.argsort(values, kind="stable").tolist() if not np.isnan(values[code])
+        ]
+        return summary
+
+    def _ranking(self, selection, group, n):
+        """Índices de los n valores más mencionados (desempate por primera aparición, como Counter.most_common).
+
+        Los vectores de frecuencia por celda ya están sumados en la selección; argpartition deja
+        solo los candidatos con al menos el n-ésimo conteo y el orden completo se hace sobre ellos.
+        El resultado se guarda en la selección: top 10, 5 y 3 del mismo grupo se resuelven juntos.
+        """
+        cached = selection.rankings.get(group)
+        if cached is not None and cached[0] >= n:
+            return cached[1][:n]
+        counts = selection.measure(("multi", group))
+        first = selection.measure(("first", group))
+        present = np.flatnonzero(counts)
+        if 0 < n < len(present):
+            values = counts[present]
+            kth = values[np.argpartition(-values, n - 1)[n - 1]]
+            # Los empatados con el n-ésimo entran todos: el desempate decide cuál queda
+            present = present[values >= kth]
+        order = present[np.lexsort((first[present], -counts[present]))][:n]
+        selection.rankings[group] = (n, order)
+        return order
+
+    def _top(self, selection, group, n):
+        """Valores más mencionados con su conteo publicado"""
+        order = self._ranking(selection, group, n)
+        counts = selection.measure(("multi", group))
+        labels = selection.labels[_group_axis(group)]
+        return {labels[i]: selection.value(counts[i]) for i in order.tolist()}
+
+    def _factor_by(self, selection, group, by_col, n):
+        counts = selection.measure(("mcross", group, by_col))
+        labels = selection.labels[_group_axis(group)]
+        by_labels = selection.labels[by_col]
+        result = {}
+        for factor in self._top(selection, group, n):
+            if factor == "nan":
+                continue
+            row = counts[labels.index(factor)]
+            values = {by_labels[i]: selection.value(row[i]) for i in np.nonzero(row)[0].tolist()}
+            if values:
+                result[factor] = values
+        return result
+
+    def _topics(self, selection, col):
+        topics = self._distribution(selection, col)
+        for old_topic, new_topic in TRAINING_TOPICS_MAP.items():
+            if old_topic in topics:
+                topics[new_topic] = topics.get(new_topic, 0) + topics[old_topic]
+                del topics[old_topic]
+        return topics
+
+    def _section(self, selection, section, stats=False):
+        result = {}
+        for key, kind, arg in SECTION_SPECS[section]:
+            if kind == "dist":
+                result[key] = self._distribution(selection, arg)
+            elif kind == "topics":
+                result[key] = self._topics(selection, arg)
+            elif kind == "mean":
+                result[key] = self._mean(selection, arg)
+            elif kind == "cross":
+                result[key] = self._crosstab(selection, arg)
+            elif kind == "workload":
+                result[key] = self._workload(selection, arg)
+            elif kind == "top":
+                result[key] = self._top(selection, *arg)
+            elif kind == "factor_by":
+                result[key] = self._factor_by(selection, *arg)
+        if stats:
+            result["statistics"] = {
+                key: self._crosstab_stats(selection, arg) for key, kind, arg in SECTION_SPECS[section] if kind == "cross"
+            }
+        return result
+
+    def _yes(self, selection, col):
+        """Cantidad de "Sí" en una columna; None si el conteo quedó suprimido"""
+        counts = selection.measure(("dist", col))
+        if "Sí" not in selection.labels[col]:
+            return 0
+        index = selection.labels[col].index("Sí") + 1
+        if selection.suppressed(("dist", col))[index]:
+            return None
+        return counts[index].item()
+
+    def _both(self, selection, cols, labels):
+        counts = selection.measure(("cross", cols))
+        try:
+            index = tuple(selection.labels[col].index(label) for col, label in zip(cols, labels))
+        except ValueError:
+            return 0
+        if selection.suppressed(("cross", cols))[index]:
+            return None
+        return counts[index].item()
+
+    def _intervals(self, selection, kpis, method="wilson", level=0.95, samples=None):
+        """Intervalos de confianza (en porcentaje) de cada KPI y del índice de clima organizacional"""
+        snapshot = selection.snapshot
+        selected = selection.mask[snapshot.row_cells]
+        rows = snapshot.row_patterns[selected]
+        if selection.weights is None:
+            patterns, frequencies = np.unique(rows, return_counts=True)
+            weights = None
+        else:
+            # Con pesos, las respuestas se agrupan por (patrón, celda): el peso es constante en cada celda
+            cells = len(snapshot.cell_rows)
+            keys, frequencies = np.unique(rows * cells + snapshot.row_cells[selected], return_counts=True)
+            patterns, weights = keys // cells, selection.weights[keys % cells]
+        bits = ((patterns[:, None] >> np.arange(len(KPI_INDICATORS))) & 1).astype(float)
+        climate = [i for i, (key, _, _) in enumerate(KPI_INDICATORS) if key in dict(KPI_CLIMATE)]
+        # Puntaje de clima de cada respuesta: el índice es su promedio
+        scores = bits[:, climate].mean(axis=1)
+
+        if method == "bootstrap":
+            low, high = bootstrap_means(np.column_stack([bits, scores]), frequencies, samples, level, weights)
+        else:
+            z = Z_VALUES[level]
+            n = effective_size(frequencies, weights)
+            low, high = wilson_interval(weighted_means(bits, frequencies, weights) * n, n, z)
+            climate_low, climate_high = mean_interval(scores, frequencies, z, weights)
+            low, high = np.append(low, climate_low), np.append(high, climate_high)
+
+        values = {**kpis, **kpis["climate_components"]}
+        keys = [key for key, _, _ in KPI_INDICATORS] + ["organizational_climate_index"]
+        return {
+            "method": method,
+            "level": level,
+            "intervals": {
+                key: None if values[key] is None else [round(a * 100, 2), round(b * 100, 2)]
+                for key, a, b in zip(keys, low.tolist(), high.tolist())
+            }
+        }
+
+    def _kpis(self, selection, ci=None):
+        total_responses = selection.rows
+        if total_responses < max(selection.min_cell_size, 1):
+            kpis = {
+                "total_responses": 0,
+                **{key: 0 for key, _ in KPI_PERCENTAGES},
+                "integral_health_index": 0,
+                "overload_index": 0,
+                "work_life_balance_index": 0,
+                "organizational_climate_index": 0,
+                "economic_satisfaction_percentage": 0,
+                "work_accidents_rate": 0,
+                "service_usage_percentage": 0,
+                "top_factors_to_improve": {},
+                "climate_components": {key: 0 for key, _ in KPI_CLIMATE}
+            }
+            if total_responses:
+                kpis["suppressed"] = True
+            return kpis
+
+        # Con pesos los porcentajes se calculan sobre la población estimada
+        denominator = selection.total
+
+        def percentage(count):
+            if count is None:
+                return None
+            return round((count / denominator) * 100, 2)
+
+        kpis = {"total_responses": total_responses}
+        if selection.weights is not None:
+            kpis["weighted_total"] = round(denominator, 2)
+        for key, col in KPI_PERCENTAGES:
+            kpis[key] = percentage(self._yes(selection, col))
+        kpis["integral_health_index"] = percentage(self._both(selection, KPI_INTEGRAL_HEALTH, ("Buena", "Buena")))
+        kpis["overload_index"] = percentage(self._both(selection, KPI_OVERLOAD, ("Sí", "Sí")))
+        kpis["work_life_balance_index"] = percentage(self._yes(selection, BALANCE))
+
+        climate_counts = [self._yes(selection, col) for _, col in KPI_CLIMATE]
+        climate_components = [None if count is None else (count / denominator) * 100 for count in climate_counts]
+        if None in climate_components:
+            kpis["organizational_climate_index"] = None
+        else:
+            kpis["organizational_climate_index"] = round(sum(climate_components) / len(climate_components), 2)
+        kpis["economic_satisfaction_percentage"] = percentage(self._yes(selection, ECONOMIC))
+        kpis["work_accidents_rate"] = percentage(self._yes(selection, ACCIDENTS))
+        kpis["service_usage_percentage"] = percentage(self._yes(selection, USAGE))
+        kpis["top_factors_to_improve"] = self._top(selection, "factors", 3)
+        kpis["climate_components"] = {
+            key: None if value is None else round(value, 2) for (key, _), value in zip(KPI_CLIMATE, climate_components)
+        }
+        if ci:
+            kpis["confidence_intervals"] = self._intervals(selection, kpis, **ci)
+        return kpis
+
+    def get_demographics_data(self, filters=None, stats=False, weighted=False):
+        """Retorna datos demográficos desde los conteos precalculados"""
+        return self._section(self.select(filters, weighted), "demographics", stats)
+
+    def get_habits_data(self, filters=None, stats=False, weighted=False):
+        """Retorna datos de hábitos desde los conteos precalculados"""
+        return self._section(self.select(filters, weighted), "habits", stats)
+
+    def get_health_data(self, filters=None, stats=False, weighted=False):
+        """Retorna datos de salud desde los conteos precalculados"""
+        return self._section(self.select(filters, weighted), "health", stats)
+
+    def get_knowledge_data(self, filters=None, stats=False, weighted=False):
+        """Retorna datos de conocimiento desde los conteos precalculados"""
+        return self._section(self.select(filters, weighted), "knowledge", stats)
+
+    def get_quality_of_life_data(self, filters=None, stats=False, weighted=False):
+        """Retorna datos de calidad de vida desde los conteos precalculados"""
+        return self._section(self.select(filters, weighted), "quality_of_life", stats)
+
+    def get_comprehensive_kpis(self, filters=None, ci=None, weighted=False, snapshot=None):
+        """Retorna KPIs desde los conteos precalculados (ci: {"method", "level", "samples"} para intervalos)"""
+        return self._kpis(self.select(filters, weighted, snapshot), ci)
+
+    def get_kpis(self, filters=None, ci=None, weighted=False):
+        """Alias para mantener compatibilidad"""
+        return self.get_comprehensive_kpis(filters, ci, weighted)
+
+    def get_numeric_summary(self, filters=None, features=None, weighted=False):
+        """Resumen numérico de las respuestas ordinales (edad, antigüedad, salud, hijos, frecuencia)"""
+        selection = self.select(filters, weighted)
+        return {feature: self._numeric_summary(selection, feature) for feature in features or NUMERIC_FEATURES}
+
+    def get_section(self, section, filters=None, stats=False, weighted=False, snapshot=None):
+        """Una sección (o "kpis") para una combinación de filtros, opcionalmente fijada a un snapshot"""
+        return self._build(self.select(filters, weighted, snapshot), section, stats=stats)
+
+    def _build(self, selection, section, ci=None, stats=False):
+        return self._kpis(selection, ci) if section == "kpis" else self._section(selection, section, stats)
+
+    def _payload(self, selection, sections, ci=None, stats=False):
+        return {section: self._build(selection, section, ci, stats) for section in sections}
+
+    def get_filtered_data(self, filters, ci=None, stats=False, weighted=False):
+        """Retorna todas las secciones para una combinación de filtros"""
+        return self._payload(self.select(filters, weighted), SECTIONS + ["kpis"], ci, stats)
+
+    def iter_sections(self, filters=None, sections=None, ci=None, stats=False, weighted=False, snapshot=None):
+        """Genera (sección, datos) de a una, calculando cada sección recién cuando se pide"""
+        selection = self.select(filters, weighted, snapshot)
+        for section in sections or SECTIONS + ["kpis"]:
+            yield section, self._build(selection, section, ci, stats)
+
+    def get_batch(self, queries):
+        """Evalúa varias consultas (filtros, secciones) en una sola pasada y las retorna en orden"""
+        queries = list(queries)
+        selections = self.select_many([filters for filters, _ in queries])
+        for selection, (_, sections) in zip(selections, queries):
+            yield self._payload(selection, sections)
+
+    def dimension(self, by):
+        """Índice y columna de una dimensión de filtro, por nombre de parámetro o de columna"""
+        for d, (param, col) in enumerate(FILTER_DIMENSIONS):
+            if by in (param, col):
+                return d, param, col
+        raise ValueError(f"Dimensión desconocida: {by}")
+
+    def get_breakdown(self, by, sections, filters=None, stats=False, weighted=False):
+        """Retorna las secciones pedidas separadas por cada valor de una dimensión de filtro"""
+        snapshot = self._current()
+        d, param, col = self.dimension(by)
+        requested, filters = filters, dict(filters or {})
+        filters.pop(param, None)
+
+        # Una máscara por valor de la dimensión: todas se resuelven con un único _Batch
+        labels = snapshot.labels[col]
+        codes = np.arange(1, len(labels) + 1)
+        masks = (snapshot.cell_dims[:, d][None, :] == codes[:, None]) & self._mask(snapshot, filters)
+        weights = self._rake(snapshot)["weights"] if weighted else None
+        batch = _Batch(snapshot, masks, self.min_cell_size, weights)
+        # Los grupos juntos: las respuestas que cubre el desglose
+        self._selected(requested, _Selection(snapshot, masks.any(axis=0), min_cell_size=self.min_cell_size))
+        return {
+            "dimension": col,
+            "groups": [
+                {"value": label, "data": self._payload(_Selection(snapshot, mask, batch, i), sections, stats=stats)}
+                for i, (label, mask) in enumerate(zip(labels, masks))
+            ]
+        }
+
+    def get_filter_options(self, snapshot=None):
+        """Retorna las opciones disponibles para los filtros"""
+        labels = (snapshot or self._current()).labels
+        return {
+            "distritos": list(labels[FIELDS["district"]]),
+            "generos": list(labels[FIELDS["gender"]]),
+            "edades": list(labels[FIELDS["age"]]),
+            "jerarquias": list(labels[FIELDS["hierarchy"]]),
+            "estados_civiles": list(labels[FIELDS["civil_status"]]),
+            "segmentos": list(labels[SEGMENT])
+        }
+
+    def get_segments(self, filters=None, weighted=False):
+        """Perfil de cada segmento y cuántos encuestados de la selección pertenecen a él"""
+        selection = self.select(filters, weighted)
+        measure = ("dist", SEGMENT)
+        counts = selection.measure(measure)
+        suppressed = selection.suppressed(measure)
+        segmentation = selection.snapshot.segmentation
+        profiles = segmentation.profiles if segmentation is not None else {}
+        return {
+            "version": selection.snapshot.version,
+            "segments": [
+                dict(profiles.get(label, {"fit_rows": 0, "answers": []}), segment=label,
+                     count=None if suppressed[i + 1] else selection.value(counts[i + 1]))
+                for i, label in enumerate(selection.labels[SEGMENT])
+            ]
+        }
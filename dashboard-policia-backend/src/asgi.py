@@ -0,0 +1,72 @@
+import asyncio
+import contextlib
+import os
+from urllib.parse import parse_qs
+
+from a2wsgi import WSGIMiddleware
+from werkzeug.test import EnvironBuilder
+
+from src.main import app
+from src.routes.dashboard import kpi_feed
+
+SSE_PATH = '/api/kpis/stream'
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+
+class DashboardAsgi:
+    """Aplicación ASGI: la app Flask va por a2wsgi (pool de hilos acotado) y el stream SSE de KPIs se atiende sin hilos"""
+
+    def __init__(self, flask_app, workers=10):
+        self.flask_app = flask_app
+        self.wsgi = WSGIMiddleware(flask_app, workers=workers)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == SSE_PATH and scope['method'] == 'GET':
+            await self._sse(scope, receive, send)
+        else:
+            await self.wsgi(scope, receive, send)
+
+    def _headers(self, scope):
+        """Cabeceras del stream con los hooks de la app aplicados (CORS según la configuración de main.py)"""
+        builder = EnvironBuilder(
+            path=scope['path'],
+            method=scope['method'],
+            query_string=scope.get('query_string', b'').decode('latin-1'),
+            headers=[(name.decode('latin-1'), value.decode('latin-1')) for name, value in scope.get('headers', [])],
+        )
+        with self.flask_app.request_context(builder.get_environ()):
+            self.flask_app.preprocess_request()
+            response = self.flask_app.response_class(mimetype='text/event-stream', headers=SSE_HEADERS)
+            response = self.flask_app.process_response(response)
+        return [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in response.headers.items() if name.lower() != 'content-length']
+
+    async def _sse(self, scope, receive, send):
+        """KPIs por Server-Sent Events sin ocupar un hilo por suscriptor"""
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        headers = dict(scope.get('headers', []))
+        last_version = headers.get(b'last-event-id', b'').decode('latin-1') or query.get('since', [None])[0]
+        diff = query.get('diff', [''])[0] in ('1', 'true')
+
+        response_headers = await asyncio.get_running_loop().run_in_executor(None, self._headers, scope)
+        await send({'type': 'http.response.start', 'status': 200, 'headers': response_headers})
+
+        async def pump():
+            async with contextlib.aclosing(kpi_feed.astream(last_version, diff)) as messages:
+                async for message in messages:
+                    await send({'type': 'http.response.body', 'body': message.encode('utf-8'), 'more_body': True})
+
+        async def disconnected():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        tasks = [asyncio.ensure_future(pump()), asyncio.ensure_future(disconnected())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+application = DashboardAsgi(app, workers=int(os.environ.get('DASHBOARD_WORKERS', 10)))
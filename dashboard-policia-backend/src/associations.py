@@ -0,0 +1,156 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from src.memory import deep_sizeof
+from src.schema import FIELDS, HEADER_POSITIONS
+
+# Matrices guardadas por versión de los datos y selección de celdas
+MAX_CACHED_MATRICES = 64
+FIELD_IDS = {header: field for field, header in FIELDS.items()}
+
+
+def _blocks(matrix, starts, axes=(0, 1)):
+    """Suma por bloques de categorías (un bloque por pregunta) en los ejes pedidos"""
+    for axis in axes:
+        matrix = np.add.reduceat(matrix, starts, axis=axis)
+    return matrix
+
+
+def _rounded(matrix, digits=4):
+    return [[None if np.isnan(value) else round(value, digits) for value in row] for row in matrix.tolist()]
+
+
+def association_matrices(onehot, starts, block):
+    """V de Cramér, información mutua (nats) y pares respondidos para todas las preguntas a la vez.
+
+    Una sola multiplicación onehotᵀ · onehot da todas las tablas de contingencia; cada par de
+    preguntas es un bloque. Los totales marginales de cada bloque salen de sumas por bloques, así
+    que cada par usa solo las respuestas que contestaron ambas preguntas.
+    """
+    observed = (onehot.T @ onehot).astype(np.float64)
+    pairs = _blocks(observed, starts)
+    # Total de la categoría a entre quienes respondieron la pregunta del bloque b (y su transpuesta)
+    row_totals = _blocks(observed, starts, axes=(1,))[:, block]
+    col_totals = _blocks(observed, starts, axes=(0,))[block, :]
+    expected_base = row_totals * col_totals
+    present = observed > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        chi_terms = np.where(present, observed ** 2 / expected_base, 0.0)
+        mi_terms = np.where(present, observed * np.log(observed * pairs[block][:, block] / expected_base), 0.0)
+        chi2 = pairs * _blocks(chi_terms, starts) - pairs
+        mutual_information = _blocks(mi_terms, starts) / pairs
+        # Categorías efectivas de cada pregunta entre quienes respondieron la otra
+        levels = _blocks((_blocks(observed, starts, axes=(1,)) > 0).astype(np.float64), starts, axes=(0,))
+        dof = np.minimum(levels, levels.T) - 1
+        cramers_v = np.sqrt(np.clip(chi2 / (pairs * dof), 0, 1))
+    cramers_v[(pairs == 0) | (dof <= 0)] = np.nan
+    mutual_information[pairs == 0] = np.nan
+    return cramers_v, np.maximum(mutual_information, 0), pairs
+
+
+class AssociationMatrix:
+    """Asociación entre todas las preguntas codificadas, guardada por versión de los datos y filtro"""
+
+    def __init__(self, store, max_cached=MAX_CACHED_MATRICES):
+        self.store = store
+        self.max_cached = max_cached
+        self._encoding = None
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+
+    def _encode(self, snapshot):
+        """(columnas, inicio de cada bloque, pregunta de cada categoría, one-hot) de las respuestas"""
+        cached = self._encoding
+        if cached is not None and cached[0] is snapshot:
+            return cached[1]
+        # Las respuestas de la misma versión que los conteos, aunque el procesador ya tenga otras
+        df = snapshot.frame
+        columns = [col for col in FIELDS.values() if snapshot.labels.get(col)]
+        sizes = [len(snapshot.labels[col]) for col in columns]
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.intp)
+        onehot = np.zeros((len(df), sum(sizes)), dtype=np.float32)
+        for col, start in zip(columns, starts.tolist()):
+            codes = pd.Categorical(df.iloc[:, HEADER_POSITIONS[col]], categories=snapshot.labels[col]).codes.astype(np.intp)
+            rows = np.flatnonzero(codes >= 0)
+            onehot[rows, start + codes[rows]] = 1
+        encoding = (columns, starts, np.repeat(np.arange(len(columns)), sizes), onehot)
+        self._encoding = (snapshot, encoding)
+        return encoding
+
+    def get(self, filters=None, target=None):
+        """Matrices de V de Cramér e información mutua; con target, el ranking de esa pregunta"""
+        selection = self.store.select(filters)
+        snapshot = selection.snapshot
+        key = (snapshot.version, hashlib.sha1(selection.mask.tobytes()).hexdigest())
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+        if cached is not None:
+            result = cached[0]
+        else:
+            result = self._compute(snapshot, selection)
+            size = deep_sizeof(result)
+            with self._lock:
+                if key not in self._cache:
+                    self._cache[key] = (result, size)
+                    self._cache_bytes += size
+                while len(self._cache) > self.max_cached:
+                    self._pop_oldest()
+        if target is None:
+            return result
+        return dict(result, ranking=self._ranking(result, target))
+
+    def _compute(self, snapshot, selection):
+        columns, starts, block, onehot = self._encode(snapshot)
+        rows = selection.mask[snapshot.row_cells]
+        result = {
+            "version": snapshot.version,
+            "rows": int(rows.sum()),
+            "questions": [{"field": FIELD_IDS[col], "question": col.strip()} for col in columns],
+        }
+        if result["rows"] < max(selection.min_cell_size, 1):
+            # Sin respuestas suficientes (o por debajo del tamaño mínimo de celda) no se publica
+            return dict(result, cramers_v=None, mutual_information=None, pairs=None)
+        cramers_v, mutual_information, pairs = association_matrices(onehot[rows], starts, block)
+        return dict(result, cramers_v=_rounded(cramers_v), mutual_information=_rounded(mutual_information),
+                    pairs=pairs.astype(np.int64).tolist())
+
+    @staticmethod
+    def _ranking(result, target):
+        """Preguntas ordenadas por su V de Cramér con target (id de campo o encabezado)"""
+        fields = [question["field"] for question in result["questions"]]
+        field = target if target in fields else FIELD_IDS.get(target)
+        if field not in fields:
+            raise ValueError(f"Pregunta desconocida: {target}")
+        if result["cramers_v"] is None:
+            return []
+        i = fields.index(field)
+        ranking = [
+            {**question, "cramers_v": result["cramers_v"][i][j],
+             "mutual_information": result["mutual_information"][i][j], "pairs": result["pairs"][i][j]}
+            for j, question in enumerate(result["questions"]) if j != i and result["cramers_v"][i][j] is not None
+        ]
+        return sorted(ranking, key=lambda item: item["cramers_v"], reverse=True)
+
+    def _pop_oldest(self):
+        _, (_, size) = self._cache.popitem(last=False)
+        self._cache_bytes -= size
+
+    def cache_nbytes(self):
+        """Bytes de las matrices guardadas y de la codificación one-hot"""
+        encoding = self._encoding
+        return self._cache_bytes + (0 if encoding is None else int(encoding[1][3].nbytes))
+
+    def evict_cache(self, target_bytes=0):
+        """Descarta matrices (las usadas hace más tiempo primero) y, si no alcanza, la codificación"""
+        with self._lock:
+            while self._cache and self.cache_nbytes() > target_bytes:
+                self._pop_oldest()
+            if self.cache_nbytes() > target_bytes:
+                self._encoding = None
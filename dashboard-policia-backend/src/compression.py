@@ -0,0 +1,55 @@
+import gzip
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se generan variantes gzip
+    brotli = None
+
+from flask import Response
+
+# Extensión de archivo de cada codificación, en orden de preferencia
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+
+def compress_variants(data):
+    """Variantes precomprimidas de un contenido: {codificación: bytes}"""
+    variants = {"identity": data}
+    if brotli is not None:
+        variants["br"] = brotli.compress(data, quality=11)
+    variants["gzip"] = gzip.compress(data, compresslevel=9, mtime=0)
+    return variants
+
+
+def accepted_encodings(accept_encoding):
+    """Codificaciones aceptadas por el cliente según Accept-Encoding (ignora q=0)"""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name and params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(name.lower())
+    return accepted
+
+
+def choose_encoding(accept_encoding, available):
+    """Mejor codificación disponible que acepta el cliente"""
+    accepted = accepted_encodings(accept_encoding)
+    for encoding, _ in ENCODINGS:
+        if encoding in available and (encoding in accepted or "*" in accepted):
+            return encoding
+    return "identity"
+
+
+def precompressed_response(request, variants, mimetype, etag=None, cache_control=None):
+    """Respuesta con la variante precomprimida adecuada, ETag y 304 si el cliente ya la tiene"""
+    headers = {"Vary": "Accept-Encoding"}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    if etag:
+        headers["ETag"] = f'"{etag}"'
+        if etag in [tag.strip().strip('"').removeprefix('W/"') for tag in request.headers.get("If-None-Match", "").split(",")]:
+            return Response(status=304, headers=headers)
+
+    encoding = choose_encoding(request.headers.get("Accept-Encoding"), variants)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(variants[encoding], mimetype=mimetype, headers=headers)
@@ -1,34 +1,93 @@
 import pandas as pd
 import numpy as np
 from collections import Counter
+import hashlib
 import os
 
+from src.schema import FIELD_GROUPS, FIELD_POSITIONS, SCHEMA, SENIORITY_MAP, YES_NO_FIELDS, column
+from src.segments import SEGMENT, Segmentation
+
 class DataProcessor:
-    def __init__(self, excel_path):
+    def __init__(self, excel_path, df=None, source_digest=None, segmentation=None, fit_segments=True):
         self.excel_path = excel_path
-        self.df = None
-        self.load_data()
+        self.df = df
+        self.source_digest = source_digest
+        # Segmentos de encuestados ajustados al archivo (src/segments.py); None sin segmentar
+        self.segmentation = segmentation
+        # Con False no se agrupa al cargar: se etiqueta con `segmentation` (aunque venga de otro
+        # archivo) o se espera a segment(), p. ej. para restaurar la segmentación guardada
+        self.fit_segments = fit_segments
+        if df is None:
+            self.load_data()
+    
+    @property
+    def version(self):
+        """Identificador de la versión de los datos (archivo + filas ingresadas)"""
+        if self.df is None:
+            return None
+        return f"{self.source_digest}-{len(self.df)}"
     
     def load_data(self):
         """Carga los datos del archivo Excel"""
         try:
-            self.df = pd.read_excel(self.excel_path)
-            self.clean_data()
+            with open(self.excel_path, "rb") as f:
+                source_digest = hashlib.sha1(f.read()).hexdigest()[:16]
+            # Los encabezados del libro se resuelven una vez a los campos del registro (src/schema.py)
+            df = self._clean_frame(SCHEMA.conform(pd.read_excel(self.excel_path)))
+            # Solo se vuelve a agrupar si cambió el archivo; las respuestas ingresadas se asignan al segmento más cercano
+            segmentation = self.segmentation
+            if self.fit_segments and (segmentation is None or segmentation.version != source_digest):
+                segmentation = Segmentation(source_digest).fit(df)
+            if segmentation is not None:
+                df = segmentation.label(df)
+            # Se reemplazan juntos al final para no exponer un estado a medio cargar
+            self.source_digest, self.df, self.segmentation = source_digest, df, segmentation
         except Exception as e:
             print(f"Error loading data: {e}")
             raise
     
+    def segment(self, segmentation=None):
+        """Etiqueta df con `segmentation` o, si es None, con una ajustada a las filas actuales"""
+        if segmentation is None:
+            segmentation = Segmentation(self.source_digest).fit(self.df)
+        self.df, self.segmentation = segmentation.label(self.df), segmentation
+
+    def append_responses(self, records):
+        """Agrega nuevas respuestas (dicts columna -> valor) y retorna las filas limpias agregadas"""
+        if self.df is None:
+            return None
+        
+        new_df = pd.DataFrame.from_records(list(records), columns=self.df.columns)
+        for col in new_df.columns:
+            if pd.api.types.is_numeric_dtype(self.df[col]):
+                new_df[col] = pd.to_numeric(new_df[col], errors="coerce")
+            else:
+                new_df[col] = new_df[col].astype(object).where(new_df[col].notna(), np.nan)
+        new_df = self._clean_frame(new_df)
+        if self.segmentation is not None:
+            new_df[SEGMENT] = self.segmentation.assign(new_df)
+        new_df.index = pd.RangeIndex(len(self.df), len(self.df) + len(new_df))
+        
+        self.df = pd.concat([self.df, new_df])
+        return new_df
+    
     def clean_data(self):
         """Limpia y prepara los datos"""
         if self.df is None:
             return
+        self.df = self._clean_frame(self.df)
+    
+    @staticmethod
+    def _clean_frame(df):
+        """Aplica la limpieza estándar a un DataFrame de respuestas"""
+        df = df.copy()
         
         # Limpiar espacios en blanco en columnas de texto
-        for col in self.df.select_dtypes(include=["object"]).columns:
-            self.df[col] = self.df[col].astype(str).str.strip()
+        for col in df.select_dtypes(include=["object"]).columns:
+            df[col] = df[col].astype(str).str.strip()
         
         # Reemplazar NaN y strings 'nan' con valores consistentes para análisis
-        self.df = self.df.replace({"nan": np.nan, "NaT": np.nan})
+        df = df.replace({"nan": np.nan, "NaT": np.nan})
         
         # Asegurar que las columnas de Sí/No/A veces sean consistentes
         # Mapeo para estandarizar respuestas 'Sí', 'No', 'A veces'
@@ -44,55 +103,26 @@ class DataProcessor:
             "A VECES": "A veces"
         }
 
-        columns_to_standardize = [
-            "¿Realiza algún tipo de actividad física?",
-            "¿Tiene hijos?",
-            "¿Consideras que tienen hábitos tendientes a un estilo de vida sano?",
-            "¿Realiza servicios adicionales?",
-            "¿Tiene recargo de servicios?",
-            "¿Realizas alguna actividad remunerada extra?",
-            "¿Tiene algún hobbies?",
-            "¿Se ha realizado algún chequeo en los últimos 12 meses?",
-            "¿Has experimentado algún incidente o accidente laboral en los últimos 12 meses?",
-            "¿Has recibido capacitación en seguridad y salud en el trabajo en los últimos 12 meses?",
-            "¿Tiene conocimiento  de los servicios relacionados a la salud ocupacional que proporciona la institución policial?",
-            "¿Los ha utilizado?",
-            "¿Esta conforme?",
-            "¿Tienes acceso a equipos y herramientas adecuadas para realizar sus funciones?",
-            "¿Tienes oportunidades para el desarrollo profesional y el ascenso?",
-            "¿Te sientes valorado y reconocido por tus superiores?",
-            "¿Te sientes cómodo comunicándote con tus superiores y compañeros?",
-            " ¿Considera que debe mejorar algunos de estos factores para contribuir a una mejor calidad de vida?",
-            "¿Te sientes satisfecho con la situación económica de su hogar?",
-            "¿Sientes que hay congruencias entre el riesgo y el esfuerzo en relación a la remuneración recibida?",
-            "¿Te sientes cómodo con el equilibrio entre tu vida laboral y personal?",
-            "Salud física actual",
-            "Salud mental actual"
-        ]
+        for field in YES_NO_FIELDS:
+            # Por posición: el DataFrame viene normalizado por SurveySchema.conform
+            position = FIELD_POSITIONS[field]
+            values = df.iloc[:, position]
+            values = values.map(standard_map).fillna(values) # Apply map, keep original if not in map
+            # Replace any remaining 'nan' strings with actual NaN
+            df.isetitem(position, values.replace('nan', np.nan))
+        
+        return df
 
-        for col in columns_to_standardize:
-            if col in self.df.columns:
-                self.df[col] = self.df[col].map(standard_map).fillna(self.df[col]) # Apply map, keep original if not in map
-                # Replace any remaining 'nan' strings with actual NaN
-                self.df[col] = self.df[col].replace('nan', np.nan)
+    def _fields(self, *fields):
+        """Columnas de los campos (por posición) con el nombre del campo, sin las filas con algún vacío"""
+        return pd.concat({field: column(self.df, field) for field in fields}, axis=1).dropna()
 
     def convert_seniority_to_numeric(self, seniority_text):
         """Convierte rangos de antigüedad a valores numéricos (punto medio del rango)"""
         if pd.isna(seniority_text) or str(seniority_text).strip().lower() == "nan":
             return np.nan
         
-        seniority_map = {
-            "Menos de 1 año": 0.5,
-            "1 a 5 años": 3,
-            "6 a 10 años": 8,
-            "11 a 15 años": 13,
-            "16 a 20 años": 18,
-            "21 a 25 años": 23,
-            "26 a 30 años": 28,
-            "Más de 30 años": 35
-        }
-        
-        return seniority_map.get(seniority_text, np.nan)
+        return SENIORITY_MAP.get(seniority_text, np.nan)
     
     def get_demographics_data(self):
         """Retorna datos demográficos con conexiones avanzadas"""
@@ -100,64 +130,65 @@ class DataProcessor:
             return {}
         
         # Distribuciones básicas
-        gender_dist = self.df["Género"].value_counts(dropna=False).to_dict()
-        age_dist = self.df["Edad"].value_counts(dropna=False).to_dict()
-        hierarchy_dist = self.df["Jerarquía"].value_counts(dropna=False).to_dict()
-        district_dist = self.df["Distrito"].value_counts(dropna=False).to_dict()
-        civil_status_dist = self.df["Estado Civil"].value_counts(dropna=False).to_dict()
-        seniority_dist = self.df["Antigüedad de Servicio"].value_counts(dropna=False).to_dict()
+        gender_dist = column(self.df, "gender").value_counts(dropna=False).to_dict()
+        age_dist = column(self.df, "age").value_counts(dropna=False).to_dict()
+        hierarchy_dist = column(self.df, "hierarchy").value_counts(dropna=False).to_dict()
+        district_dist = column(self.df, "district").value_counts(dropna=False).to_dict()
+        civil_status_dist = column(self.df, "civil_status").value_counts(dropna=False).to_dict()
+        seniority_dist = column(self.df, "seniority").value_counts(dropna=False).to_dict()
         
         # Promedio de antigüedad
-        numeric_seniority = self.df["Antigüedad de Servicio"].apply(self.convert_seniority_to_numeric)
+        # Búsqueda vectorizada en la tabla de rangos (equivale a convert_seniority_to_numeric por fila)
+        numeric_seniority = column(self.df, "seniority").map(SENIORITY_MAP)
         avg_seniority = round(numeric_seniority.mean(), 1) if not numeric_seniority.dropna().empty else 0
         
         # NUEVAS CONEXIONES DEMOGRÁFICAS
         
         # Género vs Servicios Adicionales
         # Asegurarse de que las columnas existan y no sean NaN
-        df_filtered = self.df.dropna(subset=["Género", "¿Realiza servicios adicionales?"])
-        gender_additional_services = df_filtered.groupby(["Género", "¿Realiza servicios adicionales?"]).size().reset_index(name="count")
+        df_filtered = self._fields("gender", "additional_services")
+        gender_additional_services = df_filtered.groupby(["gender", "additional_services"]).size().reset_index(name="count")
         gender_services_data = []
         for _, row in gender_additional_services.iterrows():
             gender_services_data.append({
-                "gender": row["Género"],
-                "additional_services": row["¿Realiza servicios adicionales?"],
+                "gender": row["gender"],
+                "additional_services": row["additional_services"],
                 "count": row["count"]
             })
         
         # Jerarquía vs Carga Laboral (servicios adicionales + recargos)
-        df_filtered = self.df.dropna(subset=["Jerarquía", "¿Realiza servicios adicionales?", "¿Tiene recargo de servicios?"])
-        hierarchy_workload = df_filtered.groupby("Jerarquía").agg({
-            "¿Realiza servicios adicionales?": lambda x: (x == "Sí").sum(),
-            "¿Tiene recargo de servicios?": lambda x: (x == "Sí").sum()
+        df_filtered = self._fields("hierarchy", "additional_services", "service_overload")
+        hierarchy_workload = df_filtered.groupby("hierarchy").agg({
+            "additional_services": lambda x: (x == "Sí").sum(),
+            "service_overload": lambda x: (x == "Sí").sum()
         }).reset_index()
         hierarchy_workload_data = []
         for _, row in hierarchy_workload.iterrows():
             hierarchy_workload_data.append({
-                "hierarchy": row["Jerarquía"],
-                "additional_services": row["¿Realiza servicios adicionales?"],
-                "service_overload": row["¿Tiene recargo de servicios?"]
+                "hierarchy": row["hierarchy"],
+                "additional_services": row["additional_services"],
+                "service_overload": row["service_overload"]
             })
         
         # Antigüedad vs Conocimiento de Servicios
-        df_filtered = self.df.dropna(subset=["Antigüedad de Servicio", "¿Tiene conocimiento  de los servicios relacionados a la salud ocupacional que proporciona la institución policial?"])
-        seniority_knowledge = df_filtered.groupby(["Antigüedad de Servicio", "¿Tiene conocimiento  de los servicios relacionados a la salud ocupacional que proporciona la institución policial?"]).size().reset_index(name="count")
+        df_filtered = self._fields("seniority", "occupational_knowledge")
+        seniority_knowledge = df_filtered.groupby(["seniority", "occupational_knowledge"]).size().reset_index(name="count")
         seniority_knowledge_data = []
         for _, row in seniority_knowledge.iterrows():
             seniority_knowledge_data.append({
-                "seniority": row["Antigüedad de Servicio"],
-                "knows_services": row["¿Tiene conocimiento  de los servicios relacionados a la salud ocupacional que proporciona la institución policial?"],
+                "seniority": row["seniority"],
+                "knows_services": row["occupational_knowledge"],
                 "count": row["count"]
             })
         
         # Distribución por edad y jerarquía
-        df_filtered = self.df.dropna(subset=["Edad", "Jerarquía"])
-        age_hierarchy = df_filtered.groupby(["Edad", "Jerarquía"]).size().reset_index(name="count")
+        df_filtered = self._fields("age", "hierarchy")
+        age_hierarchy = df_filtered.groupby(["age", "hierarchy"]).size().reset_index(name="count")
         age_hierarchy_data = []
         for _, row in age_hierarchy.iterrows():
             age_hierarchy_data.append({
-                "age_range": row["Edad"],
-                "hierarchy": row["Jerarquía"],
+                "age_range": row["age"],
+                "hierarchy": row["hierarchy"],
                 "count": row["count"]
             })
         
@@ -181,84 +212,82 @@ class DataProcessor:
             return {}
         
         # Distribuciones básicas
-        physical_activity = self.df["¿Realiza algún tipo de actividad física?"].value_counts(dropna=False).to_dict()
-        frequency = self.df["¿Con qué frecuencia?"].value_counts(dropna=False).to_dict()
-        has_children = self.df["¿Tiene hijos?"].value_counts(dropna=False).to_dict()
-        children_count = self.df["¿Cantidad de hijos?"].value_counts(dropna=False).to_dict()
-        healthy_habits = self.df["¿Consideras que tienen hábitos tendientes a un estilo de  vida sano?"].value_counts(dropna=False).to_dict()
-        additional_services = self.df["¿Realiza servicios adicionales?"].value_counts(dropna=False).to_dict()
-        service_overload = self.df["¿Tiene recargo de servicios?"].value_counts(dropna=False).to_dict()
-        extra_paid_activity = self.df["¿Realizas alguna actividad remunerada extra?"].value_counts(dropna=False).to_dict()
-        hobbies = self.df["¿Tiene algún hobbies?"].value_counts(dropna=False).to_dict()
+        physical_activity = column(self.df, "physical_activity").value_counts(dropna=False).to_dict()
+        frequency = column(self.df, "activity_frequency").value_counts(dropna=False).to_dict()
+        has_children = column(self.df, "has_children").value_counts(dropna=False).to_dict()
+        children_count = column(self.df, "children_count").value_counts(dropna=False).to_dict()
+        healthy_habits = column(self.df, "healthy_habits").value_counts(dropna=False).to_dict()
+        additional_services = column(self.df, "additional_services").value_counts(dropna=False).to_dict()
+        service_overload = column(self.df, "service_overload").value_counts(dropna=False).to_dict()
+        extra_paid_activity = column(self.df, "extra_paid_activity").value_counts(dropna=False).to_dict()
+        hobbies = column(self.df, "hobbies").value_counts(dropna=False).to_dict()
         
         # NUEVAS CONEXIONES DE HÁBITOS
         
         # Hijos vs Actividad Física (para la tarjeta "Realizan Actividad Física y tienen hijos")
-        df_filtered = self.df.dropna(subset=["¿Tiene hijos?", "¿Realiza algún tipo de actividad física?"])
-        children_physical_activity = df_filtered.groupby(["¿Tiene hijos?", "¿Realiza algún tipo de actividad física?"]).size().reset_index(name="count")
+        df_filtered = self._fields("has_children", "physical_activity")
+        children_physical_activity = df_filtered.groupby(["has_children", "physical_activity"]).size().reset_index(name="count")
         children_physical_activity_data = []
         for _, row in children_physical_activity.iterrows():
             children_physical_activity_data.append({
-                "has_children": row["¿Tiene hijos?"],
-                "physical_activity": row["¿Realiza algún tipo de actividad física?"],
+                "has_children": row["has_children"],
+                "physical_activity": row["physical_activity"],
                 "count": row["count"]
             })
 
         # Hijos vs Servicios Adicionales
-        df_filtered = self.df.dropna(subset=["¿Tiene hijos?", "¿Realiza servicios adicionales?"])
-        children_services = df_filtered.groupby(["¿Tiene hijos?", "¿Realiza servicios adicionales?"]).size().reset_index(name="count")
+        df_filtered = self._fields("has_children", "additional_services")
+        children_services = df_filtered.groupby(["has_children", "additional_services"]).size().reset_index(name="count")
         children_services_data = []
         for _, row in children_services.iterrows():
             children_services_data.append({
-                "has_children": row["¿Tiene hijos?"],
-                "additional_services": row["¿Realiza servicios adicionales?"],
+                "has_children": row["has_children"],
+                "additional_services": row["additional_services"],
                 "count": row["count"]
             })
         
         # Actividad Física vs Equilibrio Vida-Trabajo
-        df_filtered = self.df.dropna(subset=["¿Realiza algún tipo de actividad física?", "¿Te sientes cómodo con el equilibrio entre tu vida laboral y personal?"])
-        activity_balance = df_filtered.groupby(["¿Realiza algún tipo de actividad física?", "¿Te sientes cómodo con el equilibrio entre tu vida laboral y personal?"]).size().reset_index(name="count")
+        df_filtered = self._fields("physical_activity", "work_life_balance")
+        activity_balance = df_filtered.groupby(["physical_activity", "work_life_balance"]).size().reset_index(name="count")
         activity_balance_data = []
         for _, row in activity_balance.iterrows():
             activity_balance_data.append({
-                "physical_activity": row["¿Realiza algún tipo de actividad física?"],
-                "work_life_balance": row["¿Te sientes cómodo con el equilibrio entre tu vida laboral y personal?"],
+                "physical_activity": row["physical_activity"],
+                "work_life_balance": row["work_life_balance"],
                 "count": row["count"]
             })
         
         # Servicios Adicionales vs Equilibrio Vida-Trabajo
-        df_filtered = self.df.dropna(subset=["¿Realiza servicios adicionales?", "¿Te sientes cómodo con el equilibrio entre tu vida laboral y personal?"])
-        services_balance = df_filtered.groupby(["¿Realiza servicios adicionales?", "¿Te sientes cómodo con el equilibrio entre tu vida laboral y personal?"]).size().reset_index(name="count")
+        df_filtered = self._fields("additional_services", "work_life_balance")
+        services_balance = df_filtered.groupby(["additional_services", "work_life_balance"]).size().reset_index(name="count")
         services_balance_data = []
         for _, row in services_balance.iterrows():
             services_balance_data.append({
-                "additional_services": row["¿Realiza servicios adicionales?"],
-                "work_life_balance": row["¿Te sientes cómodo con el equilibrio entre tu vida laboral y personal?"],
+                "additional_services": row["additional_services"],
+                "work_life_balance": row["work_life_balance"],
                 "count": row["count"]
             })
         
         # Hábitos Saludables vs Actividad Física
-        df_filtered = self.df.dropna(subset=["¿Consideras que tienen hábitos tendientes a un estilo de  vida sano?", "¿Realiza algún tipo de actividad física?"])
-        healthy_activity = df_filtered.groupby(["¿Consideras que tienen hábitos tendientes a un estilo de  vida sano?", "¿Realiza algún tipo de actividad física?"]).size().reset_index(name="count")
+        df_filtered = self._fields("healthy_habits", "physical_activity")
+        healthy_activity = df_filtered.groupby(["healthy_habits", "physical_activity"]).size().reset_index(name="count")
         healthy_activity_data = []
         for _, row in healthy_activity.iterrows():
             healthy_activity_data.append({
-                "healthy_habits": row["¿Consideras que tienen hábitos tendientes a un estilo de  vida sano?"],
-                "physical_activity": row["¿Realiza algún tipo de actividad física?"],
+                "healthy_habits": row["healthy_habits"],
+                "physical_activity": row["physical_activity"],
                 "count": row["count"]
             })
         
         # Cruce actividad física vs calidad de vida (existente)
-        df_filtered = self.df.dropna(subset=["¿Realiza algún tipo de actividad física?", 
-                                                 " ¿Considera que debe mejorar algunos de estos factores para contribuir a una mejor calidad de vida?"])
-        activity_quality_cross = df_filtered.groupby(["¿Realiza algún tipo de actividad física?", 
-                                                 " ¿Considera que debe mejorar algunos de estos factores para contribuir a una mejor calidad de vida?"]).size().reset_index(name="count")
+        df_filtered = self._fields("physical_activity", "needs_improvement")
+        activity_quality_cross = df_filtered.groupby(["physical_activity", "needs_improvement"]).size().reset_index(name="count")
         
         activity_quality_data = []
         for _, row in activity_quality_cross.iterrows():
             activity_quality_data.append({
-                "physical_activity": row["¿Realiza algún tipo de actividad física?"],
-                "needs_improvement": row[" ¿Considera que debe mejorar algunos de estos factores para contribuir a una mejor calidad de vida?"],
+                "physical_activity": row["physical_activity"],
+                "needs_improvement": row["needs_improvement"],
                 "count": row["count"]
             })
         
@@ -286,70 +315,70 @@ class DataProcessor:
             return {}
         
         # Distribuciones básicas
-        physical_health = self.df["Salud física actual"].value_counts(dropna=False).to_dict()
-        mental_health = self.df["Salud mental actual"].value_counts(dropna=False).to_dict()
-        chronic_conditions = self.df["Padecimiento base o crónico"].value_counts(dropna=False).to_dict()
-        medical_checkups = self.df["¿Se ha realizado algún chequeo en los últimos 12 meses?"].value_counts(dropna=False).to_dict()
-        checkup_reasons = self.df["En caso afirmativo, ¿Cuál fue el motivo?"].value_counts(dropna=False).to_dict()
-        treatment_types = self.df["Tipo de Tratamiento"].value_counts(dropna=False).to_dict()
-        psychological_treatment = self.df["Tipo de Tratamiento Psicológico"].value_counts(dropna=False).to_dict()
-        work_incidents = self.df["¿Has experimentado algún incidente o accidente laboral en los últimos 12 meses?"].value_counts(dropna=False).to_dict()
-        work_life_balance = self.df["¿Te sientes cómodo con el equilibrio entre tu vida laboral y personal?"] .value_counts(dropna=False).to_dict()
+        physical_health = column(self.df, "physical_health").value_counts(dropna=False).to_dict()
+        mental_health = column(self.df, "mental_health").value_counts(dropna=False).to_dict()
+        chronic_conditions = column(self.df, "chronic_condition").value_counts(dropna=False).to_dict()
+        medical_checkups = column(self.df, "medical_checkup").value_counts(dropna=False).to_dict()
+        checkup_reasons = column(self.df, "checkup_reason").value_counts(dropna=False).to_dict()
+        treatment_types = column(self.df, "treatment_type").value_counts(dropna=False).to_dict()
+        psychological_treatment = column(self.df, "psychological_treatment").value_counts(dropna=False).to_dict()
+        work_incidents = column(self.df, "work_accident").value_counts(dropna=False).to_dict()
+        work_life_balance = column(self.df, "work_life_balance") .value_counts(dropna=False).to_dict()
         
         # NUEVAS CONEXIONES DE SALUD
         
         # Salud Física vs Mental (correlación)
-        df_filtered = self.df.dropna(subset=["Salud física actual", "Salud mental actual"])
-        health_correlation = df_filtered.groupby(["Salud física actual", "Salud mental actual"]).size().reset_index(name="count")
+        df_filtered = self._fields("physical_health", "mental_health")
+        health_correlation = df_filtered.groupby(["physical_health", "mental_health"]).size().reset_index(name="count")
         health_correlation_data = []
         for _, row in health_correlation.iterrows():
             health_correlation_data.append({
-                "physical_health": row["Salud física actual"],
-                "mental_health": row["Salud mental actual"],
+                "physical_health": row["physical_health"],
+                "mental_health": row["mental_health"],
                 "count": row["count"]
             })
         
         # Salud vs Carga Laboral
-        df_filtered = self.df.dropna(subset=["Salud física actual", "¿Realiza servicios adicionales?"])
-        health_workload = df_filtered.groupby(["Salud física actual", "¿Realiza servicios adicionales?"]).size().reset_index(name="count")
+        df_filtered = self._fields("physical_health", "additional_services")
+        health_workload = df_filtered.groupby(["physical_health", "additional_services"]).size().reset_index(name="count")
         health_workload_data = []
         for _, row in health_workload.iterrows():
             health_workload_data.append({
-                "physical_health": row["Salud física actual"],
-                "additional_services": row["¿Realiza servicios adicionales?"],
+                "physical_health": row["physical_health"],
+                "additional_services": row["additional_services"],
                 "count": row["count"]
             })
         
         # Salud vs Actividad Física
-        df_filtered = self.df.dropna(subset=["Salud física actual", "¿Realiza algún tipo de actividad física?"])
-        health_activity = df_filtered.groupby(["Salud física actual", "¿Realiza algún tipo de actividad física?"]).size().reset_index(name="count")
+        df_filtered = self._fields("physical_health", "physical_activity")
+        health_activity = df_filtered.groupby(["physical_health", "physical_activity"]).size().reset_index(name="count")
         health_activity_data = []
         for _, row in health_activity.iterrows():
             health_activity_data.append({
-                "physical_health": row["Salud física actual"],
-                "physical_activity": row["¿Realiza algún tipo de actividad física?"],
+                "physical_health": row["physical_health"],
+                "physical_activity": row["physical_activity"],
                 "count": row["count"]
             })
         
         # Accidentes vs Jerarquía
-        df_filtered = self.df.dropna(subset=["Jerarquía", "¿Has experimentado algún incidente o accidente laboral en los últimos 12 meses?"])
-        accidents_hierarchy = df_filtered.groupby(["Jerarquía", "¿Has experimentado algún incidente o accidente laboral en los últimos 12 meses?"]).size().reset_index(name="count")
+        df_filtered = self._fields("hierarchy", "work_accident")
+        accidents_hierarchy = df_filtered.groupby(["hierarchy", "work_accident"]).size().reset_index(name="count")
         accidents_hierarchy_data = []
         for _, row in accidents_hierarchy.iterrows():
             accidents_hierarchy_data.append({
-                "hierarchy": row["Jerarquía"],
-                "work_accident": row["¿Has experimentado algún incidente o accidente laboral en los últimos 12 meses?"],
+                "hierarchy": row["hierarchy"],
+                "work_accident": row["work_accident"],
                 "count": row["count"]
             })
         
         # Salud Mental vs Equilibrio Vida-Trabajo
-        df_filtered = self.df.dropna(subset=["Salud mental actual", "¿Te sientes cómodo con el equilibrio entre tu vida laboral y personal?"])
-        mental_balance = df_filtered.groupby(["Salud mental actual", "¿Te sientes cómodo con el equilibrio entre tu vida laboral y personal?"]).size().reset_index(name="count")
+        df_filtered = self._fields("mental_health", "work_life_balance")
+        mental_balance = df_filtered.groupby(["mental_health", "work_life_balance"]).size().reset_index(name="count")
         mental_balance_data = []
         for _, row in mental_balance.iterrows():
             mental_balance_data.append({
-                "mental_health": row["Salud mental actual"],
-                "work_life_balance": row["¿Te sientes cómodo con el equilibrio entre tu vida laboral y personal?"],
+                "mental_health": row["mental_health"],
+                "work_life_balance": row["work_life_balance"],
                 "count": row["count"]
             })
         
@@ -376,8 +405,8 @@ class DataProcessor:
             return {}
         
         # Distribuciones básicas
-        safety_training = self.df["¿Has recibido capacitación en seguridad y salud en el trabajo en los últimos 12 meses?"].value_counts(dropna=False).to_dict()
-        training_topics = self.df["¿Sobre qué temática?"].value_counts(dropna=False).to_dict()
+        safety_training = column(self.df, "safety_training").value_counts(dropna=False).to_dict()
+        training_topics = column(self.df, "training_topic").value_counts(dropna=False).to_dict()
         # Normalizar temáticas de capacitación
         training_topics_map = {
             "Manejo del Estrés": "Manejo de Estrés",
@@ -388,24 +417,21 @@ class DataProcessor:
                 training_topics[new_topic] = training_topics.get(new_topic, 0) + training_topics[old_topic]
                 del training_topics[old_topic]
 
-        occupational_health_knowledge = self.df["¿Tiene conocimiento  de los servicios relacionados a la salud ocupacional que proporciona la institución policial?"].value_counts(dropna=False).to_dict()
-        service_usage = self.df["¿Los ha utilizado?"].value_counts(dropna=False).to_dict()
-        service_satisfaction = self.df["¿Esta conforme?"].value_counts(dropna=False).to_dict()
-        equipment_access = self.df["¿Tienes acceso a equipos y herramientas adecuadas para realizar sus funciones?"] .value_counts(dropna=False).to_dict()
-        professional_development = self.df["¿Tienes oportunidades para el desarrollo profesional y el ascenso?"].value_counts(dropna=False).to_dict()
-        recognition = self.df["¿Te sientes valorado y reconocido por tus superiores?"].value_counts(dropna=False).to_dict()
-        communication = self.df["¿Te sientes cómodo comunicándote con tus superiores y compañeros?"].value_counts(dropna=False).to_dict()
+        occupational_health_knowledge = column(self.df, "occupational_knowledge").value_counts(dropna=False).to_dict()
+        service_usage = column(self.df, "service_usage").value_counts(dropna=False).to_dict()
+        service_satisfaction = column(self.df, "service_satisfaction").value_counts(dropna=False).to_dict()
+        equipment_access = column(self.df, "equipment_access") .value_counts(dropna=False).to_dict()
+        professional_development = column(self.df, "professional_development").value_counts(dropna=False).to_dict()
+        recognition = column(self.df, "recognition").value_counts(dropna=False).to_dict()
+        communication = column(self.df, "communication").value_counts(dropna=False).to_dict()
         
         # Servicios conocidos (agregando todas las columnas)
         known_services = []
-        service_columns = ["Señale cuales", "Señale cuales2", "Señale cuales3", "Señale cuales4", "Señale cuales5"]
-        
-        for col in service_columns:
-            if col in self.df.columns:
-                # Filtrar NaN y strings 'nan' antes de extender
-                services = self.df[col].dropna().astype(str)
-                services = services[services != "nan"]
-                known_services.extend(services.tolist())
+        for field in FIELD_GROUPS["known_services"]:
+            # Filtrar NaN y strings 'nan' antes de extender
+            services = column(self.df, field).dropna().astype(str)
+            services = services[services != "nan"]
+            known_services.extend(services.tolist())
         
         known_services_count = Counter(known_services)
         known_services_dict = dict(known_services_count.most_common(10))
@@ -413,57 +439,57 @@ class DataProcessor:
         # NUEVAS CONEXIONES DE CONOCIMIENTO
         
         # Capacitación vs Jerarquía
-        df_filtered = self.df.dropna(subset=["Jerarquía", "¿Has recibido capacitación en seguridad y salud en el trabajo en los últimos 12 meses?"])
-        training_hierarchy = df_filtered.groupby(["Jerarquía", "¿Has recibido capacitación en seguridad y salud en el trabajo en los últimos 12 meses?"]).size().reset_index(name="count")
+        df_filtered = self._fields("hierarchy", "safety_training")
+        training_hierarchy = df_filtered.groupby(["hierarchy", "safety_training"]).size().reset_index(name="count")
         training_hierarchy_data = []
         for _, row in training_hierarchy.iterrows():
             training_hierarchy_data.append({
-                "hierarchy": row["Jerarquía"],
-                "received_training": row["¿Has recibido capacitación en seguridad y salud en el trabajo en los últimos 12 meses?"],
+                "hierarchy": row["hierarchy"],
+                "received_training": row["safety_training"],
                 "count": row["count"]
             })
         
         # Conocimiento vs Utilización de Servicios
-        df_filtered = self.df.dropna(subset=["¿Tiene conocimiento  de los servicios relacionados a la salud ocupacional que proporciona la institución policial?", "¿Los ha utilizado?"])
-        knowledge_usage = df_filtered.groupby(["¿Tiene conocimiento  de los servicios relacionados a la salud ocupacional que proporciona la institución policial?", "¿Los ha utilizado?"]).size().reset_index(name="count")
+        df_filtered = self._fields("occupational_knowledge", "service_usage")
+        knowledge_usage = df_filtered.groupby(["occupational_knowledge", "service_usage"]).size().reset_index(name="count")
         knowledge_usage_data = []
         for _, row in knowledge_usage.iterrows():
             knowledge_usage_data.append({
-                "knows_services": row["¿Tiene conocimiento  de los servicios relacionados a la salud ocupacional que proporciona la institución policial?"],
-                "used_services": row["¿Los ha utilizado?"],
+                "knows_services": row["occupational_knowledge"],
+                "used_services": row["service_usage"],
                 "count": row["count"]
             })
         
         # Capacitación vs Accidentes Laborales
-        df_filtered = self.df.dropna(subset=["¿Has recibido capacitación en seguridad y salud en el trabajo en los últimos 12 meses?", "¿Has experimentado algún incidente o accidente laboral en los últimos 12 meses?"])
-        training_accidents = df_filtered.groupby(["¿Has recibido capacitación en seguridad y salud en el trabajo en los últimos 12 meses?", "¿Has experimentado algún incidente o accidente laboral en los últimos 12 meses?"]).size().reset_index(name="count")
+        df_filtered = self._fields("safety_training", "work_accident")
+        training_accidents = df_filtered.groupby(["safety_training", "work_accident"]).size().reset_index(name="count")
         training_accidents_data = []
         for _, row in training_accidents.iterrows():
             training_accidents_data.append({
-                "received_training": row["¿Has recibido capacitación en seguridad y salud en el trabajo en los últimos 12 meses?"],
-                "work_accident": row["¿Has experimentado algún incidente o accidente laboral en los últimos 12 meses?"],
+                "received_training": row["safety_training"],
+                "work_accident": row["work_accident"],
                 "count": row["count"]
             })
         
         # Reconocimiento vs Jerarquía
-        df_filtered = self.df.dropna(subset=["Jerarquía", "¿Te sientes valorado y reconocido por tus superiores?"])
-        recognition_hierarchy = df_filtered.groupby(["Jerarquía", "¿Te sientes valorado y reconocido por tus superiores?"]).size().reset_index(name="count")
+        df_filtered = self._fields("hierarchy", "recognition")
+        recognition_hierarchy = df_filtered.groupby(["hierarchy", "recognition"]).size().reset_index(name="count")
         recognition_hierarchy_data = []
         for _, row in recognition_hierarchy.iterrows():
             recognition_hierarchy_data.append({
-                "hierarchy": row["Jerarquía"],
-                "feels_recognized": row["¿Te sientes valorado y reconocido por tus superiores?"],
+                "hierarchy": row["hierarchy"],
+                "feels_recognized": row["recognition"],
                 "count": row["count"]
             })
         
         # Comunicación vs Conocimiento de Servicios
-        df_filtered = self.df.dropna(subset=["¿Te sientes cómodo comunicándote con tus superiores y compañeros?", "¿Tiene conocimiento  de los servicios relacionados a la salud ocupacional que proporciona la institución policial?"])
-        communication_knowledge = df_filtered.groupby(["¿Te sientes cómodo comunicándote con tus superiores y compañeros?", "¿Tiene conocimiento  de los servicios relacionados a la salud ocupacional que proporciona la institución policial?"]).size().reset_index(name="count")
+        df_filtered = self._fields("communication", "occupational_knowledge")
+        communication_knowledge = df_filtered.groupby(["communication", "occupational_knowledge"]).size().reset_index(name="count")
         communication_knowledge_data = []
         for _, row in communication_knowledge.iterrows():
             communication_knowledge_data.append({
-                "comfortable_communication": row["¿Te sientes cómodo comunicándote con tus superiores y compañeros?"],
-                "knows_services": row["¿Tiene conocimiento  de los servicios relacionados a la salud ocupacional que proporciona la institución policial?"],
+                "comfortable_communication": row["communication"],
+                "knows_services": row["occupational_knowledge"],
                 "count": row["count"]
             })
         
@@ -491,20 +517,18 @@ class DataProcessor:
             return {}
         
         # Distribuciones básicas
-        needs_improvement = self.df[" ¿Considera que debe mejorar algunos de estos factores para contribuir a una mejor calidad de vida?"].value_counts(dropna=False).to_dict()
-        economic_satisfaction = self.df["¿Te sientes satisfecho con la situación económica de su hogar?"].value_counts(dropna=False).to_dict()
-        risk_effort_remuneration = self.df["¿Sientes que hay congruencias entre el riesgo y el esfuerzo en relación a la remuneración recibida?"].value_counts(dropna=False).to_dict()
+        needs_improvement = column(self.df, "needs_improvement").value_counts(dropna=False).to_dict()
+        economic_satisfaction = column(self.df, "economic_satisfaction").value_counts(dropna=False).to_dict()
+        risk_effort_remuneration = column(self.df, "risk_effort_remuneration").value_counts(dropna=False).to_dict()
         
         # Factores más mencionados
-        factors_columns = ["*¿Cuáles?", "Columna1", "Columna2", "Columna3", "Columna4", "Columna5", "Columna6"]
         all_factors = []
         
-        for col in factors_columns:
-            if col in self.df.columns:
-                # Filtrar NaN y strings 'nan' antes de extender
-                factors = self.df[col].dropna().astype(str)
-                factors = factors[factors != "nan"]
-                all_factors.extend(factors.tolist())
+        for field in FIELD_GROUPS["factors"]:
+            # Filtrar NaN y strings 'nan' antes de extender
+            factors = column(self.df, field).dropna().astype(str)
+            factors = factors[factors != "nan"]
+            all_factors.extend(factors.tolist())
         
         factor_counts = Counter(all_factors)
         top_factors = dict(factor_counts.most_common(10))
@@ -512,75 +536,71 @@ class DataProcessor:
         # NUEVAS CONEXIONES DE CALIDAD DE VIDA
         
         # Satisfacción Económica vs Jerarquía
-        df_filtered = self.df.dropna(subset=["Jerarquía", "¿Te sientes satisfecho con la situación económica de su hogar?"])
-        economic_hierarchy = df_filtered.groupby(["Jerarquía", "¿Te sientes satisfecho con la situación económica de su hogar?"]).size().reset_index(name="count")
+        df_filtered = self._fields("hierarchy", "economic_satisfaction")
+        economic_hierarchy = df_filtered.groupby(["hierarchy", "economic_satisfaction"]).size().reset_index(name="count")
         economic_hierarchy_data = []
         for _, row in economic_hierarchy.iterrows():
             economic_hierarchy_data.append({
-                "hierarchy": row["Jerarquía"],
-                "economic_satisfaction": row["¿Te sientes satisfecho con la situación económica de su hogar?"],
+                "hierarchy": row["hierarchy"],
+                "economic_satisfaction": row["economic_satisfaction"],
                 "count": row["count"]
             })
         
         # Satisfacción Económica vs Servicios Adicionales
-        df_filtered = self.df.dropna(subset=["¿Realiza servicios adicionales?", "¿Te sientes satisfecho con la situación económica de su hogar?"])
-        economic_services = df_filtered.groupby(["¿Realiza servicios adicionales?", "¿Te sientes satisfecho con la situación económica de su hogar?"]).size().reset_index(name="count")
+        df_filtered = self._fields("additional_services", "economic_satisfaction")
+        economic_services = df_filtered.groupby(["additional_services", "economic_satisfaction"]).size().reset_index(name="count")
         economic_services_data = []
         for _, row in economic_services.iterrows():
             economic_services_data.append({
-                "additional_services": row["¿Realiza servicios adicionales?"],
-                "economic_satisfaction": row["¿Te sientes satisfecho con la situación económica de su hogar?"],
+                "additional_services": row["additional_services"],
+                "economic_satisfaction": row["economic_satisfaction"],
                 "count": row["count"]
             })
         
         # Factores a Mejorar vs Género
         factors_gender = {}
         # Asegurarse de que 'Género' esté presente y no sea NaN
-        df_gender_filtered = self.df.dropna(subset=["Género"])
+        df_gender_filtered = self.df[column(self.df, "gender").notna()]
         for factor in top_factors.keys():
             if factor != "nan":
                 gender_counts = {}
                 # Iterar sobre las columnas de factores para encontrar el factor en cada una
-                for col in factors_columns:
-                    if col in df_gender_filtered.columns:
-                        # Filtrar solo las filas donde el factor aparece en la columna actual
-                        factor_df = df_gender_filtered[df_gender_filtered[col] == factor]
-                        if not factor_df.empty:
-                            # Contar la distribución de género para esas filas
-                            gender_dist = factor_df["Género"].value_counts().to_dict()
-                            for gender, count in gender_dist.items():
-                                gender_counts[gender] = gender_counts.get(gender, 0) + count
+                for field in FIELD_GROUPS["factors"]:
+                    # Filtrar solo las filas donde el factor aparece en la columna actual
+                    factor_df = df_gender_filtered[column(df_gender_filtered, field) == factor]
+                    if not factor_df.empty:
+                        # Contar la distribución de género para esas filas
+                        gender_dist = column(factor_df, "gender").value_counts().to_dict()
+                        for gender, count in gender_dist.items():
+                            gender_counts[gender] = gender_counts.get(gender, 0) + count
                 if gender_counts: # Solo añadir si hay datos para el factor
                     factors_gender[factor] = gender_counts
         
         # Factores a Mejorar vs Jerarquía
         factors_hierarchy = {}
         # Asegurarse de que 'Jerarquía' esté presente y no sea NaN
-        df_hierarchy_filtered = self.df.dropna(subset=["Jerarquía"])
+        df_hierarchy_filtered = self.df[column(self.df, "hierarchy").notna()]
         for factor in list(top_factors.keys())[:5]:  # Top 5 factores
             if factor != "nan":
                 hierarchy_counts = {}
-                for col in factors_columns:
-                    if col in df_hierarchy_filtered.columns:
-                        factor_df = df_hierarchy_filtered[df_hierarchy_filtered[col] == factor]
-                        if not factor_df.empty:
-                            hierarchy_dist = factor_df["Jerarquía"].value_counts().to_dict()
-                            for hierarchy, count in hierarchy_dist.items():
-                                hierarchy_counts[hierarchy] = hierarchy_counts.get(hierarchy, 0) + count
+                for field in FIELD_GROUPS["factors"]:
+                    factor_df = df_hierarchy_filtered[column(df_hierarchy_filtered, field) == factor]
+                    if not factor_df.empty:
+                        hierarchy_dist = column(factor_df, "hierarchy").value_counts().to_dict()
+                        for hierarchy, count in hierarchy_dist.items():
+                            hierarchy_counts[hierarchy] = hierarchy_counts.get(hierarchy, 0) + count
                 if hierarchy_counts: # Solo añadir si hay datos para el factor
                     factors_hierarchy[factor] = hierarchy_counts
         
         # Relación jerarquía vs percepción (existente)
-        df_filtered = self.df.dropna(subset=["Jerarquía", 
-                                           " ¿Considera que debe mejorar algunos de estos factores para contribuir a una mejor calidad de vida?"])
-        hierarchy_quality = df_filtered.groupby(["Jerarquía", 
-                                           " ¿Considera que debe mejorar algunos de estos factores para contribuir a una mejor calidad de vida?"]).size().reset_index(name="count")
+        df_filtered = self._fields("hierarchy", "needs_improvement")
+        hierarchy_quality = df_filtered.groupby(["hierarchy", "needs_improvement"]).size().reset_index(name="count")
         
         hierarchy_quality_data = []
         for _, row in hierarchy_quality.iterrows():
             hierarchy_quality_data.append({
-                "hierarchy": row["Jerarquía"],
-                "needs_improvement": row[" ¿Considera que debe mejorar algunos de estos factores para contribuir a una mejor calidad de vida?"],
+                "hierarchy": row["hierarchy"],
+                "needs_improvement": row["needs_improvement"],
                 "count": row["count"]
             })
         
@@ -626,42 +646,42 @@ class DataProcessor:
                 }
             }        
         # KPIs básicos existentes
-        physical_activity_yes = len(self.df[self.df["¿Realiza algún tipo de actividad física?"] == "Sí"])
+        physical_activity_yes = len(self.df[column(self.df, "physical_activity") == "Sí"])
         physical_activity_percentage = round((physical_activity_yes / total_responses) * 100, 2)
         
-        needs_improvement_yes = len(self.df[self.df[" ¿Considera que debe mejorar algunos de estos factores para contribuir a una mejor calidad de vida?"] == "Sí"])
+        needs_improvement_yes = len(self.df[column(self.df, "needs_improvement") == "Sí"])
         needs_improvement_percentage = round((needs_improvement_yes / total_responses) * 100, 2)
         
-        safety_training_yes = len(self.df[self.df["¿Has recibido capacitación en seguridad y salud en el trabajo en los últimos 12 meses?"] == "Sí"])
+        safety_training_yes = len(self.df[column(self.df, "safety_training") == "Sí"])
         safety_training_percentage = round((safety_training_yes / total_responses) * 100, 2)
         
-        occupational_knowledge_yes = len(self.df[self.df["¿Tiene conocimiento  de los servicios relacionados a la salud ocupacional que proporciona la institución policial?"] == "Sí"])
+        occupational_knowledge_yes = len(self.df[column(self.df, "occupational_knowledge") == "Sí"])
         occupational_knowledge_percentage = round((occupational_knowledge_yes / total_responses) * 100, 2)
         
-        medical_checkup_yes = len(self.df[self.df["¿Se ha realizado algún chequeo en los últimos 12 meses?"] == "Sí"])
+        medical_checkup_yes = len(self.df[column(self.df, "medical_checkup") == "Sí"])
         medical_checkup_percentage = round((medical_checkup_yes / total_responses) * 100, 2)
         
-        additional_services_yes = len(self.df[self.df["¿Realiza servicios adicionales?"] == "Sí"])
+        additional_services_yes = len(self.df[column(self.df, "additional_services") == "Sí"])
         additional_services_percentage = round((additional_services_yes / total_responses) * 100, 2)
         
         # NUEVOS KPIs COMPREHENSIVOS
         
         # Índice de Salud Integral (física + mental buena)
-        both_good_health = len(self.df[(self.df["Salud física actual"] == "Buena") & (self.df["Salud mental actual"] == "Buena")] )
+        both_good_health = len(self.df[(column(self.df, "physical_health") == "Buena") & (column(self.df, "mental_health") == "Buena")] )
         integral_health_index = round((both_good_health / total_responses) * 100, 2)
         
         # Índice de Sobrecarga Laboral
-        overloaded = len(self.df[(self.df["¿Realiza servicios adicionales?"] == "Sí") & (self.df["¿Tiene recargo de servicios?"] == "Sí")] )
+        overloaded = len(self.df[(column(self.df, "additional_services") == "Sí") & (column(self.df, "service_overload") == "Sí")] )
         overload_index = round((overloaded / total_responses) * 100, 2)
         
         # Índice de Equilibrio Vida-Trabajo
-        good_balance = len(self.df[self.df["¿Te sientes cómodo con el equilibrio entre tu vida laboral y personal?"] == "Sí"])
+        good_balance = len(self.df[column(self.df, "work_life_balance") == "Sí"])
         work_life_balance_index = round((good_balance / total_responses) * 100, 2)
         
         # Índice de Clima Laboral (reconocimiento + comunicación + desarrollo)
-        good_recognition = len(self.df[self.df["¿Te sientes valorado y reconocido por tus superiores?"] == "Sí"])
-        good_communication = len(self.df[self.df["¿Te sientes cómodo comunicándote con tus superiores y compañeros?"] == "Sí"])
-        good_development = len(self.df[self.df["¿Tienes oportunidades para el desarrollo profesional y el ascenso?"] == "Sí"])
+        good_recognition = len(self.df[column(self.df, "recognition") == "Sí"])
+        good_communication = len(self.df[column(self.df, "communication") == "Sí"])
+        good_development = len(self.df[column(self.df, "professional_development") == "Sí"])
         
         climate_components = [
             (good_recognition / total_responses) * 100,
@@ -671,27 +691,25 @@ class DataProcessor:
         organizational_climate_index = round(sum(climate_components) / len(climate_components), 2)
         
         # Satisfacción Económica
-        economic_satisfaction_yes = len(self.df[self.df["¿Te sientes satisfecho con la situación económica de su hogar?"] == "Sí"])
+        economic_satisfaction_yes = len(self.df[column(self.df, "economic_satisfaction") == "Sí"])
         economic_satisfaction_percentage = round((economic_satisfaction_yes / total_responses) * 100, 2)
         
         # Tasa de Accidentes Laborales
-        work_accidents_yes = len(self.df[self.df["¿Has experimentado algún incidente o accidente laboral en los últimos 12 meses?"] == "Sí"])
+        work_accidents_yes = len(self.df[column(self.df, "work_accident") == "Sí"])
         work_accidents_rate = round((work_accidents_yes / total_responses) * 100, 2)
         
         # Utilización de Servicios de Salud Ocupacional
         # Asegurarse de que la columna exista y los valores sean correctos
-        service_usage_yes = len(self.df[self.df["¿Los ha utilizado?"] == "Sí"])
+        service_usage_yes = len(self.df[column(self.df, "service_usage") == "Sí"])
         service_usage_percentage = round((service_usage_yes / total_responses) * 100, 2)
         
         # Principales factores a mejorar
-        factors_columns = ["*¿Cuáles?", "Columna1", "Columna2", "Columna3", "Columna4", "Columna5", "Columna6"]
         all_factors = []
         
-        for col in factors_columns:
-            if col in self.df.columns:
-                factors = self.df[col].dropna().astype(str)
-                factors = factors[factors != "nan"]
-                all_factors.extend(factors.tolist())
+        for field in FIELD_GROUPS["factors"]:
+            factors = column(self.df, field).dropna().astype(str)
+            factors = factors[factors != "nan"]
+            all_factors.extend(factors.tolist())
         
         factor_counts = Counter(all_factors)
         top_3_factors = dict(factor_counts.most_common(3))
@@ -725,34 +743,38 @@ class DataProcessor:
     
     def get_filtered_data(self, filters):
         """Retorna datos filtrados según los parámetros"""
-        if self.df is None:
+        # Se fija el DataFrame vigente al inicio: una recarga concurrente no afecta este cálculo
+        df = self.df
+        if df is None:
             return {}
         
-        filtered_df = self.df.copy()
+        filtered_df = df.copy()
         
         # Aplicar filtros
         if filters.get("distrito") and filters["distrito"] != "all":
-            filtered_df = filtered_df[filtered_df["Distrito"] == filters["distrito"]]
+            filtered_df = filtered_df[column(filtered_df, "district") == filters["distrito"]]
         
         if filters.get("genero") and filters["genero"] != "all":
-            filtered_df = filtered_df[filtered_df["Género"] == filters["genero"]]
+            filtered_df = filtered_df[column(filtered_df, "gender") == filters["genero"]]
         
         if filters.get("edad") and filters["edad"] != "all":
-            filtered_df = filtered_df[filtered_df["Edad"] == filters["edad"]]
+            filtered_df = filtered_df[column(filtered_df, "age") == filters["edad"]]
         
         if filters.get("jerarquia") and filters["jerarquia"] != "all":
-            filtered_df = filtered_df[filtered_df["Jerarquía"] == filters["jerarquia"]]
+            filtered_df = filtered_df[column(filtered_df, "hierarchy") == filters["jerarquia"]]
         
         if filters.get("estado_civil") and filters["estado_civil"] != "all":
-            filtered_df = filtered_df[filtered_df["Estado Civil"] == filters["estado_civil"]]
+            filtered_df = filtered_df[column(filtered_df, "civil_status") == filters["estado_civil"]]
         
         if filters.get("actividad_fisica") and filters["actividad_fisica"] == "true":
-            filtered_df = filtered_df[filtered_df["¿Realiza algún tipo de actividad física?"] == "Sí"]
+            filtered_df = filtered_df[column(filtered_df, "physical_activity") == "Sí"]
+        
+        if filters.get("segmento") and filters["segmento"] != "all":
+            segments = filtered_df[SEGMENT] if SEGMENT in filtered_df.columns else pd.Series(np.nan, index=filtered_df.index)
+            filtered_df = filtered_df[segments == filters["segmento"]]
         
         # Crear un procesador temporal con los datos filtrados
-        temp_processor = DataProcessor.__new__(DataProcessor)
-        temp_processor.df = filtered_df
-        temp_processor.excel_path = self.excel_path # Keep original path for potential reloads
+        temp_processor = DataProcessor(self.excel_path, df=filtered_df, source_digest=self.source_digest)
         
         return {
             "demographics": temp_processor.get_demographics_data(),
@@ -769,11 +791,12 @@ class DataProcessor:
             return {}
         
         return {
-            "distritos": sorted(self.df["Distrito"].dropna().unique().tolist()),
-            "generos": sorted(self.df["Género"].dropna().unique().tolist()),
-            "edades": sorted(self.df["Edad"].dropna().unique().tolist()),
-            "jerarquias": sorted(self.df["Jerarquía"].dropna().unique().tolist()),
-            "estados_civiles": sorted(self.df["Estado Civil"].dropna().unique().tolist())
+            "distritos": sorted(column(self.df, "district").dropna().unique().tolist()),
+            "generos": sorted(column(self.df, "gender").dropna().unique().tolist()),
+            "edades": sorted(column(self.df, "age").dropna().unique().tolist()),
+            "jerarquias": sorted(column(self.df, "hierarchy").dropna().unique().tolist()),
+            "estados_civiles": sorted(column(self.df, "civil_status").dropna().unique().tolist()),
+            "segmentos": sorted(self.df[SEGMENT].dropna().unique().tolist()) if SEGMENT in self.df.columns else []
         }
 
 
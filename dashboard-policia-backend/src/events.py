@@ -0,0 +1,145 @@
+import asyncio
+import json
+import threading
+
+from src.memory import deep_sizeof
+
+# Suscriptores de stream() (un hilo bloqueado por conexión) admitidos a la vez bajo WSGI
+MAX_THREADED_SUBSCRIBERS = 8
+
+
+class KpiFeed:
+    """Difunde los KPIs a suscriptores SSE solo cuando cambia la versión de los datos"""
+
+    def __init__(self, store, keepalive=15, max_threaded=MAX_THREADED_SUBSCRIBERS):
+        self.store = store
+        self.keepalive = keepalive
+        self.max_threaded = max_threaded
+        self.subscribers = 0
+        # Hilos reservados por suscriptores de stream(); astream() no ocupa hilos y no cuenta
+        self.threaded = 0
+        self._condition = threading.Condition()
+        self._build_lock = threading.Lock()
+        self._version = store.version
+        self._events = {}
+        self._async_waiters = set()
+        store.on_change(self.publish)
+
+    def publish(self, version):
+        """Despierta a los suscriptores con la nueva versión"""
+        with self._condition:
+            self._version = version
+            self._condition.notify_all()
+            waiters = list(self._async_waiters)
+        for loop, wake in waiters:
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                # El loop del suscriptor ya se cerró
+                pass
+
+    def _build(self, version):
+        """Eventos (completo y diferencia) de una versión, calculados una sola vez para todos.
+
+        Los KPIs salen del snapshot vigente; si `version` ya fue reemplazada, el evento es el de la
+        versión vigente (nunca una versión con los datos de otra).
+        """
+        with self._build_lock:
+            snapshot = self.store.snapshot
+            if snapshot is not None:
+                version = snapshot.version
+            if version in self._events:
+                return self._events[version]
+
+            kpis = self.store.get_comprehensive_kpis(snapshot=snapshot)
+            previous = next(reversed(self._events.values()), None)
+            full = f"id: {version}\nevent: kpis\ndata: {json.dumps(kpis)}\n\n"
+            if previous is None:
+                diff = None
+            else:
+                diff_data = {
+                    "version": version,
+                    "previous": previous["version"],
+                    "changed": {key: value for key, value in kpis.items() if previous["kpis"].get(key) != value},
+                    "removed": [key for key in previous["kpis"] if key not in kpis]
+                }
+                diff = f"id: {version}\nevent: kpis-diff\ndata: {json.dumps(diff_data)}\n\n"
+
+            event = {"version": version, "kpis": kpis, "full": full, "diff": diff, "previous": previous and previous["version"]}
+            # Solo hace falta la versión actual y la anterior para calcular diferencias
+            self._events = {key: value for key, value in list(self._events.items())[-1:]}
+            self._events[version] = event
+            return event
+
+    def nbytes(self):
+        """Bytes aproximados de los eventos guardados (versión actual y anterior)"""
+        return deep_sizeof(self._events)
+
+    @staticmethod
+    def _message(event, sent, diff):
+        if diff and event["diff"] is not None and event["previous"] == sent:
+            return event["diff"]
+        return event["full"]
+
+    def reserve(self):
+        """Reserva el hilo de un suscriptor de stream(); False si ya hay max_threaded conectados"""
+        with self._condition:
+            if self.threaded >= self.max_threaded:
+                return False
+            self.threaded += 1
+            return True
+
+    def release(self):
+        """Libera el hilo reservado con reserve() al cerrarse la conexión"""
+        with self._condition:
+            self.threaded -= 1
+
+    def stream(self, last_version=None, diff=False):
+        """Generador de eventos SSE para un suscriptor (ocupa un hilo mientras espera)"""
+        with self._condition:
+            self.subscribers += 1
+        try:
+            yield "retry: 5000\n\n"
+            sent = last_version
+            while True:
+                with self._condition:
+                    self._condition.wait_for(lambda: self._version != sent, timeout=self.keepalive)
+                    version = self._version
+                if version == sent or version is None:
+                    yield ": keepalive\n\n"
+                    continue
+
+                event = self._build(version)
+                yield self._message(event, sent, diff)
+                sent = event["version"]
+        finally:
+            with self._condition:
+                self.subscribers -= 1
+
+    async def astream(self, last_version=None, diff=False):
+        """Generador asíncrono de eventos SSE: un suscriptor inactivo no ocupa hilos"""
+        loop = asyncio.get_running_loop()
+        waiter = (loop, asyncio.Event())
+        with self._condition:
+            self.subscribers += 1
+            self._async_waiters.add(waiter)
+        try:
+            yield "retry: 5000\n\n"
+            sent = last_version
+            while True:
+                version = self._version
+                if version == sent or version is None:
+                    try:
+                        await asyncio.wait_for(waiter[1].wait(), self.keepalive)
+                    except asyncio.TimeoutError:
+                        yield ": keepalive\n\n"
+                    waiter[1].clear()
+                    continue
+
+                event = await loop.run_in_executor(None, self._build, version)
+                yield self._message(event, sent, diff)
+                sent = event["version"]
+        finally:
+            with self._condition:
+                self.subscribers -= 1
+                self._async_waiters.discard(waiter)
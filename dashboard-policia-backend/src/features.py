@@ -0,0 +1,75 @@
+import re
+
+import numpy as np
+
+from src.schema import FIELDS, FREQUENCY_SCALE, HEALTH_SCALE, SENIORITY_MAP
+
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+RANGE = re.compile(r"^\s*(\d+(?:[.,]\d+)?)\s*a\s*(\d+(?:[.,]\d+)?)")
+
+
+def range_midpoint(label):
+    """Punto medio de un rango "20 a 25" (o "1 a 5 años"); NaN si la etiqueta no es un rango"""
+    match = RANGE.match(str(label))
+    if match is None:
+        return np.nan
+    low, high = (float(value.replace(",", ".")) for value in match.groups())
+    return (low + high) / 2
+
+
+def as_number(label):
+    """Etiqueta numérica (ej. cantidad de hijos 2.0); NaN si no lo es"""
+    try:
+        return float(label)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+# Variables numéricas derivadas de respuestas ordinales: campo -> (columna, traducción de etiqueta a valor)
+NUMERIC_FEATURES = {
+    "age": (FIELDS["age"], range_midpoint),
+    "seniority": (FIELDS["seniority"], lambda label: SENIORITY_MAP.get(label, np.nan)),
+    "physical_health": (FIELDS["physical_health"], lambda label: HEALTH_SCALE.get(label, np.nan)),
+    "mental_health": (FIELDS["mental_health"], lambda label: HEALTH_SCALE.get(label, np.nan)),
+    "children_count": (FIELDS["children_count"], as_number),
+    "activity_frequency": (FIELDS["activity_frequency"], lambda label: FREQUENCY_SCALE.get(label, np.nan)),
+}
+
+FEATURE_COLUMNS = {col: feature for feature, (col, _) in NUMERIC_FEATURES.items()}
+
+
+def lookup_table(feature, labels):
+    """Valor de cada código de la columna (código 0 = vacío -> NaN), para indexar conteos de una vez"""
+    _, to_value = NUMERIC_FEATURES[feature]
+    values = np.array([np.nan] + [to_value(label) for label in labels], dtype=float)
+    values.setflags(write=False)
+    return values
+
+
+def summarize(values, counts, quantiles=QUANTILES):
+    """Cantidad, media, desvío, mediana y cuantiles a partir de los conteos por código.
+
+    Los cuantiles son los de los datos expandidos con el método "inverted_cdf" de numpy: el
+    menor valor cuya frecuencia acumulada alcanza q (los valores son discretos).
+    """
+    known = ~np.isnan(values)
+    total = counts[known].sum().item()
+    if total == 0:
+        return {"count": 0, "mean": None, "std": None, "median": None, "quantiles": {}}
+
+    order = np.argsort(values[known], kind="stable")
+    sorted_values = values[known][order]
+    cumulative = np.cumsum(counts[known][order])
+
+    def quantile(q):
+        return float(sorted_values[min(np.searchsorted(cumulative, q * total), len(sorted_values) - 1)])
+
+    mean = float(np.dot(counts[known], values[known]) / total)
+    variance = float(np.dot(counts[known], (values[known] - mean) ** 2) / total)
+    return {
+        "count": round(total, 2),
+        "mean": round(mean, 2),
+        "std": round(variance ** 0.5, 2),
+        "median": quantile(0.5),
+        "quantiles": {str(q): quantile(q) for q in quantiles},
+    }
@@ -0,0 +1,142 @@
+import math
+
+import numpy as np
+
+# Cuantil normal de los niveles de confianza admitidos
+Z_VALUES = {0.9: 1.6448536269514722, 0.95: 1.959963984540054, 0.99: 2.5758293035489004}
+# Remuestreos por solicitud: el costo es remuestreos x patrones distintos, no depende de las filas
+BOOTSTRAP_SAMPLES = 1000
+MAX_BOOTSTRAP_SAMPLES = 5000
+BOOTSTRAP_SEED = 20240601
+# Remuestreos x patrones de cada extracción: acota la memoria aunque haya muchos patrones (p. ej. con pesos)
+BOOTSTRAP_CHUNK = 1_000_000
+# Tope de remuestreos x patrones por solicitud: acota el tiempo de cálculo
+MAX_BOOTSTRAP_DRAWS = 20_000_000
+
+
+def wilson_interval(successes, n, z):
+    """Intervalo de Wilson (en proporción) para uno o varios conteos de éxitos sobre n"""
+    successes = np.asarray(successes, dtype=float)
+    p = successes / n
+    denominator = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    margin = z * np.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return np.clip(center - margin, 0, 1), np.clip(center + margin, 0, 1)
+
+
+def effective_size(frequencies, weights=None):
+    """Tamaño de muestra efectivo de Kish (filas distintas, su frecuencia y su peso)"""
+    if weights is None:
+        return float(frequencies.sum())
+    mass = frequencies * weights
+    return float(mass.sum() ** 2 / np.dot(mass, weights))
+
+
+def weighted_means(patterns, frequencies, weights=None):
+    """Media (ponderada si hay pesos) de cada columna de `patterns`"""
+    mass = frequencies if weights is None else frequencies * weights
+    return (mass @ patterns) / mass.sum()
+
+
+def mean_interval(scores, frequencies, z, weights=None):
+    """Intervalo normal para la media de puntajes por respuesta (puntajes distintos, frecuencia y peso)"""
+    mass = frequencies if weights is None else frequencies * weights
+    n = effective_size(frequencies, weights)
+    mean = np.dot(mass, scores) / mass.sum()
+    variance = np.dot(mass, (scores - mean) ** 2) / mass.sum() * n / max(n - 1, 1)
+    margin = z * math.sqrt(variance / n)
+    return max(mean - margin, 0.0), min(mean + margin, 1.0)
+
+
+def bootstrap_means(patterns, frequencies, samples, level, weights=None, seed=BOOTSTRAP_SEED):
+    """Percentiles bootstrap de la media de cada columna de `patterns` (filas distintas y su frecuencia).
+
+    Remuestrear n filas con reposición equivale a una multinomial sobre las filas distintas:
+    los remuestreos se extraen en bloques de hasta BOOTSTRAP_CHUNK celdas (el resultado es el mismo
+    que con una sola extracción) y cada bloque se resume con un producto matricial. Más de
+    MAX_BOOTSTRAP_DRAWS remuestreos x patrones es un ValueError.
+    """
+    if samples * len(frequencies) > MAX_BOOTSTRAP_DRAWS:
+        raise ValueError(
+            f'bootstrap: {samples} remuestreos x {len(frequencies)} combinaciones de respuestas supera el '
+            f'máximo de {MAX_BOOTSTRAP_DRAWS}; pida menos samples o use ci=wilson'
+        )
+    n = int(frequencies.sum())
+    rng = np.random.default_rng(seed)
+    step = max(1, BOOTSTRAP_CHUNK // max(len(frequencies), 1))
+    means = np.empty((samples, patterns.shape[1]))
+    for start in range(0, samples, step):
+        draws = rng.multinomial(n, frequencies / n, size=min(step, samples - start))
+        mass = draws if weights is None else draws * weights
+        means[start:start + len(draws)] = (mass @ patterns) / mass.sum(axis=1, keepdims=True)
+    tail = (1 - level) / 2 * 100
+    return np.percentile(means, [tail, 100 - tail], axis=0)
+
+
+def chi_square_sf(statistic, dof):
+    """P(X >= statistic) para X ~ chi-cuadrado con dof grados de libertad (gamma incompleta regularizada)"""
+    if dof <= 0:
+        return None
+    a, x = dof / 2, statistic / 2
+    if x <= 0:
+        return 1.0
+    log_prefix = a * math.log(x) - x - math.lgamma(a)
+    if x < a + 1:
+        # Serie de la gamma inferior
+        term = total = 1 / a
+        k = a
+        for _ in range(500):
+            k += 1
+            term *= x / k
+            total += term
+            if abs(term) < abs(total) * 1e-15:
+                break
+        return max(0.0, 1 - total * math.exp(log_prefix))
+    # Fracción continua de la gamma superior (Lentz)
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    for i in range(1, 500):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return min(1.0, math.exp(log_prefix) * h)
+
+
+def chi_square(tables):
+    """Prueba chi-cuadrado de independencia para tablas de contingencia (..., filas, columnas) a la vez.
+
+    Retorna arreglos con la forma de los ejes iniciales (estadístico, grados de libertad, V de Cramér,
+    celdas con frecuencia esperada < 5) y los residuos estandarizados ajustados de cada celda.
+    """
+    tables = np.asarray(tables, dtype=float)
+    rows = tables.sum(axis=-1)
+    cols = tables.sum(axis=-2)
+    n = rows.sum(axis=-1)
+    safe_n = np.where(n > 0, n, 1)[..., None, None]
+    expected = rows[..., :, None] * cols[..., None, :] / safe_n
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        statistic = np.where(expected > 0, (tables - expected) ** 2 / expected, 0).sum(axis=(-2, -1))
+        # Residuos ajustados: (O - E) / sqrt(E (1 - fila/n) (1 - columna/n))
+        scale = expected * (1 - rows[..., :, None] / safe_n) * (1 - cols[..., None, :] / safe_n)
+        residuals = np.where(scale > 0, (tables - expected) / np.sqrt(scale), 0)
+
+    # Filas y columnas vacías no cuentan para los grados de libertad
+    used_rows = np.maximum((rows > 0).sum(axis=-1) - 1, 0)
+    used_cols = np.maximum((cols > 0).sum(axis=-1) - 1, 0)
+    dof = used_rows * used_cols
+    k = np.minimum(used_rows, used_cols)
+    cramers_v = np.where(k > 0, np.sqrt(statistic / (safe_n[..., 0, 0] * np.maximum(k, 1))), np.nan)
+    low_expected = ((expected > 0) & (expected < 5)).sum(axis=(-2, -1))
+    return statistic, dof, cramers_v, low_expected, residuals
@@ -3,14 +3,24 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask, request
 from flask_cors import CORS
 from src.models.user import db
 from src.routes.user import user_bp
-from src.routes.dashboard import dashboard_bp
+from src.routes.dashboard import dashboard_bp, aggregate_store, snapshot_publisher, wave_set, profile_spool, memory_budget
+from src.memory import deep_sizeof, memory_report, summary
+from src.profiling import ProfilingMiddleware, RequestProfiler
+from src.compression import precompressed_response
+from src.static_assets import StaticAssets
+from src.snapshots import DashboardJSONProvider
+from src.models import aggregate  # noqa: F401 - registra las tablas de agregados
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+# Claves de distribuciones mixtas (NaN, números y el grupo de suprimidas) se serializan como texto
+app.json = DashboardJSONProvider(app)
+# Token requerido para los endpoints de administración (ingesta, recarga)
+app.config['DASHBOARD_ADMIN_TOKEN'] = os.environ.get('DASHBOARD_ADMIN_TOKEN')
 
 # Enable CORS for all routes
 CORS(app)
@@ -19,11 +29,33 @@ app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(dashboard_bp, url_prefix='/api')
 
 # uncomment if you need to use database
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DASHBOARD_DATABASE_URI') or f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
 with app.app_context():
     db.create_all()
+    # Cargar los agregados materializados (o reconstruirlos si cambió el archivo)
+    aggregate_store.sync()
+    # Ediciones anteriores de la encuesta: se cargan desde la base si ya estaban materializadas
+    wave_set.refresh()
+
+def is_admin(environ):
+    """True si la solicitud trae el token de administración configurado"""
+    token = app.config.get('DASHBOARD_ADMIN_TOKEN')
+    return bool(token) and environ.get('HTTP_X_ADMIN_TOKEN') == token
+
+# Perfilado a pedido de un administrador (X-Profile: cprofile|sample) o de una fracción de las solicitudes
+app.wsgi_app = ProfilingMiddleware(app.wsgi_app, RequestProfiler(
+    profile_spool,
+    is_admin,
+    sample_rate=float(os.environ.get('DASHBOARD_PROFILE_SAMPLE_RATE', 0)),
+    sample_mode=os.environ.get('DASHBOARD_PROFILE_MODE', 'sample'),
+))
+
+# Manifiesto del frontend compilado: evita tocar el disco en cada request
+static_assets = StaticAssets(app.static_folder)
+memory_budget.track('static_assets', lambda: deep_sizeof(static_assets.assets))
+print(summary(memory_report(aggregate_store, memory_budget, wave_set.waves)))
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
@@ -32,15 +64,20 @@ def serve(path):
     if static_folder_path is None:
             return "Static folder not configured", 404
 
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
-            return "index.html not found", 404
+    # Snapshots prerenderados: se sirven desde memoria con la variante comprimida adecuada
+    if path.startswith('snapshots/') and path.endswith('.json'):
+        snapshot = snapshot_publisher.get(path[len('snapshots/'):-len('.json')])
+        if snapshot is not None:
+            return precompressed_response(request, snapshot.variants, 'application/json',
+                                          etag=snapshot.etag, cache_control='no-cache')
+
+    response = static_assets.response(request, path)
+    if response is None:
+        return "index.html not found", 404
+    return response
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Servidor de desarrollo: el depurador solo se activa con DASHBOARD_DEBUG=1 (producción: src/serve.py)
+    app.run(host=os.environ.get('HOST', '0.0.0.0'), port=int(os.environ.get('PORT', 5000)),
+            debug=os.environ.get('DASHBOARD_DEBUG') in ('1', 'true'))
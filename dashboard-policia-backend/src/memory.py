@@ -0,0 +1,183 @@
+import gc
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+MB = 1024 * 1024
+# Columnas más pesadas que se muestran en el resumen de inicio
+SUMMARY_COLUMNS = 5
+
+
+def process_rss():
+    """Memoria residente del proceso en bytes (Linux, /proc); None donde no está disponible"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def deep_sizeof(obj, _seen=None):
+    """Bytes aproximados de un objeto y de todo lo que contiene (arrays por nbytes, pandas en profundidad)"""
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        return sys.getsizeof(obj) + (0 if obj.flags.owndata else obj.nbytes)
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return int(np.sum(obj.memory_usage(deep=True)))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, bool)) or obj is None:
+        return size
+    if hasattr(obj, 'items'):
+        return size + sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(deep_sizeof(item, seen) for item in obj)
+    if hasattr(obj, '__dict__'):
+        size += deep_sizeof(vars(obj), seen)
+    for name in getattr(type(obj), '__slots__', ()):
+        size += deep_sizeof(getattr(obj, name, None), seen)
+    return size
+
+
+def frame_usage(df):
+    """Bytes por columna (memory_usage profundo) e índice de un DataFrame"""
+    if df is None:
+        return {'rows': 0, 'index': 0, 'columns': {}, 'total': 0}
+    columns = {str(col): int(df.iloc[:, i].memory_usage(deep=True, index=False)) for i, col in enumerate(df.columns)}
+    index = int(df.index.memory_usage(deep=True))
+    return {'rows': len(df), 'index': index, 'columns': columns, 'total': index + sum(columns.values())}
+
+
+def snapshot_usage(snapshot):
+    """Bytes de las estructuras de un DatasetSnapshot: conteos, celdas e índices de etiquetas"""
+    if snapshot is None:
+        return {'measures': 0, 'total': 0}
+    usage = {
+        'measures': len(snapshot.counts),
+        'counts': sum(int(values.nbytes) for values in snapshot.counts.values()),
+        'cell_dims': int(snapshot.cell_dims.nbytes),
+        'cell_rows': int(snapshot.cell_rows.nbytes),
+        'cell_ids': deep_sizeof(dict(snapshot.cell_ids)),
+        'row_cells': int(snapshot.row_cells.nbytes),
+        'row_patterns': int(snapshot.row_patterns.nbytes),
+        'labels': deep_sizeof(dict(snapshot.labels)) + deep_sizeof(dict(snapshot.codes)),
+    }
+    usage['total'] = sum(value for key, value in usage.items() if key != 'measures')
+    return usage
+
+
+class MemoryBudget:
+    """Presupuestos de memoria: al superarlos se desalojan las cachés registradas, en orden de registro.
+
+    Una caché desalojable expone cache_nbytes() y evict_cache(target_bytes); los componentes
+    que no se pueden desalojar solo se informan.
+    """
+
+    def __init__(self, process_bytes=None, cache_bytes=None):
+        self.process_bytes = process_bytes
+        self.cache_bytes = cache_bytes
+        self.caches = {}
+        self.components = {}
+        self.evictions = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, cache):
+        """Caché desalojable, de la más barata a la más costosa de reconstruir"""
+        self.caches[name] = cache
+        self.evictions[name] = 0
+
+    def track(self, name, nbytes):
+        """Componente que solo se informa; nbytes() retorna su tamaño actual"""
+        self.components[name] = nbytes
+
+    def _evict(self, name, target_bytes):
+        cache = self.caches[name]
+        before = cache.cache_nbytes()
+        if before > target_bytes:
+            cache.evict_cache(target_bytes)
+            self.evictions[name] += 1
+        return before - cache.cache_nbytes()
+
+    def enforce(self):
+        """Desaloja cachés si se supera algún presupuesto; retorna las cachés desalojadas"""
+        if not self.caches or (self.cache_bytes is None and self.process_bytes is None):
+            return []
+        # Si otro hilo ya está desalojando, no hace falta repetirlo
+        if not self._lock.acquire(blocking=False):
+            return []
+        try:
+            evicted = []
+            if self.cache_bytes is not None:
+                excess = sum(cache.cache_nbytes() for cache in self.caches.values()) - self.cache_bytes
+                for name, cache in self.caches.items():
+                    if excess <= 0:
+                        break
+                    freed = self._evict(name, max(cache.cache_nbytes() - excess, 0))
+                    if freed:
+                        evicted.append(name)
+                        excess -= freed
+            if self.process_bytes is not None:
+                rss = process_rss()
+                if rss is not None and rss > self.process_bytes:
+                    # Sobre el tope del proceso se vacían todas las cachés
+                    for name in self.caches:
+                        if self._evict(name, 0) and name not in evicted:
+                            evicted.append(name)
+                    gc.collect()
+            return evicted
+        finally:
+            self._lock.release()
+
+    def report(self):
+        """Bytes de cada caché y componente registrados"""
+        caches = {
+            name: {'bytes': cache.cache_nbytes(), 'evictable': True, 'evictions': self.evictions[name]}
+            for name, cache in self.caches.items()
+        }
+        caches.update({name: {'bytes': nbytes(), 'evictable': False} for name, nbytes in self.components.items()})
+        return caches
+
+
+def memory_report(store, budget, waves=()):
+    """Desglose de la memoria: dataset por columna, agregados, otras olas, cachés y presupuestos"""
+    dataset = frame_usage(store.processor.df)
+    aggregates = snapshot_usage(store.snapshot)
+    other_waves = {}
+    for wave in waves:
+        if wave.store is not store:
+            other_waves[wave.edition] = {
+                'dataset': frame_usage(wave.store.processor.df)['total'],
+                'aggregates': snapshot_usage(wave.store.snapshot)['total'],
+            }
+    caches = budget.report()
+    tracked = (dataset['total'] + aggregates['total'] + sum(caches[name]['bytes'] for name in caches)
+               + sum(sum(wave.values()) for wave in other_waves.values()))
+    return {
+        'process': {'rss_bytes': process_rss(), 'tracked_bytes': tracked},
+        'dataset': dataset,
+        'aggregates': aggregates,
+        'waves': other_waves,
+        'caches': caches,
+        'budgets': {'process_bytes': budget.process_bytes, 'cache_bytes': budget.cache_bytes},
+    }
+
+
+def summary(report):
+    """Resumen de una línea para el log de inicio"""
+    rss = report['process']['rss_bytes']
+    heaviest = sorted(report['dataset']['columns'].items(), key=lambda item: item[1], reverse=True)[:SUMMARY_COLUMNS]
+    parts = [
+        f"proceso {rss / MB:.1f} MB" if rss is not None else "proceso s/d",
+        f"dataset {report['dataset']['total'] / MB:.1f} MB ({report['dataset']['rows']} filas)",
+        f"agregados {report['aggregates']['total'] / MB:.1f} MB",
+        f"olas {sum(sum(wave.values()) for wave in report['waves'].values()) / MB:.1f} MB",
+        f"cachés {sum(cache['bytes'] for cache in report['caches'].values()) / MB:.1f} MB "
+        f"(desalojables {sum(cache['bytes'] for cache in report['caches'].values() if cache['evictable']) / MB:.1f} MB)",
+    ]
+    columns = ', '.join(f"{col.strip()[:30]} {size / MB:.2f} MB" for col, size in heaviest)
+    return f"Memoria: {'; '.join(parts)}. Columnas más pesadas: {columns}"
@@ -0,0 +1,46 @@
+from datetime import datetime
+from src.models.user import db
+
+class AggregateState(db.Model):
+    """Estado de la materialización de agregados para una fuente de datos"""
+    __tablename__ = 'aggregate_state'
+
+    source = db.Column(db.String(255), primary_key=True)
+    version = db.Column(db.String(64), nullable=False)
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+    layout = db.Column(db.Text, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<AggregateState {self.source} {self.version}>'
+
+
+class AggregateCount(db.Model):
+    """Conteo precalculado de una medida (distribución, cruce, KPI) en una celda de filtros"""
+    __tablename__ = 'aggregate_count'
+    __table_args__ = (
+        db.UniqueConstraint('source', 'measure', 'cell', 'bucket', name='uq_aggregate_count'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(255), nullable=False, index=True)
+    measure = db.Column(db.String(512), nullable=False)
+    cell = db.Column(db.Integer, nullable=False)
+    bucket = db.Column(db.Integer, nullable=False)
+    value = db.Column(db.BigInteger, nullable=False)
+
+    def __repr__(self):
+        return f'<AggregateCount {self.measure} {self.cell}:{self.bucket}={self.value}>'
+
+
+class SurveyResponse(db.Model):
+    """Respuesta de encuesta ingresada por API, adicional al archivo Excel"""
+    __tablename__ = 'survey_response'
+
+    id = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(255), nullable=False, index=True)
+    payload = db.Column(db.Text, nullable=False)
+    received_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<SurveyResponse {self.id}>'
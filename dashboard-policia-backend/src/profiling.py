@@ -0,0 +1,363 @@
+import cProfile
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from urllib.parse import parse_qs
+
+logger = logging.getLogger(__name__)
+
+# Intervalo del muestreador (segundos) y profundidad máxima de cada pila
+SAMPLE_INTERVAL = 0.005
+MAX_STACK_DEPTH = 128
+PROFILE_MODES = ('cprofile', 'sample')
+SPEEDSCOPE_SCHEMA = 'https://www.speedscope.app/file-format-schema.json'
+PROFILE_ID = re.compile(r'^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$')
+# Conexiones de larga duración que nunca se perfilan (KPIs por Server-Sent Events)
+UNPROFILED_PATHS = ('/api/kpis/stream',)
+
+
+class _SamplerHub:
+    """Un único hilo muestrea las pilas de todas las sesiones en curso (no uno por solicitud)"""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        # Muestreadores activos -> hilo que están muestreando
+        self._active = {}
+        self._changed = threading.Condition()
+        self._thread = None
+
+    def add(self, sampler, thread_id):
+        with self._changed:
+            self._active[sampler] = thread_id
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+                self._thread.start()
+            self._changed.notify()
+
+    def remove(self, sampler):
+        with self._changed:
+            self._active.pop(sampler, None)
+
+    def _run(self):
+        while True:
+            with self._changed:
+                # Sin sesiones activas el hilo espera sin despertarse
+                while not self._active:
+                    self._changed.wait()
+            time.sleep(self.interval)
+            with self._changed:
+                frames = sys._current_frames()
+                now = time.perf_counter()
+                for sampler, thread_id in self._active.items():
+                    sampler.record(frames.get(thread_id), now)
+
+
+class _Sampler:
+    """Pila de un hilo cada SAMPLE_INTERVAL segundos, tomada por el hilo compartido (formato speedscope)"""
+
+    hub = _SamplerHub()
+
+    def __init__(self):
+        self.frames = []
+        self._frame_index = {}
+        self.samples = []
+        self.weights = []
+        self.duration = 0.0
+        self._last = None
+
+    def resume(self):
+        """Muestrea el hilo actual hasta pause(): cada bloque de la respuesta puede salir de otro hilo"""
+        self._resumed = self._last = time.perf_counter()
+        self.hub.add(self, threading.get_ident())
+
+    def pause(self):
+        # Al volver de remove() el hilo compartido ya no registra muestras de esta sesión
+        self.hub.remove(self)
+        self.duration += time.perf_counter() - self._resumed
+
+    def record(self, frame, now):
+        """Agrega la pila de `frame` con el tiempo desde la muestra anterior (lo llama el hilo compartido)"""
+        stack = []
+        while frame is not None and len(stack) < MAX_STACK_DEPTH:
+            stack.append(self._frame(frame.f_code))
+            frame = frame.f_back
+        if stack:
+            # speedscope espera la pila de la raíz hacia la hoja
+            self.samples.append(stack[::-1])
+            self.weights.append(round((now - self._last) * 1000, 3))
+        self._last = now
+
+    def _frame(self, code):
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        index = self._frame_index.get(key)
+        if index is None:
+            index = self._frame_index[key] = len(self.frames)
+            self.frames.append({'name': code.co_name, 'file': code.co_filename, 'line': code.co_firstlineno})
+        return index
+
+    def speedscope(self, name):
+        return {
+            '$schema': SPEEDSCOPE_SCHEMA,
+            'shared': {'frames': self.frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'milliseconds',
+                'startValue': 0,
+                'endValue': round(self.duration * 1000, 3),
+                'samples': self.samples,
+                'weights': self.weights,
+            }],
+            'name': name,
+            'exporter': 'dashboard-policia',
+        }
+
+
+class ProfileSpool:
+    """Carpeta de perfiles con tope de tamaño: al superarlo se borran los más antiguos"""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _paths(self, profile_id):
+        return [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.startswith(profile_id + '.')]
+
+    def save(self, profile_id, extension, write, meta):
+        """Escribe el perfil (write(path)) y su metadato, y recorta la carpeta al tope"""
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f'{profile_id}.{extension}')
+            write(path)
+            meta = dict(meta, id=profile_id, file=os.path.basename(path), size=os.path.getsize(path))
+            with open(os.path.join(self.directory, f'{profile_id}.meta.json'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+            self._trim(keep=profile_id)
+        return meta
+
+    def _trim(self, keep):
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, name.split('.', 1)[0], stat.st_size))
+        total = sum(size for _, _, size in entries)
+        # Se borra por perfil completo (archivo y metadato), del más antiguo al más nuevo
+        for _, profile_id, _ in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if profile_id == keep:
+                continue
+            for path in self._paths(profile_id):
+                total -= os.path.getsize(path)
+                os.remove(path)
+
+    def list(self):
+        """Metadatos de los perfiles guardados, del más reciente al más antiguo"""
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.meta.json'):
+                try:
+                    with open(os.path.join(self.directory, name), encoding='utf-8') as f:
+                        profiles.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return sorted(profiles, key=lambda meta: meta['created'], reverse=True)
+
+    def path(self, profile_id):
+        """Ruta del perfil `profile_id` o None si no existe"""
+        if not PROFILE_ID.match(profile_id) or not os.path.isdir(self.directory):
+            return None
+        paths = [path for path in self._paths(profile_id) if not path.endswith('.meta.json')]
+        return paths[0] if paths else None
+
+
+class RequestProfiler:
+    """Perfila solicitudes a pedido de un administrador (X-Profile o ?profile=) o por muestreo aleatorio"""
+
+    def __init__(self, spool, is_admin, sample_rate=0.0, sample_mode='sample'):
+        self.spool = spool
+        self.is_admin = is_admin
+        self.sample_rate = sample_rate
+        self.sample_mode = sample_mode
+
+    def requested_mode(self, environ):
+        """Modo de perfilado de la solicitud o None para no perfilarla"""
+        mode = environ.get('HTTP_X_PROFILE')
+        if mode is None:
+            mode = parse_qs(environ.get('QUERY_STRING', '')).get('profile', [None])[0]
+        if mode:
+            mode = 'cprofile' if mode in ('1', 'true') else mode
+            if mode in PROFILE_MODES and self.is_admin(environ):
+                return mode
+            return None
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return self.sample_mode
+        return None
+
+    def start(self, mode, environ):
+        """Sesión de perfilado de una solicitud, en pausa hasta el primer resume()"""
+        return ProfileSession(self.spool, mode, environ)
+
+
+class ProfileSession:
+    """Perfil de una solicitud que se activa solo mientras se genera la respuesta (resume/pause)"""
+
+    def __init__(self, spool, mode, environ):
+        self.spool = spool
+        self.mode = mode
+        self.environ = environ
+        self.id = f"{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.done = False
+        self._elapsed = 0.0
+        self._profiler = cProfile.Profile() if mode == 'cprofile' else _Sampler()
+        # cProfile engancha el hilo que llama a enable(): solo se activa en el hilo de la solicitud
+        # y disable() corre en ese mismo hilo; los bloques generados en otro hilo no se perfilan
+        self._thread_id = None
+        self._enabled = False
+        self.skipped_chunks = 0
+
+    def resume(self):
+        if self.done:
+            return
+        self._resumed = time.perf_counter()
+        if self.mode != 'cprofile':
+            self._profiler.resume()
+            return
+        thread_id = threading.get_ident()
+        if self._thread_id is None:
+            self._thread_id = thread_id
+        if thread_id != self._thread_id:
+            self.skipped_chunks += 1
+            return
+        try:
+            self._profiler.enable()
+        except ValueError:
+            # Otro perfilador ya activo en el intérprete (Python 3.12+): este bloque no se perfila
+            self.skipped_chunks += 1
+            return
+        self._enabled = True
+
+    def pause(self):
+        if self.done:
+            return
+        if self.mode != 'cprofile':
+            self._profiler.pause()
+        elif self._enabled and threading.get_ident() == self._thread_id:
+            self._profiler.disable()
+            self._enabled = False
+        self._elapsed += time.perf_counter() - self._resumed
+
+    def cancel(self):
+        """Descarta el perfil sin guardarlo"""
+        if self.done:
+            return
+        self.pause()
+        self.done = True
+
+    def finish(self):
+        """Guarda el perfil y retorna su metadato (None si ya estaba cerrado)"""
+        if self.done:
+            return None
+        self.done = True
+        if self.mode == 'cprofile':
+            extension, write = 'prof', self._profiler.dump_stats
+        else:
+            name = f"{self.environ.get('REQUEST_METHOD')} {self.environ.get('PATH_INFO')}"
+            document = self._profiler.speedscope(name)
+
+            def write(path):
+                with open(path, 'w', encoding='utf-8') as f:
+                    json.dump(document, f)
+            extension = 'speedscope.json'
+
+        return self.spool.save(self.id, extension, write, {
+            'mode': self.mode,
+            'method': self.environ.get('REQUEST_METHOD'),
+            'path': self.environ.get('PATH_INFO'),
+            'query': self.environ.get('QUERY_STRING', ''),
+            'duration_ms': round(self._elapsed * 1000, 2),
+            'skipped_chunks': self.skipped_chunks,
+            'created': datetime.utcnow().isoformat(timespec='milliseconds') + 'Z',
+        })
+
+
+class _ProfiledBody:
+    """Iterable WSGI que deja pasar cada bloque perfilando su generación; el perfil se guarda en close()"""
+
+    def __init__(self, result, session):
+        self._result = result
+        self._iterator = None
+        self._session = session
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self._session.resume()
+        try:
+            if self._iterator is None:
+                self._iterator = iter(self._result)
+            return next(self._iterator)
+        finally:
+            self._session.pause()
+
+    def close(self):
+        try:
+            if hasattr(self._result, 'close'):
+                self._session.resume()
+                try:
+                    self._result.close()
+                finally:
+                    self._session.pause()
+        finally:
+            try:
+                self._session.finish()
+            except Exception:
+                logger.exception("Error saving profile %s", self._session.id)
+
+
+class ProfilingMiddleware:
+    """Middleware WSGI: perfila la app y cada bloque de la respuesta sin retenerla, así el streaming sigue fluyendo"""
+
+    def __init__(self, wsgi_app, profiler):
+        self.wsgi_app = wsgi_app
+        self.profiler = profiler
+
+    def __call__(self, environ, start_response):
+        mode = self.profiler.requested_mode(environ)
+        if mode is None or environ.get('PATH_INFO') in UNPROFILED_PATHS:
+            return self.wsgi_app(environ, start_response)
+
+        session = self.profiler.start(mode, environ)
+
+        def profiled_start_response(status, headers, exc_info=None):
+            content_type = next((v for k, v in headers if k.lower() == 'content-type'), '')
+            if content_type.startswith('text/event-stream'):
+                # Una conexión SSE dura lo que el cliente quiera: no se perfila
+                session.cancel()
+            else:
+                headers = list(headers) + [('X-Profile-Id', session.id)]
+            return start_response(status, headers, exc_info)
+
+        session.resume()
+        try:
+            result = self.wsgi_app(environ, profiled_start_response)
+        except BaseException:
+            session.cancel()
+            raise
+        finally:
+            session.pause()
+        if session.done:
+            return result
+        return _ProfiledBody(result, session)
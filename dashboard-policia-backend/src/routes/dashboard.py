@@ -1,27 +1,221 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, g, has_request_context, jsonify, request, current_app, Response, send_file, stream_with_context
+from functools import wraps
+import json
 import os
 from src.data_processor import DataProcessor
+from src.aggregates import AggregateStore, SECTIONS
+from src.features import NUMERIC_FEATURES
+from src.associations import AssociationMatrix
+from src.inference import Z_VALUES, BOOTSTRAP_SAMPLES, MAX_BOOTSTRAP_SAMPLES
+from src.events import KpiFeed
+from src.snapshots import SnapshotPublisher
+from src.waves import WaveSet
+from src.profiling import ProfileSpool
+from src.slowlog import RequestTrace, SlowRequestLog
+from src.memory import MB, MemoryBudget, deep_sizeof, memory_report
+from src.compression import precompressed_response
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
-# Inicializar el procesador de datos
-excel_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'data', 'Dashboard_Encuesta_Base.xlsx')
-data_processor = DataProcessor(excel_path)
+# Inicializar el procesador de datos (DASHBOARD_EXCEL_PATH permite usar otro libro, p. ej. en load_test.py)
+excel_path = os.environ.get('DASHBOARD_EXCEL_PATH') or os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'data', 'Dashboard_Encuesta_Base.xlsx')
+# Los segmentos no se agrupan aquí: aggregate_store.sync() restaura los guardados para este archivo
+data_processor = DataProcessor(excel_path, fit_segments=False)
+
+# Conteos precalculados por celda de filtros (materializados en la base de datos)
+# DASHBOARD_MIN_CELL_SIZE: conteos menores a este valor no se publican (k-anonimato)
+aggregate_store = AggregateStore(data_processor, min_cell_size=int(os.environ.get('DASHBOARD_MIN_CELL_SIZE', 0)))
+
+# Suscriptores SSE que reciben los KPIs cuando cambian los datos
+# Bajo WSGI cada suscriptor ocupa un hilo: DASHBOARD_SSE_MAX_THREADS limita cuántos a la vez
+kpi_feed = KpiFeed(aggregate_store, max_threaded=int(os.environ.get('DASHBOARD_SSE_MAX_THREADS', 8)))
+
+# Márgenes de población para ponderar las respuestas (?weighted=1), si el archivo existe
+margins_path = os.path.join(os.path.dirname(excel_path), 'population_margins.json')
+if os.path.exists(margins_path):
+    with open(margins_path, encoding='utf-8') as f:
+        aggregate_store.set_margins(json.load(f))
+
+# Ediciones de la encuesta (data/waves.json) para las series temporales de /api/trends
+wave_set = WaveSet(aggregate_store, os.path.dirname(excel_path))
+
+# Respuestas sin filtros prerenderadas en static/snapshots al cambiar la versión de los datos
+snapshots_dir = os.environ.get('DASHBOARD_SNAPSHOTS_DIR') or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static', 'snapshots')
+snapshot_publisher = SnapshotPublisher(aggregate_store, snapshots_dir)
+
+# Matrices de asociación entre preguntas (V de Cramér e información mutua) por versión y filtro
+association_matrix = AssociationMatrix(aggregate_store)
+
+# Perfiles de solicitudes (X-Profile / ?profile= o DASHBOARD_PROFILE_SAMPLE_RATE), con tope de tamaño en disco
+profiles_dir = os.environ.get('DASHBOARD_PROFILE_DIR') or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'profiles')
+profile_spool = ProfileSpool(profiles_dir, int(float(os.environ.get('DASHBOARD_PROFILE_MAX_MB', 50)) * 1024 * 1024))
+
+# Registro de solicitudes lentas (JSON lines rotativo) para decidir qué precalcular
+slow_log_path = os.environ.get('DASHBOARD_SLOW_LOG_PATH') or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'logs', 'slow_requests.jsonl')
+slow_request_log = SlowRequestLog(
+    slow_log_path,
+    threshold_ms=float(os.environ.get('DASHBOARD_SLOW_REQUEST_MS', 500)),
+    max_bytes=int(float(os.environ.get('DASHBOARD_SLOW_LOG_MAX_MB', 10)) * 1024 * 1024),
+)
+
+# Presupuestos de memoria (MB): superarlos desaloja las cachés antes de que el proceso siga creciendo
+def budget_bytes(name):
+    value = os.environ.get(name)
+    return int(float(value) * MB) if value else None
+
+memory_budget = MemoryBudget(process_bytes=budget_bytes('DASHBOARD_MEMORY_BUDGET_MB'),
+                             cache_bytes=budget_bytes('DASHBOARD_CACHE_BUDGET_MB'))
+memory_budget.register('raking', aggregate_store)
+memory_budget.register('trends', wave_set)
+memory_budget.register('associations', association_matrix)
+memory_budget.track('snapshots', lambda: deep_sizeof(snapshot_publisher.snapshots))
+memory_budget.track('kpi_events', kpi_feed.nbytes)
+aggregate_store.on_change(lambda version: memory_budget.enforce())
+
+# Máximo de consultas aceptadas por /api/batch
+MAX_BATCH_QUERIES = 200
+
+def parse_filters(args):
+    """Normaliza los parámetros de filtro de una consulta (y los anota en el registro de lentas)"""
+    filters = {
+        'distrito': args.get('distrito', 'all'),
+        'genero': args.get('genero', 'all'),
+        'edad': args.get('edad', 'all'),
+        'jerarquia': args.get('jerarquia', 'all'),
+        'estado_civil': args.get('estado_civil', 'all'),
+        'actividad_fisica': args.get('actividad_fisica', 'false'),
+        'segmento': args.get('segmento', 'all')
+    }
+    return g.trace.add_filters(filters)
+
+def parse_ci(args):
+    """Opciones de intervalos de confianza (?ci=wilson|bootstrap&level=0.95&samples=1000); None si no se piden"""
+    method = args.get('ci')
+    if not method:
+        return None
+    if method not in ('wilson', 'bootstrap'):
+        raise ValueError('ci debe ser "wilson" o "bootstrap"')
+    level = args.get('level', 0.95, type=float)
+    if level not in Z_VALUES:
+        raise ValueError(f'Niveles de confianza válidos: {", ".join(str(z) for z in Z_VALUES)}')
+    samples = args.get('samples', BOOTSTRAP_SAMPLES, type=int)
+    if not 1 <= samples <= MAX_BOOTSTRAP_SAMPLES:
+        raise ValueError(f'samples debe estar entre 1 y {MAX_BOOTSTRAP_SAMPLES}')
+    return {'method': method, 'level': level, 'samples': samples}
+
+def parse_stats(args):
+    """True si se pide el bloque de estadísticas de los cruces (?stats=1)"""
+    return args.get('stats') in ('1', 'true')
+
+def parse_weighted(args):
+    """True si se piden resultados ponderados (?weighted=1); requiere márgenes configurados"""
+    if args.get('weighted') not in ('1', 'true'):
+        return False
+    if not aggregate_store.margins:
+        raise ValueError('No hay márgenes de población configurados (PUT /api/weights)')
+    aggregate_store.validate_margins()
+    return True
+
+def sectioned_response(items):
+    """Respuesta con pares (sección, datos); en streaming si se pide ?stream=ndjson o ?stream=json"""
+    # En streaming cada sección se serializa y envía apenas se calcula
+    mode = request.args.get('stream')
+    dumps = current_app.json.dumps
+    items = g.trace.timed(items)
+
+    if mode == 'ndjson':
+        def generate():
+            try:
+                for section, data in items:
+                    yield dumps({'section': section, 'data': data}) + '\n'
+            except Exception as e:
+                yield dumps({'error': str(e)}) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    if mode == 'json':
+        def generate():
+            separator = '{'
+            try:
+                for section, data in items:
+                    yield f'{separator}{dumps(section)}:{dumps(data)}'
+                    separator = ','
+            except Exception as e:
+                yield f'{separator}"error":{dumps(str(e))}'
+                separator = ','
+            yield '{}' if separator == '{' else '}'
+        return Response(stream_with_context(generate()), mimetype='application/json')
+
+    try:
+        data = dict(items)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(data)
+
+def snapshot_response(name):
+    """Bytes prerenderados del snapshot `name` si la solicitud no tiene parámetros"""
+    g.trace.cache = 'miss'
+    if request.args:
+        return None
+    snapshot = snapshot_publisher.get(name)
+    if snapshot is None:
+        return None
+    g.trace.cache = 'hit'
+    return precompressed_response(request, snapshot.variants, 'application/json',
+                                  etag=snapshot.etag, cache_control='no-cache')
+
+def require_admin(view):
+    """Restringe un endpoint a clientes con el token de administración configurado"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = current_app.config.get('DASHBOARD_ADMIN_TOKEN')
+        if not token:
+            return jsonify({'error': 'Endpoint deshabilitado: DASHBOARD_ADMIN_TOKEN no configurado'}), 403
+        if request.headers.get('X-Admin-Token') != token:
+            return jsonify({'error': 'No autorizado'}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+@dashboard_bp.before_request
+def start_trace():
+    g.trace = RequestTrace()
+
+@dashboard_bp.after_request
+def log_slow_request(response):
+    return slow_request_log.watch(g.trace, request, response)
+
+def trace_selection(filters, selection):
+    """Anota en el registro de lentas la selección que resolvió los filtros de la solicitud"""
+    if has_request_context() and 'trace' in g:
+        g.trace.add_selection(filters, selection)
+
+aggregate_store.on_select(trace_selection)
+
+@dashboard_bp.after_request
+def enforce_memory_budget(response):
+    memory_budget.enforce()
+    return response
 
 @dashboard_bp.route('/data', methods=['GET'])
 def get_all_data():
     """Retorna todos los datos procesados de la encuesta"""
     try:
-        data = {
-            'demographics': data_processor.get_demographics_data(),
-            'habits': data_processor.get_habits_data(),
-            'health': data_processor.get_health_data(),
-            'knowledge': data_processor.get_knowledge_data(),
-            'quality_of_life': data_processor.get_quality_of_life_data(),
-            'kpis': data_processor.get_kpis(),
-            'filter_options': data_processor.get_filter_options()
-        }
-        return jsonify(data)
+        cached = snapshot_response('data')
+        if cached is not None:
+            return cached
+
+        stats = parse_stats(request.args)
+        try:
+            weighted = parse_weighted(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # Secciones y opciones de filtros salen del mismo snapshot, aun en streaming
+        snapshot = aggregate_store.current_snapshot()
+
+        def items():
+            yield from aggregate_store.iter_sections(stats=stats, weighted=weighted, snapshot=snapshot)
+            yield 'filter_options', aggregate_store.get_filter_options(snapshot)
+        return sectioned_response(items())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -29,34 +223,286 @@ def get_all_data():
 def get_filtered_data():
     """Retorna datos filtrados según los parámetros"""
     try:
-        filters = {
-            'distrito': request.args.get('distrito', 'all'),
-            'genero': request.args.get('genero', 'all'),
-            'edad': request.args.get('edad', 'all'),
-            'jerarquia': request.args.get('jerarquia', 'all'),
-            'estado_civil': request.args.get('estado_civil', 'all'),
-            'actividad_fisica': request.args.get('actividad_fisica', 'false')
-        }
-        
-        data = data_processor.get_filtered_data(filters)
+        filters = parse_filters(request.args)
+        try:
+            ci = parse_ci(request.args)
+            weighted = parse_weighted(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return sectioned_response(aggregate_store.iter_sections(filters, ci=ci, stats=parse_stats(request.args), weighted=weighted))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@dashboard_bp.route('/batch', methods=['POST'])
+def get_batch():
+    """Responde varias combinaciones de filtros en una sola pasada (NDJSON, un objeto por consulta)"""
+    try:
+        payload = request.get_json(silent=True)
+        queries = payload.get('queries') if isinstance(payload, dict) else payload
+        if not isinstance(queries, list) or not all(isinstance(q, dict) for q in queries):
+            return jsonify({'error': 'Se espera una lista de consultas en "queries"'}), 400
+        if len(queries) > MAX_BATCH_QUERIES:
+            return jsonify({'error': f'Máximo {MAX_BATCH_QUERIES} consultas por solicitud'}), 400
+
+        valid_sections = SECTIONS + ['kpis']
+        parsed = []
+        for query in queries:
+            sections = query.get('sections') or valid_sections
+            if not isinstance(sections, list) or any(section not in valid_sections for section in sections):
+                return jsonify({'error': f'Secciones válidas: {", ".join(valid_sections)}'}), 400
+            parsed.append((parse_filters(query.get('filters') or {}), sections))
+
+        trace = g.trace
+        requested = [section for _, sections in parsed for section in sections]
+        dumps = current_app.json.dumps
+
+        def generate():
+            # Un error a mitad de la respuesta se informa como una línea más, con la consulta que falló
+            index = 0
+            try:
+                results = aggregate_store.get_batch(parsed)
+                for index in range(len(parsed)):
+                    with trace.section('batch', requested):
+                        data = next(results)
+                    yield dumps({'index': index, 'data': data}) + '\n'
+            except Exception as e:
+                yield dumps({'index': index, 'error': str(e)}) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@dashboard_bp.route('/breakdown', methods=['GET'])
+def get_breakdown():
+    """Retorna KPIs y distribuciones separados por cada valor de una dimensión (ej. ?by=Distrito)"""
+    try:
+        valid_sections = SECTIONS + ['kpis']
+        sections = [s for s in request.args.get('sections', ','.join(valid_sections)).split(',') if s]
+        if not sections or any(section not in valid_sections for section in sections):
+            return jsonify({'error': f'Secciones válidas: {", ".join(valid_sections)}'}), 400
+        try:
+            aggregate_store.dimension(request.args.get('by', ''))
+            weighted = parse_weighted(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        with g.trace.section('breakdown', sections):
+            data = aggregate_store.get_breakdown(request.args['by'], sections, parse_filters(request.args),
+                                                 parse_stats(request.args), weighted)
         return jsonify(data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@dashboard_bp.route('/numeric', methods=['GET'])
+def get_numeric():
+    """Media, mediana, cuantiles e histograma de las respuestas ordinales (?features=age,seniority y filtros)"""
+    try:
+        features = [f for f in request.args.get('features', ','.join(NUMERIC_FEATURES)).split(',') if f]
+        if not features or any(feature not in NUMERIC_FEATURES for feature in features):
+            return jsonify({'error': f'Variables válidas: {", ".join(NUMERIC_FEATURES)}'}), 400
+        try:
+            weighted = parse_weighted(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        with g.trace.section('numeric', features):
+            data = aggregate_store.get_numeric_summary(parse_filters(request.args), features, weighted)
+        return jsonify(data)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@dashboard_bp.route('/associations', methods=['GET'])
+def get_associations():
+    """V de Cramér e información mutua entre todas las preguntas (?target=mental_health y filtros)"""
+    try:
+        filters = parse_filters(request.args)
+        with g.trace.section('associations'):
+            try:
+                data = association_matrix.get(filters, request.args.get('target') or None)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        return jsonify(data)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@dashboard_bp.route('/waves', methods=['GET'])
+def get_waves():
+    """Retorna las ediciones de la encuesta cargadas, en orden cronológico"""
+    try:
+        return jsonify({'waves': wave_set.describe()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@dashboard_bp.route('/waves/reload', methods=['POST'])
+@require_admin
+def reload_waves():
+    """Vuelve a leer data/waves.json; solo las ediciones nuevas se materializan"""
+    try:
+        try:
+            wave_set.refresh()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'waves': wave_set.describe()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@dashboard_bp.route('/trends', methods=['GET'])
+def get_trends():
+    """Retorna KPIs y distribuciones de cada edición de la encuesta (?sections=kpis, filtros, ci, stats y weighted)"""
+    try:
+        valid_sections = SECTIONS + ['kpis']
+        sections = [s for s in request.args.get('sections', ','.join(valid_sections)).split(',') if s]
+        if not sections or any(section not in valid_sections for section in sections):
+            return jsonify({'error': f'Secciones válidas: {", ".join(valid_sections)}'}), 400
+        filters = parse_filters(request.args)
+        try:
+            ci = parse_ci(request.args)
+            weighted = parse_weighted(request.args)
+            with g.trace.section('trends', sections):
+                trends = wave_set.get_trends(filters, sections, ci=ci, stats=parse_stats(request.args), weighted=weighted)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify(trends)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@dashboard_bp.route('/responses', methods=['POST'])
+@require_admin
+def ingest_responses():
+    """Ingresa nuevas respuestas y actualiza los agregados de forma incremental"""
+    try:
+        payload = request.get_json(silent=True) or {}
+        records = payload.get('responses') if isinstance(payload, dict) else payload
+        if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+            return jsonify({'error': 'Se espera una lista de respuestas en "responses"'}), 400
+
+        ingested = aggregate_store.ingest(records)
+        return jsonify({'ingested': ingested, 'version': aggregate_store.version}), 201
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@dashboard_bp.route('/reload', methods=['POST'])
+@require_admin
+def reload_data():
+    """Vuelve a leer el archivo Excel y reconstruye los agregados"""
+    try:
+        aggregate_store.reload()
+        # Si el libro base cambió, las olas se reasignan a los segmentos nuevos
+        wave_set.refresh()
+        return jsonify({'version': aggregate_store.version})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@dashboard_bp.route('/weights', methods=['GET'])
+def get_weights():
+    """Retorna los márgenes de población y el ajuste de los pesos por dimensión"""
+    try:
+        return jsonify(aggregate_store.get_weighting())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@dashboard_bp.route('/weights', methods=['PUT'])
+@require_admin
+def set_weights():
+    """Reemplaza los márgenes de población usados para ponderar ({"margins": {"Distrito": {"Norte": 350}}})"""
+    try:
+        payload = request.get_json(silent=True)
+        margins = payload.get('margins') if isinstance(payload, dict) else None
+        if not isinstance(margins, dict):
+            return jsonify({'error': 'Se espera un objeto "margins" con totales por dimensión'}), 400
+        try:
+            aggregate_store.set_margins(margins)
+            report = aggregate_store.get_weighting()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        with open(margins_path, 'w', encoding='utf-8') as f:
+            json.dump(aggregate_store.margins, f, ensure_ascii=False, indent=2)
+        return jsonify(report)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@dashboard_bp.route('/memory', methods=['GET'])
+@require_admin
+def get_memory():
+    """Desglose de la memoria: dataset por columna, agregados, olas, cachés y presupuestos"""
+    try:
+        return jsonify(memory_report(aggregate_store, memory_budget, wave_set.waves))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@dashboard_bp.route('/profiles', methods=['GET'])
+@require_admin
+def list_profiles():
+    """Lista los perfiles guardados (pstats o speedscope), del más reciente al más antiguo"""
+    try:
+        return jsonify({'profiles': profile_spool.list()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@dashboard_bp.route('/profiles/<profile_id>', methods=['GET'])
+@require_admin
+def download_profile(profile_id):
+    """Descarga un perfil: .prof para pstats/snakeviz o .speedscope.json para speedscope.app"""
+    try:
+        path = profile_spool.path(profile_id)
+        if path is None:
+            return jsonify({'error': 'Perfil no encontrado'}), 404
+        return send_file(path, as_attachment=True, download_name=os.path.basename(path))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @dashboard_bp.route('/kpis', methods=['GET'])
 def get_kpis():
-    """Retorna indicadores clave de rendimiento"""
+    """Retorna indicadores clave de rendimiento (acepta filtros y ?ci=wilson|bootstrap)"""
     try:
-        kpis = data_processor.get_kpis()
+        cached = snapshot_response('kpis')
+        if cached is not None:
+            return cached
+        try:
+            ci = parse_ci(request.args)
+            weighted = parse_weighted(request.args)
+            with g.trace.section('kpis'):
+                kpis = aggregate_store.get_kpis(parse_filters(request.args), ci, weighted)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         return jsonify(kpis)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@dashboard_bp.route('/kpis/stream', methods=['GET'])
+def stream_kpis():
+    """Server-Sent Events con los KPIs; se envían solo cuando cambia la versión de los datos (?diff=1 para diferencias)"""
+    try:
+        # Con el modo ASGI (src/serve.py) esta ruta no se usa: el stream se atiende sin hilos
+        if not kpi_feed.reserve():
+            response = jsonify({'error': 'Demasiados suscriptores SSE para el servidor WSGI; use el modo ASGI'})
+            response.headers['Retry-After'] = str(kpi_feed.keepalive)
+            return response, 503
+        last_version = request.headers.get('Last-Event-ID') or request.args.get('since')
+        diff = request.args.get('diff') in ('1', 'true')
+        response = Response(kpi_feed.stream(last_version, diff), mimetype='text/event-stream')
+        response.call_on_close(kpi_feed.release)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @dashboard_bp.route('/demographics', methods=['GET'])
 def get_demographics():
     """Retorna datos demográficos agregados"""
     try:
-        demographics = data_processor.get_demographics_data()
+        cached = snapshot_response('demographics')
+        if cached is not None:
+            return cached
+        try:
+            weighted = parse_weighted(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        with g.trace.section('demographics'):
+            demographics = aggregate_store.get_demographics_data(stats=parse_stats(request.args), weighted=weighted)
         return jsonify(demographics)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -65,7 +511,15 @@ def get_demographics():
 def get_habits():
     """Retorna datos de hábitos y bienestar"""
     try:
-        habits = data_processor.get_habits_data()
+        cached = snapshot_response('habits')
+        if cached is not None:
+            return cached
+        try:
+            weighted = parse_weighted(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        with g.trace.section('habits'):
+            habits = aggregate_store.get_habits_data(stats=parse_stats(request.args), weighted=weighted)
         return jsonify(habits)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -74,7 +528,15 @@ def get_habits():
 def get_health():
     """Retorna datos específicos de salud"""
     try:
-        health = data_processor.get_health_data()
+        cached = snapshot_response('health')
+        if cached is not None:
+            return cached
+        try:
+            weighted = parse_weighted(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        with g.trace.section('health'):
+            health = aggregate_store.get_health_data(stats=parse_stats(request.args), weighted=weighted)
         return jsonify(health)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -83,7 +545,15 @@ def get_health():
 def get_knowledge():
     """Retorna datos específicos de conocimiento y capacitación"""
     try:
-        knowledge = data_processor.get_knowledge_data()
+        cached = snapshot_response('knowledge')
+        if cached is not None:
+            return cached
+        try:
+            weighted = parse_weighted(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        with g.trace.section('knowledge'):
+            knowledge = aggregate_store.get_knowledge_data(stats=parse_stats(request.args), weighted=weighted)
         return jsonify(knowledge)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -92,7 +562,15 @@ def get_knowledge():
 def get_quality_of_life():
     """Retorna datos de percepción de calidad de vida"""
     try:
-        quality_of_life = data_processor.get_quality_of_life_data()
+        cached = snapshot_response('quality-of-life')
+        if cached is not None:
+            return cached
+        try:
+            weighted = parse_weighted(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        with g.trace.section('quality_of_life'):
+            quality_of_life = aggregate_store.get_quality_of_life_data(stats=parse_stats(request.args), weighted=weighted)
         return jsonify(quality_of_life)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -101,8 +579,25 @@ def get_quality_of_life():
 def get_filter_options():
     """Retorna las opciones disponibles para los filtros"""
     try:
-        options = data_processor.get_filter_options()
+        cached = snapshot_response('filter-options')
+        if cached is not None:
+            return cached
+        options = aggregate_store.get_filter_options()
         return jsonify(options)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@dashboard_bp.route('/segments', methods=['GET'])
+def get_segments():
+    """Perfiles de riesgo de los encuestados y tamaño de cada segmento en la selección (acepta filtros)"""
+    try:
+        try:
+            weighted = parse_weighted(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        with g.trace.section('segments'):
+            data = aggregate_store.get_segments(parse_filters(request.args), weighted)
+        return jsonify(data)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
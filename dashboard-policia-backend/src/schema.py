@@ -0,0 +1,194 @@
+import difflib
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# Campos del cuestionario: id estable -> encabezado de la columna en el libro Excel.
+# Los encabezados conservan los espacios originales (dobles o iniciales) porque son los
+# nombres de columna del DataFrame, de las medidas materializadas y de /api/responses.
+FIELDS = {
+    "survey_number": "N° Encuesta",
+    "gender": "Género",
+    "age": "Edad",
+    "hierarchy": "Jerarquía",
+    "district": "Distrito",
+    "seniority": "Antigüedad de Servicio",
+    "civil_status": "Estado Civil",
+    "has_children": "¿Tiene hijos?",
+    "children_count": "¿Cantidad de hijos?",
+    "physical_health": "Salud física actual",
+    "treatment_type": "Tipo de Tratamiento",
+    "mental_health": "Salud mental actual",
+    "psychological_treatment": "Tipo de Tratamiento Psicológico",
+    "chronic_condition": "Padecimiento base o crónico",
+    "medical_checkup": "¿Se ha realizado algún chequeo en los últimos 12 meses?",
+    "checkup_reason": "En caso afirmativo, ¿Cuál fue el motivo?",
+    "additional_services": "¿Realiza servicios adicionales?",
+    "service_overload": "¿Tiene recargo de servicios?",
+    "equipment_access": "¿Tienes acceso a equipos y herramientas adecuadas para realizar sus funciones?",
+    "safety_training": "¿Has recibido capacitación en seguridad y salud en el trabajo en los últimos 12 meses?",
+    "training_topic": "¿Sobre qué temática?",
+    "occupational_knowledge": "¿Tiene conocimiento  de los servicios relacionados a la salud ocupacional que proporciona la institución policial?",
+    "known_service_1": "Señale cuales",
+    "known_service_2": "Señale cuales2",
+    "known_service_3": "Señale cuales3",
+    "known_service_4": "Señale cuales4",
+    "known_service_5": "Señale cuales5",
+    "service_usage": "¿Los ha utilizado?",
+    "service_satisfaction": "¿Esta conforme?",
+    "work_accident": "¿Has experimentado algún incidente o accidente laboral en los últimos 12 meses?",
+    "recognition": "¿Te sientes valorado y reconocido por tus superiores?",
+    "risk_effort_remuneration": "¿Sientes que hay congruencias entre el riesgo y el esfuerzo en relación a la remuneración recibida?",
+    "professional_development": "¿Tienes oportunidades para el desarrollo profesional y el ascenso?",
+    "communication": "¿Te sientes cómodo comunicándote con tus superiores y compañeros?",
+    "economic_satisfaction": "¿Te sientes satisfecho con la situación económica de su hogar?",
+    "work_life_balance": "¿Te sientes cómodo con el equilibrio entre tu vida laboral y personal?",
+    "healthy_habits": "¿Consideras que tienen hábitos tendientes a un estilo de  vida sano?",
+    "extra_paid_activity": "¿Realizas alguna actividad remunerada extra?",
+    "hobbies": "¿Tiene algún hobbies?",
+    "physical_activity": "¿Realiza algún tipo de actividad física?",
+    "activity_frequency": "¿Con qué frecuencia?",
+    "needs_improvement": " ¿Considera que debe mejorar algunos de estos factores para contribuir a una mejor calidad de vida?",
+    "factor_1": "*¿Cuáles?",
+    "factor_2": "Columna1",
+    "factor_3": "Columna2",
+    "factor_4": "Columna3",
+    "factor_5": "Columna4",
+    "factor_6": "Columna5",
+    "factor_7": "Columna6",
+}
+
+# Encabezados de cada versión del cuestionario; una versión nueva solo lista los campos que cambian
+CURRENT_VERSION = "2024"
+SCHEMA_VERSIONS = {
+    CURRENT_VERSION: FIELDS,
+}
+
+# Preguntas de selección múltiple repartidas en varias columnas
+FIELD_GROUPS = {
+    "known_services": ["known_service_1", "known_service_2", "known_service_3", "known_service_4", "known_service_5"],
+    "factors": ["factor_1", "factor_2", "factor_3", "factor_4", "factor_5", "factor_6", "factor_7"],
+}
+
+# Preguntas cuyas respuestas se estandarizan a "Sí" / "No" / "A veces"
+YES_NO_FIELDS = [
+    "physical_activity", "has_children", "healthy_habits", "additional_services", "service_overload",
+    "extra_paid_activity", "hobbies", "medical_checkup", "work_accident", "safety_training",
+    "occupational_knowledge", "service_usage", "service_satisfaction", "equipment_access",
+    "professional_development", "recognition", "communication", "needs_improvement",
+    "economic_satisfaction", "risk_effort_remuneration", "work_life_balance", "physical_health", "mental_health",
+]
+
+# Punto medio (en años) de cada rango de antigüedad
+SENIORITY_MAP = {
+    "Menos de 1 año": 0.5,
+    "1 a 5 años": 3,
+    "6 a 10 años": 8,
+    "11 a 15 años": 13,
+    "16 a 20 años": 18,
+    "21 a 25 años": 23,
+    "26 a 30 años": 28,
+    "Más de 30 años": 35
+}
+
+# Escala de las preguntas de salud: mayor es mejor; "En tratamiento" cuenta como el peor estado
+HEALTH_SCALE = {"Muy buena": 4, "Buena": 3, "Regular": 2, "Mala": 1, "En tratamiento": 1}
+FREQUENCY_SCALE = {"Nunca": 0, "Poco Frecuente": 1, "Frecuente": 2, "Muy Frecuente": 3}
+
+# Posición fija de cada campo en un DataFrame normalizado por SurveySchema.conform
+FIELD_POSITIONS = {field: i for i, field in enumerate(FIELDS)}
+HEADER_POSITIONS = {header: i for i, header in enumerate(FIELDS.values())}
+
+# Similitud mínima (difflib) para aceptar un encabezado parecido
+FUZZY_CUTOFF = 0.9
+
+
+def normalize_header(header):
+    """Encabezado comparable: sin tildes, signos ni espacios repetidos, en minúsculas"""
+    text = unicodedata.normalize("NFKD", str(header))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"[^\w\s]", " ", text.casefold())
+    return " ".join(text.split())
+
+
+class SurveySchema:
+    """Resuelve los encabezados de un libro a los campos del registro, una sola vez por carga"""
+
+    def __init__(self, versions=SCHEMA_VERSIONS, current=CURRENT_VERSION, cutoff=FUZZY_CUTOFF):
+        self.versions = versions
+        self.current = current
+        self.cutoff = cutoff
+
+    def _headers(self, version):
+        """Encabezados de una versión, completados con los de la versión vigente"""
+        return {**self.versions[self.current], **self.versions[version]}
+
+    def match(self, columns):
+        """Retorna (versión, {campo: encabezado del libro}) para las columnas de un libro.
+
+        Primero se aceptan coincidencias exactas, luego encabezados iguales salvo espacios,
+        tildes y signos, y por último el más parecido por encima de `cutoff`; cada columna
+        del libro se asigna a un solo campo.
+        """
+        columns = [str(col) for col in columns]
+        version = max(self.versions, key=lambda v: sum(h in columns for h in self._headers(v).values()))
+        headers = self._headers(version)
+
+        matched, taken = {}, set()
+        for field, header in headers.items():
+            if header in columns and header not in taken:
+                matched[field] = header
+                taken.add(header)
+
+        normalized = {}
+        for col in columns:
+            normalized.setdefault(normalize_header(col), []).append(col)
+        for field, header in headers.items():
+            if field in matched:
+                continue
+            candidates = [col for col in normalized.get(normalize_header(header), []) if col not in taken]
+            if len(candidates) == 1:
+                matched[field] = candidates[0]
+                taken.add(candidates[0])
+
+        for field, header in headers.items():
+            if field in matched:
+                continue
+            free = {normalize_header(col): col for col in columns if col not in taken}
+            close = difflib.get_close_matches(normalize_header(header), list(free), n=1, cutoff=self.cutoff)
+            if close:
+                matched[field] = free[close[0]]
+                taken.add(free[close[0]])
+        return version, matched
+
+    def conform(self, df):
+        """DataFrame con los campos del registro en FIELD_POSITIONS y sus encabezados vigentes.
+
+        Los campos ausentes en el libro quedan como columnas vacías y las columnas que no son
+        del registro se conservan al final.
+        """
+        version, matched = self.match(df.columns)
+        fuzzy = {field: col for field, col in matched.items() if col != self._headers(version)[field]}
+        if fuzzy:
+            print(f"Encabezados aproximados (versión {version}): {fuzzy}")
+        original = {str(col): col for col in df.columns}
+        used = set(matched.values())
+
+        conformed = {}
+        for field, header in FIELDS.items():
+            col = matched.get(field)
+            conformed[header] = df[original[col]].to_numpy() if col is not None else np.full(len(df), np.nan, dtype=object)
+        for name, col in original.items():
+            if name not in used and name not in conformed:
+                conformed[col] = df[col].to_numpy()
+        return pd.DataFrame(conformed, index=df.index)
+
+
+SCHEMA = SurveySchema()
+
+
+def column(df, field):
+    """Columna de un campo por su posición en un DataFrame normalizado"""
+    return df.iloc[:, FIELD_POSITIONS[field]]
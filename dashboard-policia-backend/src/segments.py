@@ -0,0 +1,182 @@
+import numpy as np
+import pandas as pd
+
+from src.schema import FIELDS, HEADER_POSITIONS
+
+# Columna derivada con el segmento de cada respuesta (no es una pregunta del cuestionario)
+SEGMENT = "Segmento"
+# Preguntas que definen los perfiles de riesgo: carga de trabajo, hábitos, salud y bienestar
+SEGMENT_FIELDS = [
+    "service_overload", "additional_services", "extra_paid_activity", "physical_activity",
+    "activity_frequency", "healthy_habits", "hobbies", "physical_health", "mental_health",
+    "chronic_condition", "work_life_balance", "economic_satisfaction",
+]
+N_SEGMENTS = 5
+N_INIT = 8
+MAX_ITER = 50
+SEED = 0
+# Respuestas más características que se informan por segmento
+PROFILE_ANSWERS = 3
+
+
+def _answers(df, col):
+    return df.iloc[:, HEADER_POSITIONS[col]]
+
+
+def block_modes(counts, starts):
+    """One-hot de la categoría más frecuente de cada pregunta (bloque) por fila; bloques vacíos quedan en cero"""
+    modes = np.zeros_like(counts)
+    ends = list(starts[1:]) + [counts.shape[1]]
+    rows = np.arange(len(counts))
+    for start, end in zip(starts, ends):
+        block = counts[:, start:end]
+        best = block.argmax(axis=1)
+        hit = block[rows, best] > 0
+        modes[rows[hit], start + best[hit]] = 1
+    return modes
+
+
+def kmodes(onehot, starts, k, rng, max_iter=MAX_ITER):
+    """(modos, costo) de k-modes sobre la codificación one-hot.
+
+    La distancia es la de Hamming entre respuestas: preguntas respondidas menos coincidencias
+    con el modo, así que la asignación de todas las filas es un solo producto onehot · modosᵀ.
+    Los centros iniciales se eligen con probabilidad proporcional a la distancia (k-modes++).
+    """
+    answered = onehot.sum(axis=1)
+    centers = [int(rng.integers(len(onehot)))]
+    distance = answered - onehot @ onehot[centers[0]]
+    for _ in range(1, k):
+        weights = distance.astype(np.float64)
+        total = weights.sum()
+        center = int(rng.choice(len(onehot), p=weights / total)) if total > 0 else int(rng.integers(len(onehot)))
+        centers.append(center)
+        distance = np.minimum(distance, answered - onehot @ onehot[center])
+    modes = onehot[centers].copy()
+
+    assignment = None
+    for _ in range(max_iter):
+        previous, assignment = assignment, (onehot @ modes.T).argmax(axis=1)
+        if previous is not None and np.array_equal(previous, assignment):
+            break
+        membership = np.zeros((len(onehot), k), dtype=onehot.dtype)
+        membership[np.arange(len(onehot)), assignment] = 1
+        sizes = membership.sum(axis=0)
+        modes = block_modes(membership.T @ onehot, starts)
+        # Un segmento vacío se reinicia con la respuesta más lejana de su modo
+        for empty in np.flatnonzero(sizes == 0).tolist():
+            similarity = onehot @ modes.T
+            farthest = int((answered - similarity[np.arange(len(onehot)), similarity.argmax(axis=1)]).argmax())
+            modes[empty] = onehot[farthest]
+    similarity = onehot @ modes.T
+    return modes, float((answered - similarity.max(axis=1)).sum())
+
+
+class Segmentation:
+    """Perfiles de riesgo de los encuestados (k-modes) ajustados a una versión del archivo de datos"""
+
+    def __init__(self, version=None, k=N_SEGMENTS, seed=SEED, n_init=N_INIT):
+        self.version = version
+        self.k = k
+        self.seed = seed
+        self.n_init = n_init
+        self.columns = []
+        self.categories = {}
+        self.modes = None
+        self.labels = []
+        self.profiles = {}
+
+    def to_dict(self):
+        """Estado ajustado en tipos JSON, para guardarlo junto a los agregados"""
+        return {
+            "version": self.version, "k": self.k, "seed": self.seed, "n_init": self.n_init,
+            "columns": self.columns, "categories": self.categories,
+            "modes": None if self.modes is None else self.modes.astype(np.int8).tolist(),
+            "labels": self.labels, "profiles": self.profiles,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Segmentación guardada con to_dict(), sin volver a ajustarla"""
+        segmentation = cls(data["version"], data["k"], data["seed"], data["n_init"])
+        segmentation.columns = list(data["columns"])
+        segmentation.categories = {col: list(data["categories"][col]) for col in segmentation.columns}
+        segmentation.modes = None if data["modes"] is None else np.array(data["modes"], dtype=np.float32)
+        segmentation.labels = list(data["labels"])
+        segmentation.profiles = data["profiles"]
+        return segmentation
+
+    def _onehot(self, df):
+        """(one-hot de las respuestas, inicio de cada pregunta); categorías nuevas quedan en cero"""
+        sizes = [len(self.categories[col]) for col in self.columns]
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.intp)
+        onehot = np.zeros((len(df), sum(sizes)), dtype=np.float32)
+        for col, start in zip(self.columns, starts.tolist()):
+            codes = pd.Categorical(_answers(df, col), categories=self.categories[col]).codes.astype(np.intp)
+            rows = np.flatnonzero(codes >= 0)
+            onehot[rows, start + codes[rows]] = 1
+        return onehot, starts
+
+    def fit(self, df):
+        """Agrupa las respuestas de df; los segmentos se numeran del más grande al más chico"""
+        categories = {FIELDS[field]: sorted(_answers(df, FIELDS[field]).dropna().unique().tolist()) for field in SEGMENT_FIELDS}
+        # Las preguntas sin respuestas en el archivo no aportan al agrupamiento
+        self.columns = [col for col, labels in categories.items() if labels]
+        self.categories = {col: categories[col] for col in self.columns}
+        onehot, starts = self._onehot(df)
+        answered = onehot[onehot.sum(axis=1) > 0]
+        k = min(self.k, len(np.unique(answered, axis=0)))
+        if k == 0:
+            self.modes, self.labels, self.profiles = None, [], {}
+            return self
+
+        rng = np.random.default_rng(self.seed)
+        modes, _ = min((kmodes(answered, starts, k, rng) for _ in range(self.n_init)), key=lambda run: run[1])
+        sizes = np.bincount((answered @ modes.T).argmax(axis=1), minlength=k)
+        order = np.argsort(-sizes, kind="stable")
+        self.modes = modes[order]
+        width = len(str(k))
+        self.labels = [f"Segmento {i + 1:0{width}d}" for i in range(k)]
+        self.profiles = self._profiles(answered, starts, (answered @ self.modes.T).argmax(axis=1))
+        return self
+
+    def _profiles(self, onehot, starts, assignment):
+        """Tamaño y respuestas más características (mayor sobrerrepresentación) de cada segmento"""
+        block = np.repeat(np.arange(len(self.columns)), np.diff(np.append(starts, onehot.shape[1])))
+        answers = [(col, label) for col in self.columns for label in self.categories[col]]
+        # Proporción de cada respuesta entre quienes respondieron su pregunta
+        overall = onehot.sum(axis=0) / np.maximum(np.add.reduceat(onehot.sum(axis=0), starts)[block], 1)
+        profiles = {}
+        for i, label in enumerate(self.labels):
+            members = onehot[assignment == i]
+            counts = members.sum(axis=0)
+            share = counts / np.maximum(np.add.reduceat(counts, starts)[block], 1)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                lift = np.where((share >= 0.5) & (overall > 0), share / overall, 0)
+            top = [j for j in np.argsort(-lift, kind="stable")[:PROFILE_ANSWERS].tolist() if lift[j] > 1]
+            profiles[label] = {
+                "fit_rows": len(members),
+                "answers": [
+                    {"question": answers[j][0].strip(), "answer": answers[j][1],
+                     "share": round(float(share[j]), 3), "overall_share": round(float(overall[j]), 3)}
+                    for j in top
+                ],
+            }
+        return profiles
+
+    def assign(self, df):
+        """Segmento de cada fila (modo más cercano); NaN si no respondió ninguna de las preguntas"""
+        result = pd.Series(np.nan, index=df.index, dtype=object, name=SEGMENT)
+        if self.modes is None or len(df) == 0:
+            return result
+        onehot, _ = self._onehot(df)
+        known = onehot.sum(axis=1) > 0
+        nearest = (onehot[known] @ self.modes.T).argmax(axis=1)
+        result[known] = np.array(self.labels, dtype=object)[nearest]
+        return result
+
+    def label(self, df):
+        """Copia de df con la columna SEGMENT (reemplaza una columna homónima del libro)"""
+        df = df.drop(columns=[SEGMENT], errors="ignore")
+        df[SEGMENT] = self.assign(df)
+        return df
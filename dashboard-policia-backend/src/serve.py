@@ -0,0 +1,29 @@
+import os
+import sys
+# DON'T CHANGE THIS !!!
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+def main():
+    """Punto de entrada de producción: ASGI con uvicorn, sin depurador ni recarga automática"""
+    host = os.environ.get('HOST', '0.0.0.0')
+    port = int(os.environ.get('PORT', 5000))
+
+    try:
+        import uvicorn
+    except ImportError:
+        uvicorn = None
+
+    if uvicorn is not None:
+        from src.asgi import application
+        # Un solo proceso: los agregados y los suscriptores SSE viven en memoria
+        uvicorn.run(application, host=host, port=port, lifespan='on',
+                    log_level=os.environ.get('LOG_LEVEL', 'info'))
+    else:
+        from werkzeug.serving import run_simple
+        from src.main import app
+        print("uvicorn no está instalado; usando el servidor WSGI de Werkzeug con hilos")
+        run_simple(host, port, app, threaded=True, use_reloader=False, use_debugger=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from src.aggregates import filter_label
+
+# Umbral por defecto (ms) y rotación del archivo JSON lines
+SLOW_REQUEST_MS = 500
+MAX_LOG_BYTES = 10 * 1024 * 1024
+LOG_BACKUPS = 5
+
+
+def normalize_filters(filters):
+    """Filtros efectivos con las claves ordenadas: se omiten 'all' y actividad_fisica=false"""
+    normalized = {}
+    for param in sorted(filters):
+        label = filter_label(param, filters[param])
+        if label is not None:
+            normalized[param] = filters[param]
+    return normalized
+
+
+def fingerprint(filters):
+    """Huella corta y estable de una combinación de filtros normalizada"""
+    text = json.dumps(filters, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]
+
+
+class RequestTrace:
+    """Datos de una solicitud que se completan mientras se atiende"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.filters = []
+        # Selección que resolvió cada entrada de filters (por posición)
+        self.selections = {}
+        self.sections = []
+        self.timings = {}
+        self.cache = None
+        self.size = None
+
+    def add_filters(self, filters):
+        self.filters.append(filters)
+        return filters
+
+    def add_selection(self, filters, selection):
+        """Anota la primera selección que resolvió unos filtros de la solicitud (el mismo objeto dict)"""
+        for i, known in enumerate(self.filters):
+            if known is filters:
+                self.selections.setdefault(i, selection)
+
+    def note(self, sections):
+        """Anota secciones pedidas (sin repetir, en orden de aparición)"""
+        for section in sections:
+            if section not in self.sections:
+                self.sections.append(section)
+
+    def _add(self, name, started):
+        self.timings[name] = round(self.timings.get(name, 0) + (time.perf_counter() - started) * 1000, 3)
+
+    @contextmanager
+    def section(self, name, sections=None):
+        """Mide lo que corre dentro del with bajo `name`; `sections` son las secciones que cubre"""
+        self.note(sections or [name])
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add(name, started)
+
+    def timed(self, items):
+        """Envuelve un generador de (sección, datos) midiendo cada sección al generarla"""
+        iterator = iter(items)
+        while True:
+            started = time.perf_counter()
+            try:
+                section, data = next(iterator)
+            except StopIteration:
+                return
+            self.note([section])
+            self._add(section, started)
+            yield section, data
+
+
+class SlowRequestLog:
+    """Registro rotativo en JSON lines de las solicitudes que superan `threshold_ms`"""
+
+    def __init__(self, path, threshold_ms=SLOW_REQUEST_MS, max_bytes=MAX_LOG_BYTES, backups=LOG_BACKUPS):
+        self.path = path
+        self.threshold_ms = threshold_ms
+        self._handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups,
+                                            encoding='utf-8', delay=True)
+
+    def watch(self, trace, request, response):
+        """Cuenta los bytes enviados y registra la solicitud al cerrarse la respuesta.
+
+        En streaming el cuerpo se genera después de este punto, por eso la duración y el
+        tamaño se toman recién al cerrar. Las filas salen de las selecciones que usó la solicitud.
+        """
+        if response.mimetype == 'text/event-stream':
+            # Las conexiones SSE duran lo que el cliente quiera: no son solicitudes lentas
+            return response
+        if response.is_sequence:
+            trace.size = response.calculate_content_length()
+        elif response.direct_passthrough:
+            trace.size = response.content_length
+        else:
+            original, encoded = response.response, response.iter_encoded()
+            trace.size = 0
+
+            def counted():
+                try:
+                    for chunk in encoded:
+                        trace.size += len(chunk)
+                        yield chunk
+                finally:
+                    if hasattr(original, 'close'):
+                        original.close()
+            response.response = counted()
+
+        method, path, status = request.method, request.path, response.status_code
+        response.call_on_close(lambda: self.finish(trace, method, path, status))
+        return response
+
+    def finish(self, trace, method, path, status):
+        """Escribe la línea de la solicitud si superó el umbral; retorna la entrada o None"""
+        duration = (time.perf_counter() - trace.started) * 1000
+        if duration < self.threshold_ms:
+            return None
+        queries = []
+        for i, filters in enumerate(trace.filters):
+            # Sin selección (respuesta en caché o error antes de calcular) no hay filas
+            selection = trace.selections.get(i)
+            rows = selection.rows if selection is not None else None
+            normalized = normalize_filters(filters)
+            queries.append({'filters': normalized, 'fingerprint': fingerprint(normalized), 'rows': rows})
+        entry = {
+            'time': datetime.utcnow().isoformat(timespec='milliseconds') + 'Z',
+            'method': method,
+            'path': path,
+            'status': status,
+            'duration_ms': round(duration, 2),
+            'queries': queries,
+            'sections': trace.sections,
+            'section_ms': trace.timings,
+            'cache': trace.cache,
+            'response_bytes': trace.size,
+        }
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._handler.handle(logging.makeLogRecord({'msg': json.dumps(entry, ensure_ascii=False)}))
+        return entry
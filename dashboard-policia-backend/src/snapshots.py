@@ -0,0 +1,117 @@
+import json
+import logging
+import os
+import threading
+
+from flask.json.provider import DefaultJSONProvider
+
+from src.aggregates import SECTIONS
+from src.compression import compress_variants, ENCODINGS
+
+logger = logging.getLogger(__name__)
+
+# Snapshot -> cómo calcularlo desde un DatasetSnapshot fijo (equivale al endpoint sin filtros)
+SNAPSHOT_BUILDERS = {
+    "kpis": lambda store, snapshot: store.get_section("kpis", snapshot=snapshot),
+    "demographics": lambda store, snapshot: store.get_section("demographics", snapshot=snapshot),
+    "habits": lambda store, snapshot: store.get_section("habits", snapshot=snapshot),
+    "health": lambda store, snapshot: store.get_section("health", snapshot=snapshot),
+    "knowledge": lambda store, snapshot: store.get_section("knowledge", snapshot=snapshot),
+    "quality-of-life": lambda store, snapshot: store.get_section("quality_of_life", snapshot=snapshot),
+    "filter-options": lambda store, snapshot: store.get_filter_options(snapshot),
+}
+
+
+def json_keys(data):
+    """Copia donde los dicts con claves de texto y numéricas usan el texto JSON de cada clave.
+
+    json ordena las claves antes de convertirlas, así que una distribución con claves numéricas
+    y de texto (ej. {nan: 62, 2.0: 55, "__suprimidas__": 7}) no se puede serializar con sort_keys. Los
+    dicts con claves de un solo tipo se dejan igual (mismo orden y mismos bytes que antes).
+    """
+    if isinstance(data, dict):
+        kinds = {isinstance(key, str) for key in data}
+        if len(kinds) > 1:
+            return {(key if isinstance(key, str) else json.dumps(key)): json_keys(value) for key, value in data.items()}
+        return {key: json_keys(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [json_keys(value) for value in data]
+    return data
+
+
+class DashboardJSONProvider(DefaultJSONProvider):
+    """Proveedor JSON de la app: jsonify y el streaming convierten las claves igual que render_json"""
+
+    def dumps(self, obj, **kwargs):
+        return super().dumps(json_keys(obj), **kwargs)
+
+
+def render_json(data):
+    """Serializa igual que jsonify en modo compacto (claves ordenadas, ASCII)"""
+    return (json.dumps(json_keys(data), ensure_ascii=True, sort_keys=True, separators=(",", ":")) + "\n").encode("ascii")
+
+
+class Snapshot:
+    """Bytes prerenderados (y precomprimidos) de una respuesta para una versión de los datos"""
+
+    def __init__(self, name, version, data):
+        self.name = name
+        self.version = version
+        self.etag = f"{version}-{name}"
+        self.variants = compress_variants(data)
+
+
+class SnapshotPublisher:
+    """Publica las respuestas sin filtros como archivos estáticos cada vez que cambia la versión"""
+
+    def __init__(self, store, directory):
+        self.store = store
+        self.directory = directory
+        self.snapshots = {}
+        self._lock = threading.Lock()
+        store.on_change(self.publish)
+
+    def publish(self, version):
+        """Renderiza /api/data, /api/kpis, cada sección y /filter-options para la versión actual"""
+        with self._lock:
+            # Todas las respuestas salen del mismo snapshot, con su versión
+            snapshot = self.store.current_snapshot()
+            version = snapshot.version
+            try:
+                payloads = {name: build(self.store, snapshot) for name, build in SNAPSHOT_BUILDERS.items()}
+                data = {section: payloads[section.replace("_", "-")] for section in SECTIONS}
+                data["kpis"] = payloads["kpis"]
+                data["filter_options"] = payloads["filter-options"]
+                payloads["data"] = data
+                snapshots = {name: Snapshot(name, version, render_json(payload)) for name, payload in payloads.items()}
+            except Exception:
+                # Sin snapshots de esta versión, get() retorna None y los endpoints calculan en vivo
+                logger.exception("Error rendering snapshots for %s", version)
+                return
+            self.snapshots = snapshots
+            self._write(snapshots, version)
+
+    def _write(self, snapshots, version):
+        """Escribe los archivos (.json, .json.gz, .json.br) de forma atómica"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            for snapshot in snapshots.values():
+                for encoding, data in snapshot.variants.items():
+                    suffix = dict(ENCODINGS).get(encoding, "")
+                    path = os.path.join(self.directory, f"{snapshot.name}.json{suffix}")
+                    with open(path + ".tmp", "wb") as f:
+                        f.write(data)
+                    os.replace(path + ".tmp", path)
+            with open(os.path.join(self.directory, "version.json.tmp"), "w") as f:
+                json.dump({"version": version}, f)
+            os.replace(os.path.join(self.directory, "version.json.tmp"), os.path.join(self.directory, "version.json"))
+        except OSError:
+            # Sin disco escribible los snapshots se sirven igual desde memoria
+            logger.exception("Error writing snapshots")
+
+    def get(self, name):
+        """Snapshot vigente (de la versión actual de los datos) o None"""
+        snapshot = self.snapshots.get(name)
+        if snapshot is None or snapshot.version != self.store.version:
+            return None
+        return snapshot
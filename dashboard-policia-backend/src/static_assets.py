@@ -0,0 +1,84 @@
+import hashlib
+import mimetypes
+import os
+import re
+
+from src.compression import ENCODINGS, compress_variants, precompressed_response
+
+# Archivos con hash de contenido en el nombre (salida de Vite: assets/index-4KUyHvwQ.js)
+HASHED_ASSET = re.compile(r'(^|/)assets/.+-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$')
+# Tipos que vale la pena comprimir si el build no trae las variantes .br/.gz
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+MIN_COMPRESS_SIZE = 1024
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+INDEX_CACHE = 'public, max-age=60, must-revalidate'
+DEFAULT_CACHE = 'public, max-age=3600'
+
+
+class StaticAsset:
+    """Archivo estático en memoria con sus variantes comprimidas"""
+
+    def __init__(self, path, variants, mimetype, cache_control):
+        self.path = path
+        self.variants = variants
+        self.mimetype = mimetype
+        self.cache_control = cache_control
+        self.etag = hashlib.sha1(variants['identity']).hexdigest()[:16]
+
+
+class StaticAssets:
+    """Manifiesto en memoria de la carpeta estática, construido una sola vez al iniciar"""
+
+    def __init__(self, directory, exclude=('snapshots',)):
+        self.directory = directory
+        self.exclude = tuple(exclude)
+        self.assets = {}
+        self.refresh()
+
+    def refresh(self):
+        """Recorre la carpeta y carga cada archivo junto a sus variantes .br/.gz"""
+        assets = {}
+        if os.path.isdir(self.directory):
+            suffixes = tuple(suffix for _, suffix in ENCODINGS)
+            for root, dirs, files in os.walk(self.directory):
+                relative_root = os.path.relpath(root, self.directory).replace(os.sep, '/')
+                if relative_root == '.':
+                    dirs[:] = [d for d in dirs if d not in self.exclude]
+                    relative_root = ''
+                for name in files:
+                    if name.endswith(suffixes):
+                        continue
+                    path = f'{relative_root}/{name}' if relative_root else name
+                    assets[path] = self._load(path, os.path.join(root, name))
+        self.assets = assets
+
+    def _load(self, path, filename):
+        with open(filename, 'rb') as f:
+            data = f.read()
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+        variants = {'identity': data}
+        for encoding, suffix in ENCODINGS:
+            if os.path.exists(filename + suffix):
+                with open(filename + suffix, 'rb') as f:
+                    variants[encoding] = f.read()
+        # Sin variantes en el build: se comprimen aquí una vez para los tipos de texto
+        if len(variants) == 1 and len(data) >= MIN_COMPRESS_SIZE and mimetype.startswith(COMPRESSIBLE_TYPES):
+            variants = compress_variants(data)
+
+        if path == 'index.html':
+            cache_control = INDEX_CACHE
+        elif HASHED_ASSET.search(path):
+            cache_control = IMMUTABLE_CACHE
+        else:
+            cache_control = DEFAULT_CACHE
+        return StaticAsset(path, variants, mimetype, cache_control)
+
+    def response(self, request, path):
+        """Respuesta para una ruta del frontend; las rutas desconocidas reciben index.html (SPA)"""
+        asset = self.assets.get(path) or self.assets.get('index.html')
+        if asset is None:
+            return None
+        return precompressed_response(request, asset.variants, asset.mimetype,
+                                      etag=asset.etag, cache_control=asset.cache_control)
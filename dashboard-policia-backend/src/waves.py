@@ -0,0 +1,166 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from src.aggregates import AggregateStore, SECTIONS, KPI_CLIMATE
+from src.data_processor import DataProcessor
+from src.memory import deep_sizeof
+
+# Resultados por ola guardados para /api/trends (las olas anteriores no cambian)
+MAX_CACHED_RESULTS = 512
+
+
+class Wave:
+    """Edición de la encuesta: un libro Excel con su fecha y sus agregados materializados"""
+
+    def __init__(self, edition, date, path, store):
+        self.edition = edition
+        self.date = date
+        self.path = path
+        self.store = store
+
+    def describe(self):
+        return {
+            "edition": self.edition,
+            "date": self.date,
+            "file": os.path.basename(self.path),
+            "version": self.store.version,
+            "total_responses": int(self.store.select().rows)
+        }
+
+
+class WaveSet:
+    """Olas de la encuesta declaradas en data/waves.json, cada una materializada con su propio origen"""
+
+    def __init__(self, base_store, data_dir, manifest="waves.json"):
+        self.base_store = base_store
+        self.data_dir = data_dir
+        self.manifest_path = os.path.join(data_dir, manifest)
+        self.waves = []
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+
+    def _manifest(self):
+        """Entradas del manifiesto; sin manifiesto, el libro base es la única ola"""
+        base_file = os.path.basename(self.base_store.processor.excel_path)
+        entries = []
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding="utf-8") as f:
+                entries = json.load(f)
+        if not any(entry.get("file") == base_file for entry in entries):
+            entries.append({"edition": "actual", "date": None, "file": base_file})
+        for entry in entries:
+            if not entry.get("edition") or not entry.get("file"):
+                raise ValueError("Cada ola necesita 'edition' y 'file'")
+        # Orden cronológico; las olas sin fecha van al final
+        return sorted(entries, key=lambda entry: (entry.get("date") is None, entry.get("date") or ""))
+
+    def refresh(self):
+        """Carga las olas del manifiesto; solo las nuevas (o con archivo o segmentos modificados) se calculan"""
+        with self._lock:
+            current = {wave.edition: wave for wave in self.waves}
+            # Todas las olas usan los segmentos del libro base: `Segmento 1` es el mismo perfil en cada edición
+            segmentation = self.base_store.processor.segmentation
+            waves = []
+            for entry in self._manifest():
+                path = os.path.join(self.data_dir, entry["file"])
+                wave = current.get(entry["edition"])
+                stale = wave is not None and wave.store is not self.base_store and wave.store.segmentation is not segmentation
+                if wave is None or wave.path != path or stale:
+                    if os.path.abspath(path) == os.path.abspath(self.base_store.processor.excel_path):
+                        store = self.base_store
+                    else:
+                        store = AggregateStore(DataProcessor(path, fit_segments=False),
+                                               min_cell_size=self.base_store.min_cell_size, segmentation=segmentation)
+                        # Carga los conteos guardados o los materializa si la ola es nueva
+                        store.sync()
+                    wave = Wave(entry["edition"], entry.get("date"), path, store)
+                wave.date = entry.get("date")
+                waves.append(wave)
+            self.waves = waves
+        return self.waves
+
+    def describe(self):
+        return [wave.describe() for wave in self.waves]
+
+    def _margins(self, wave):
+        """Aplica a la ola los márgenes de población del libro base (misma población objetivo en cada edición)"""
+        margins = self.base_store.margins
+        if wave.store is not self.base_store and wave.store.margins is not margins:
+            try:
+                wave.store.set_margins(margins)
+                wave.store.validate_margins()
+            except ValueError as e:
+                raise ValueError(f"Ola {wave.edition}: {e}")
+            # Mismo objeto que el libro base: la comparación de arriba detecta un PUT /api/weights posterior
+            wave.store.margins = margins
+        return tuple((col, tuple(sorted(totals.items()))) for col, totals in sorted(margins.items()))
+
+    def _wave_payload(self, wave, filters, sections, ci=None, stats=False, weighted=False):
+        """Secciones de una ola para unos filtros y opciones, reutilizadas mientras no cambie su versión"""
+        margins = self._margins(wave) if weighted else None
+        key = (wave.edition, wave.store.version, tuple(sorted((filters or {}).items())), tuple(sections),
+               tuple(sorted(ci.items())) if ci else None, stats, margins)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached[0]
+        payload = dict(wave.store.iter_sections(filters, sections, ci=ci, stats=stats, weighted=weighted))
+        size = deep_sizeof(payload)
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = (payload, size)
+                self._cache_bytes += size
+            while len(self._cache) > MAX_CACHED_RESULTS:
+                self._pop_oldest()
+        return payload
+
+    def _pop_oldest(self):
+        _, (_, size) = self._cache.popitem(last=False)
+        self._cache_bytes -= size
+
+    def cache_nbytes(self):
+        """Bytes aproximados de los resultados guardados"""
+        return self._cache_bytes
+
+    def evict_cache(self, target_bytes=0):
+        """Descarta los resultados usados hace más tiempo hasta quedar en target_bytes o menos"""
+        with self._lock:
+            while self._cache and self._cache_bytes > target_bytes:
+                self._pop_oldest()
+
+    def get_trends(self, filters=None, sections=None, ci=None, stats=False, weighted=False):
+        """Secciones pedidas por ola y, si se piden KPIs, la serie de cada KPI en orden cronológico.
+
+        ci, stats y weighted se aplican a cada ola como en /api/filtered-data; con pesos, todas las olas
+        usan los márgenes de población del libro base.
+        """
+        sections = sections or SECTIONS + ["kpis"]
+        waves = []
+        for wave in self.waves:
+            waves.append({
+                "edition": wave.edition,
+                "date": wave.date,
+                "data": self._wave_payload(wave, filters, sections, ci, stats, weighted)
+            })
+
+        result = {"waves": waves}
+        if "kpis" in sections:
+            # Valores escalares de cada KPI (incluidos los componentes de clima), uno por ola
+            rows = []
+            for wave in waves:
+                kpis = wave["data"]["kpis"]
+                row = {key: value for key, value in kpis.items() if not isinstance(value, dict)}
+                row.update({key: kpis["climate_components"].get(key) for key, _ in KPI_CLIMATE})
+                rows.append(row)
+            keys = list(dict.fromkeys(key for row in rows for key in row))
+            result["series"] = {key: [row.get(key) for row in rows] for key in keys}
+            if ci:
+                # Intervalo de cada KPI por ola (None si la ola no lo publica)
+                intervals = [wave["data"]["kpis"].get("confidence_intervals", {}).get("intervals", {}) for wave in waves]
+                keys = list(dict.fromkeys(key for wave_intervals in intervals for key in wave_intervals))
+                result["interval_series"] = {key: [wave_intervals.get(key) for wave_intervals in intervals] for key in keys}
+        return result
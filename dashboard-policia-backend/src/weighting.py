@@ -0,0 +1,37 @@
+import numpy as np
+
+MAX_RAKING_ITERATIONS = 100
+RAKING_TOLERANCE = 1e-6
+
+
+def rake(cell_dims, cell_rows, targets, max_iterations=MAX_RAKING_ITERATIONS, tolerance=RAKING_TOLERANCE):
+    """Pesos por celda que ajustan los totales ponderados a márgenes de población (raking / IPF).
+
+    targets: lista de (eje de la dimensión en cell_dims, totales de población por código, con NaN
+    en los códigos sin margen). Con un solo margen equivale a post-estratificación. Los vacíos
+    (código 0) y las celdas sin respuestas conservan su factor; una categoría con respuestas y sin
+    margen es un ValueError, porque los totales ponderados ya no sumarían la población.
+    Retorna (pesos, iteraciones, error relativo máximo del último ajuste).
+    """
+    for axis, target in targets:
+        responses = np.bincount(cell_dims[:, axis], weights=cell_rows, minlength=len(target))
+        missing = np.nonzero(np.isnan(target[1:]) & (responses[1:len(target)] > 0))[0] + 1
+        if len(missing):
+            raise ValueError(f"Faltan márgenes para los códigos {missing.tolist()} de la dimensión {axis}")
+    weights = np.ones(len(cell_rows))
+    error = 0.0
+    for iteration in range(1, max_iterations + 1):
+        error = 0.0
+        for axis, target in targets:
+            codes = cell_dims[:, axis]
+            current = np.bincount(codes, weights=cell_rows * weights, minlength=len(target))
+            adjust = ~np.isnan(target) & (current > 0)
+            factor = np.ones(len(target))
+            factor[adjust] = target[adjust] / current[adjust]
+            weights *= factor[codes]
+            if adjust.any():
+                error = max(error, float(np.abs(factor[adjust] - 1).max()))
+        if error < tolerance:
+            break
+    return weights, iteration, error
+
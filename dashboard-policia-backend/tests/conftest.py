@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from src.data_processor import DataProcessor  # noqa: E402
+from src.schema import SCHEMA  # noqa: E402
+from src.segments import Segmentation  # noqa: E402
+
+BASE_WORKBOOK = os.path.join(BASE_DIR, 'data', 'Dashboard_Encuesta_Base.xlsx')
+
+
+@pytest.fixture(scope='session')
+def survey():
+    """Respuestas limpias y segmentadas del libro base, sin pasar por la base de datos"""
+    df = DataProcessor._clean_frame(SCHEMA.conform(pd.read_excel(BASE_WORKBOOK)))
+    segmentation = Segmentation('pruebas').fit(df)
+    return segmentation.label(df), segmentation
+
+
+@pytest.fixture
+def processor(survey):
+    df, segmentation = survey
+    return DataProcessor('pruebas.xlsx', df=df, source_digest='pruebas', segmentation=segmentation)
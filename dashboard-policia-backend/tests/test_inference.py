@@ -0,0 +1,78 @@
+import math
+
+import numpy as np
+import pytest
+
+from src.inference import (MAX_BOOTSTRAP_DRAWS, Z_VALUES, bootstrap_means, chi_square, chi_square_sf, mean_interval,
+                           wilson_interval)
+
+Z = Z_VALUES[0.95]
+
+
+def test_wilson_interval_at_the_bounds():
+    # 0/n y n/n: el intervalo toca 0 o 1 y el otro extremo es z² / (n + z²) o n / (n + z²)
+    low, high = wilson_interval([0, 10], 10, Z)
+    assert low[0] == 0 and high[0] == pytest.approx(Z * Z / (10 + Z * Z))
+    assert low[1] == pytest.approx(10 / (10 + Z * Z)) and high[1] == pytest.approx(1)
+    assert high[0] == pytest.approx(0.2775, abs=1e-4)
+
+
+def test_wilson_interval_known_value():
+    low, high = wilson_interval([5], 10, Z)
+    assert (low[0], high[0]) == (pytest.approx(0.2366, abs=1e-4), pytest.approx(0.7634, abs=1e-4))
+
+
+def test_mean_interval_known_value():
+    # Media 0.5 y varianza muestral 10/36 con 10 respuestas
+    low, high = mean_interval(np.array([0.0, 1.0]), np.array([5, 5]), Z)
+    margin = Z * math.sqrt(10 / 36 / 10)
+    assert (low, high) == (pytest.approx(0.5 - margin), pytest.approx(0.5 + margin))
+
+
+def test_mean_interval_stays_in_unit_range():
+    low, high = mean_interval(np.array([1.0, 0.0]), np.array([9, 1]), Z)
+    assert low > 0.5 and high == 1.0
+
+
+@pytest.mark.parametrize('dof, critical', [(1, 3.841459), (2, 5.991465), (5, 11.070498), (10, 18.307038), (30, 43.772972)])
+def test_chi_square_sf_critical_values(dof, critical):
+    assert chi_square_sf(critical, dof) == pytest.approx(0.05, abs=1e-6)
+
+
+def test_chi_square_sf_closed_forms():
+    # dof = 2: exp(-x / 2); dof = 4: exp(-x / 2) (1 + x / 2), por la serie (x < a + 1)
+    assert chi_square_sf(3.0, 2) == pytest.approx(math.exp(-1.5))
+    assert chi_square_sf(1.0, 4) == pytest.approx(math.exp(-0.5) * 1.5)
+    assert chi_square_sf(0.0, 3) == 1.0
+    assert chi_square_sf(5.0, 0) is None
+
+
+def test_chi_square_known_table():
+    statistic, dof, cramers_v, low_expected, residuals = chi_square(np.array([[10, 20], [30, 40]]))
+    assert statistic == pytest.approx(4 / 12 + 4 / 18 + 4 / 28 + 4 / 42)
+    assert dof == 1 and low_expected == 0
+    assert cramers_v == pytest.approx(math.sqrt(statistic / 100))
+    # En una tabla 2x2 el residuo ajustado es ±sqrt(chi-cuadrado)
+    assert np.abs(residuals) == pytest.approx(np.full((2, 2), math.sqrt(statistic)))
+
+
+def test_chi_square_ignores_empty_rows_for_dof():
+    _, dof, _, _, _ = chi_square(np.array([[10, 20, 5], [0, 0, 0], [30, 40, 7]]))
+    assert dof == 2
+
+
+def test_bootstrap_interval_contains_the_mean():
+    patterns = np.array([[0.0, 1.0], [1.0, 0.0], [1.0, 1.0]])
+    frequencies = np.array([30, 50, 20])
+    mean = (frequencies @ patterns) / frequencies.sum()
+    low, high = bootstrap_means(patterns, frequencies, 2000, 0.95, seed=7)
+    assert np.all(low <= mean) and np.all(mean <= high)
+    assert np.all(high - low < 0.25)
+    again = bootstrap_means(patterns, frequencies, 2000, 0.95, seed=7)
+    assert np.array_equal(low, again[0]) and np.array_equal(high, again[1])
+
+
+def test_bootstrap_rejects_oversized_requests():
+    frequencies = np.ones(MAX_BOOTSTRAP_DRAWS // 1000 + 1, dtype=np.int64)
+    with pytest.raises(ValueError):
+        bootstrap_means(np.zeros((len(frequencies), 1)), frequencies, 1000, 0.95)
@@ -0,0 +1,137 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from src.aggregates import AggregateStore, FILTER_DIMENSIONS, SECTION_SPECS, SECTIONS, SUPPRESSED_LABEL
+from src.features import summarize
+
+MIN_CELL_SIZE = 5
+
+
+def selections(store):
+    """Sin filtros, cada valor de cada dimensión y los pares género x jerarquía (celdas chicas)"""
+    options = store.get_filter_options()
+    keys = {'distrito': 'distritos', 'genero': 'generos', 'edad': 'edades', 'jerarquia': 'jerarquias',
+            'estado_civil': 'estados_civiles', 'segmento': 'segmentos'}
+    combinations = [{}, {'actividad_fisica': 'true'}]
+    for param, key in keys.items():
+        combinations += [{param: value} for value in options[key]]
+    combinations += [{'genero': gender, 'jerarquia': hierarchy}
+                     for gender, hierarchy in itertools.product(options['generos'], options['jerarquias'])]
+    return combinations
+
+
+@pytest.fixture
+def stores(processor):
+    truth, published = AggregateStore(processor), AggregateStore(processor, min_cell_size=MIN_CELL_SIZE)
+    truth.build()
+    published.build()
+    return truth, published
+
+
+def test_distributions_hide_every_small_count(stores):
+    """Lo publicado suma el total, así que restar solo despeja el grupo, que tiene al menos dos celdas y k respuestas"""
+    truth, published = stores
+    groups = 0
+    for filters in selections(published):
+        expected, actual = truth.get_filtered_data(filters), published.get_filtered_data(filters)
+        total = actual['kpis']['total_responses']
+        if total < MIN_CELL_SIZE:
+            continue
+        for section in SECTIONS:
+            for key, kind, _ in SECTION_SPECS[section]:
+                if kind != 'dist':
+                    continue
+                full, shown = expected[section][key], actual[section][key]
+                assert sum(shown.values()) == total, (filters, key)
+                missing = [label for label, count in full.items() if count > 0 and label not in shown]
+                assert all(shown[label] == count for label, count in full.items() if label in shown)
+                assert all(count >= MIN_CELL_SIZE for label, count in shown.items())
+                if missing:
+                    groups += 1
+                    assert len(missing) >= 2, (filters, key, missing)
+                    assert shown[SUPPRESSED_LABEL] == sum(full[label] for label in missing)
+                else:
+                    assert SUPPRESSED_LABEL not in shown
+    assert groups > 0
+
+
+def test_crosstab_lines_never_hide_a_single_cell(stores):
+    """Ninguna fila ni columna de un cruce se despeja restando lo visible a su marginal"""
+    truth, published = stores
+    lines = 0
+    for filters in selections(published):
+        expected, actual = truth.get_filtered_data(filters), published.get_filtered_data(filters)
+        if actual['kpis']['total_responses'] < MIN_CELL_SIZE:
+            continue
+        for section in SECTIONS:
+            for key, kind, spec in SECTION_SPECS[section]:
+                if kind != 'cross':
+                    continue
+                names = [name for name, _ in spec]
+                cells = [tuple(row[name] for name in names) for row in expected[section][key]]
+                shown = {tuple(row[name] for name in names) for row in actual[section][key]}
+                assert all(row['count'] >= MIN_CELL_SIZE for row in actual[section][key])
+                for axis in range(len(names)):
+                    positive, hidden = {}, {}
+                    for cell in cells:
+                        line = cell[:axis] + cell[axis + 1:]
+                        positive[line] = positive.get(line, 0) + 1
+                        if cell not in shown:
+                            hidden[line] = hidden.get(line, 0) + 1
+                    lines += len(hidden)
+                    # Una sola celda oculta solo si es la única de la línea: su marginal tampoco llega a k
+                    assert all(count >= 2 or positive[line] == 1 for line, count in hidden.items()), (filters, key, hidden)
+    assert lines > 0
+
+
+def test_reserved_label_cannot_be_an_answer(processor):
+    df = processor.df.copy()
+    df.iloc[0, df.columns.get_loc(FILTER_DIMENSIONS[1][1])] = SUPPRESSED_LABEL
+    processor.df = df
+    with pytest.raises(ValueError):
+        AggregateStore(processor, min_cell_size=MIN_CELL_SIZE).build()
+
+
+def test_crosstab_statistics_are_withheld_when_cells_are_hidden(stores):
+    """La prueba sobre los conteos completos despejaría las celdas ocultas: con alguna suprimida no se publica"""
+    truth, published = stores
+    payloads = [(truth.get_filtered_data(filters, stats=True), published.get_filtered_data(filters, stats=True))
+                for filters in selections(published)]
+    # Mismo criterio en el camino por lotes (/api/breakdown)
+    for expected, actual in zip(truth.get_breakdown('jerarquia', SECTIONS, stats=True)['groups'],
+                                published.get_breakdown('jerarquia', SECTIONS, stats=True)['groups']):
+        payloads.append((expected['data'], actual['data']))
+    withheld = published_stats = 0
+    for expected, actual in payloads:
+        for section in SECTIONS:
+            for key, kind, _ in SECTION_SPECS[section]:
+                if kind != 'cross':
+                    continue
+                complete = len(actual[section][key]) == len(expected[section][key])
+                if complete:
+                    published_stats += 1
+                    assert actual[section]['statistics'][key] == expected[section]['statistics'][key]
+                else:
+                    withheld += 1
+                    assert actual[section]['statistics'][key] is None
+    assert withheld > 0 and published_stats > 0
+
+
+def test_numeric_summaries_use_only_visible_cells(stores):
+    """Media y cuantiles salen del histograma publicado: las celdas suprimidas no entran al resumen"""
+    truth, published = stores
+    hidden = 0
+    for filters in selections(published):
+        expected, actual = truth.get_numeric_summary(filters), published.get_numeric_summary(filters)
+        for feature, summary in actual.items():
+            histogram = summary.pop('histogram')
+            values = np.array([bucket['value'] for bucket in histogram])
+            counts = np.array([bucket['count'] for bucket in histogram])
+            if counts.sum() < MIN_CELL_SIZE:
+                assert summary['count'] == 0, (filters, feature)
+            else:
+                assert summary == summarize(values, counts), (filters, feature)
+            hidden += counts.sum() < expected[feature]['count']
+    assert hidden > 0
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from src.aggregates import AggregateStore
+from src.weighting import rake
+
+
+def cells():
+    """Celdas de dos dimensiones (códigos 1..3 y 1..2, con vacíos) y sus respuestas"""
+    cell_dims = np.array([[1, 1], [1, 2], [2, 1], [2, 2], [3, 1], [3, 2], [0, 1]])
+    cell_rows = np.array([40, 10, 25, 25, 5, 15, 3])
+    return cell_dims, cell_rows
+
+
+def weighted_totals(cell_dims, cell_rows, weights, axis, size):
+    return np.bincount(cell_dims[:, axis], weights=cell_rows * weights, minlength=size)
+
+
+def test_rake_converges_to_both_margins():
+    # Sin la celda vacía, para que los dos márgenes sumen la misma población
+    cell_dims, cell_rows = (values[:6] for values in cells())
+    first = np.array([np.nan, 500.0, 300.0, 200.0])
+    second = np.array([np.nan, 450.0, 550.0])
+    weights, iterations, error = rake(cell_dims, cell_rows, [(0, first), (1, second)])
+    assert error < 1e-6 and iterations < 100
+    assert weighted_totals(cell_dims, cell_rows, weights, 0, 4)[1:] == pytest.approx(first[1:], rel=1e-5)
+    assert weighted_totals(cell_dims, cell_rows, weights, 1, 3)[1:] == pytest.approx(second[1:], rel=1e-5)
+
+
+def test_single_margin_is_post_stratification():
+    cell_dims, cell_rows = cells()
+    target = np.array([np.nan, 100.0, 100.0, 100.0])
+    weights, iterations, _ = rake(cell_dims, cell_rows, [(0, target)])
+    assert iterations <= 2
+    assert weights[:6] == pytest.approx(np.array([2, 2, 2, 2, 5, 5]))
+    assert weights[6] == 1
+
+
+def test_rake_rejects_a_missing_margin_category():
+    cell_dims, cell_rows = cells()
+    with pytest.raises(ValueError):
+        rake(cell_dims, cell_rows, [(0, np.array([np.nan, 500.0, np.nan, 200.0]))])
+
+
+def test_store_rejects_incomplete_margins(processor):
+    store = AggregateStore(processor)
+    store.build()
+    genders = store.get_filter_options()['generos']
+    store.set_margins({'genero': {gender: 100 for gender in genders}})
+    complete = store.margins
+    weighting = store.get_weighting()
+    assert [row['weighted'] for row in weighting['dimensions'][store.dimension('genero')[2]]] == [100] * len(genders)
+    with pytest.raises(ValueError):
+        store.set_margins({'genero': {genders[0]: 100}})
+    assert store.margins is complete
+
+
+def test_margins_loaded_before_the_data_are_checked_on_use(processor):
+    # Como al arrancar: los márgenes del archivo se cargan antes del primer snapshot
+    store = AggregateStore(processor)
+    genders = sorted(processor.df[store.dimension('genero')[2]].dropna().unique())
+    store.set_margins({'genero': {gender: 100 for gender in genders[:-1]}})
+    store.build()
+    with pytest.raises(ValueError):
+        store.validate_margins()